@@ -0,0 +1,38 @@
+// Generated by tools/process_config.py from src/modules/vanilla-types/mojang-block.ts and src/configuration_settings.json (do not change)
+
+export const LOG_FAMILIES = new Map([
+  ["minecraft:acacia_log", "acacia"],
+  ["minecraft:acacia_wood", "acacia"],
+  ["minecraft:birch_log", "birch"],
+  ["minecraft:birch_wood", "birch"],
+  ["minecraft:brown_mushroom_block", "brown_mushroom"],
+  ["minecraft:cherry_log", "cherry"],
+  ["minecraft:cherry_wood", "cherry"],
+  ["minecraft:crimson_stem", "crimson"],
+  ["minecraft:dark_oak_log", "dark_oak"],
+  ["minecraft:dark_oak_wood", "dark_oak"],
+  ["minecraft:jungle_log", "jungle"],
+  ["minecraft:jungle_wood", "jungle"],
+  ["minecraft:mangrove_log", "mangrove"],
+  ["minecraft:mangrove_wood", "mangrove"],
+  ["minecraft:oak_log", "oak"],
+  ["minecraft:oak_wood", "oak"],
+  ["minecraft:red_mushroom_block", "red_mushroom"],
+  ["minecraft:spruce_log", "spruce"],
+  ["minecraft:spruce_wood", "spruce"],
+  ["minecraft:warped_stem", "warped"],
+]);
+
+export const includedLogs = new Set(["Empty"]);
+export const excludedLogs = new Set(["Empty"]);
+
+function fillSet(set, setting) {
+  set.clear();
+  for (const value of (Array.isArray(setting) ? setting : setting?.values) ?? []) set.add(value);
+}
+
+export function refreshLogSets(configuration) {
+  fillSet(includedLogs, configuration?.includedLog);
+  fillSet(excludedLogs, configuration?.excludedLog);
+  return configuration;
+}
@@ -1,5 +1,6 @@
 import { FormBuilder } from "utils/form_builder";
 import { cloneConfiguration } from "./configuration_handler";
+import { refreshLogSets } from "./log_blocks";
 
 export const serverConfiguration = {
   /**
@@ -37,9 +38,9 @@ export const serverConfiguration = {
   debug: new FormBuilder("Debug Mode").createToggle(false),
 };
 
-export let serverConfigurationCopy = cloneConfiguration(serverConfiguration);
-export let setServerConfiguration = (newServerConfig) => serverConfigurationCopy = newServerConfig;
-export let resetServerConfiguration = () => serverConfigurationCopy = cloneConfiguration(serverConfiguration);
+export let serverConfigurationCopy = refreshLogSets(cloneConfiguration(serverConfiguration));
+export let setServerConfiguration = (newServerConfig) => refreshLogSets(serverConfigurationCopy = newServerConfig);
+export let resetServerConfiguration = () => refreshLogSets(serverConfigurationCopy = cloneConfiguration(serverConfiguration));
 
 // version (do not change)
 export const VERSION = "2.0.0";
\ No newline at end of file
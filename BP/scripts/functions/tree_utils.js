@@ -1,26 +1,38 @@
 import { system } from "@minecraft/server";
 import { serverConfigurationCopy, originalDatabase, hashBlock } from "../index";
 import { Graph } from "utils/graph";
+import { TimingProbe } from "utils/logger";
 import { Vec3 } from "utils/VectorUtils";
-export function isLogIncluded(rootBlockTypeId, blockTypeId) {
-    const validLogBlocks = /(_log|_wood|crimson_stem|warped_stem|(?:brown|red_)?mushroom_block)$/;
-    function extractLogFamily(blockTypeId) {
-        const [, cleanedBlockTypeId] = blockTypeId.split(':');
-        const parts = cleanedBlockTypeId.split('_');
-        return parts.slice(0, -1).join('_');
+import { LOG_FAMILIES, excludedLogs, includedLogs } from "configuration/log_blocks";
+const validLogBlocks = /(_log|_wood|crimson_stem|warped_stem|(?:brown|red_)?mushroom_block)$/;
+const blockLogInfo = new Map(Array.from(LOG_FAMILIES, ([blockTypeId, family]) => [blockTypeId, { family, isLog: true }]));
+function extractLogFamily(blockTypeId) {
+    const [, cleanedBlockTypeId] = blockTypeId.split(':');
+    const parts = cleanedBlockTypeId.split('_');
+    return parts.slice(0, -1).join('_');
+}
+function getBlockLogInfo(blockTypeId) {
+    let info = blockLogInfo.get(blockTypeId);
+    if (!info) {
+        info = {
+            family: extractLogFamily(blockTypeId),
+            isLog: validLogBlocks.test(blockTypeId) && !blockTypeId.includes('stripped_')
+        };
+        blockLogInfo.set(blockTypeId, info);
     }
-    if (serverConfigurationCopy.excludedLog.values.includes(blockTypeId) || blockTypeId.includes('stripped_'))
+    return info;
+}
+export function isLogIncluded(rootBlockTypeId, blockTypeId) {
+    if (excludedLogs.has(blockTypeId))
+        return false;
+    const info = getBlockLogInfo(blockTypeId);
+    if (!info.isLog && (!includedLogs.has(blockTypeId) || blockTypeId.includes('stripped_')))
         return false;
-    const extractedLogFamily = extractLogFamily(rootBlockTypeId);
-    const blockFamily = extractLogFamily(blockTypeId);
-    const isSameFamily = blockFamily === extractedLogFamily;
-    if ((serverConfigurationCopy.includedLog.values.includes(blockTypeId) ||
-        validLogBlocks.test(blockTypeId)) && isSameFamily)
-        return true;
-    return false;
+    return info.family === getBlockLogInfo(rootBlockTypeId).family;
 }
 export async function getTreeLogs(dimension, location, blockTypeId, maxNeeded, isInspectingTree = true) {
     const firstBlock = dimension.getBlock(location);
+    const traversal = new TimingProbe('getTreeLogs');
     const visitedTree = await new Promise((resolve) => {
         const graph = new Graph();
         const visitedTypeIDs = new Map();
@@ -61,6 +73,7 @@ export async function getTreeLogs(dimension, location, blockTypeId, maxNeeded, i
                 yield;
             }
             system.clearJob(traversingTreeInterval);
+            traversal.end({ blocks: graph.getSize(), mode: isInspectingTree ? 'inspect' : 'chop' });
             resolve({
                 source: graph,
                 blockOutlines: [],
@@ -76,6 +89,7 @@ export async function getTreeLogs(dimension, location, blockTypeId, maxNeeded, i
     const blockOutlines = [];
     const trunk = await getTreeTrunkSize(firstBlock, blockTypeId);
     return new Promise((resolve) => {
+        const spawning = new TimingProbe('spawnOutlines');
         const t = system.runJob((function* () {
             for (const yOffset of visitedTree.yOffsets.keys()) {
                 const outline = dimension.spawnEntity('yn:block_outline', {
@@ -94,6 +108,7 @@ export async function getTreeLogs(dimension, location, blockTypeId, maxNeeded, i
                 yield;
             }
             system.clearJob(t);
+            spawning.end({ blocks: blockOutlines.length });
             resolve({
                 typeIds: visitedTree.typeIds,
                 source: visitedTree.source,
@@ -133,6 +148,7 @@ export function getTreeTrunkSize(blockInteracted, blockTypeId) {
         const visited = new Set();
         const queue = [blockInteracted];
         const originalY = blockInteracted.y;
+        const probe = new TimingProbe('getTreeTrunkSize');
         const t = system.runJob((function* () {
             while (queue.length > 0) {
                 const currentBlock = queue.shift();
@@ -175,6 +191,7 @@ export function getTreeTrunkSize(blockInteracted, blockTypeId) {
                 centroidLog.z = (centroidLog.z / i) + 0.5;
             }
             system.clearJob(t);
+            probe.end({ blocks: i });
             fetchedTrunkSizeResolved({ center: centroidLog, size: i });
             return;
         })());
@@ -1,6 +1,6 @@
 import { world, system, ScriptEventSource, Player, EntityInventoryComponent, ItemDurabilityComponent, ItemEnchantableComponent, ItemLockMode, ItemStack, MolangVariableMap, TicksPerSecond, ItemCooldownComponent } from '@minecraft/server';
 import { ADDON_IDENTIFIER, axeEquipments, originalDatabase, forceShow, getTreeLogs, getTreeTrunkSize, hashBlock, isLogIncluded, playerInteractedTimeLogMap, resetOutlinedTrees, SendMessageTo, serverConfigurationCopy, stackDistribution, visitedLogs } from "./index";
-import { Logger } from 'utils/logger';
+import { Logger, TimingProbe } from 'utils/logger';
 import './items/axes';
 import { MinecraftEnchantmentTypes, MinecraftBlockTypes } from 'modules/vanilla-types/index';
 import { Graph } from 'utils/graph';
@@ -201,6 +201,7 @@ world.beforeEvents.playerBreakBlock.subscribe((arg) => {
             }
         }
         let size = 0;
+        const chopping = new TimingProbe('chopJob');
         system.runJob((function* () {
             if (!(serverConfigurationCopy.immersiveMode.defaultValue) && isValidVerticalTree) {
                 for (const yOffset of trunkYCoordinates) {
@@ -249,6 +250,7 @@ world.beforeEvents.playerBreakBlock.subscribe((arg) => {
                 }
                 yield;
             }
+            chopping.end({ blocks: size });
             return;
         })());
         await system.waitTicks(3);
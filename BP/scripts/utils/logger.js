@@ -1,11 +1,12 @@
 import { system } from "@minecraft/server";
-import { serverConfigurationCopy } from "index";
+import { serverConfigurationCopy } from "configuration/server_configuration";
 export var LogLevel;
 (function (LogLevel) {
     LogLevel["DEBUG"] = "DEBUG";
     LogLevel["INFO"] = "INFO";
     LogLevel["ERROR"] = "ERROR";
 })(LogLevel || (LogLevel = {}));
+export const TIMING_TAG = 'timing';
 export class Logger {
     static setLogLevel(level) {
         Logger.level = level;
@@ -42,5 +43,23 @@ export class Logger {
         if (serverConfigurationCopy.debug.defaultValue)
             Logger.log(LogLevel.ERROR, message);
     }
+    static timing(stage, fields) {
+        if (serverConfigurationCopy.debug.defaultValue)
+            Logger.log(LogLevel.DEBUG, `${TIMING_TAG} ${JSON.stringify({ stage, ...fields })}`);
+    }
 }
 Logger.level = serverConfigurationCopy.debug.defaultValue ? LogLevel.DEBUG : LogLevel.INFO;
+export class TimingProbe {
+    constructor(stage) {
+        this.stage = stage;
+        this.startTick = system.currentTick;
+        this.startTime = Date.now();
+    }
+    end(fields = {}) {
+        Logger.timing(this.stage, {
+            ticks: system.currentTick - this.startTick,
+            ms: Date.now() - this.startTime,
+            ...fields
+        });
+    }
+}
@@ -2,27 +2,51 @@ import { Block, Dimension, Entity, Vector3, VectorXZ, system, world } from "@min
 
 import { serverConfigurationCopy, VisitedBlockResult, TrunkBlockResult, originalDatabase, hashBlock } from "../index";
 import { Graph } from "utils/graph";
+import { TimingProbe } from "utils/logger";
 import { Vec3 } from "utils/VectorUtils";
+import { LOG_FAMILIES, excludedLogs, includedLogs } from "configuration/log_blocks";
 
-export function isLogIncluded(rootBlockTypeId: string, blockTypeId: string): boolean {
-    const validLogBlocks: RegExp = /(_log|_wood|crimson_stem|warped_stem|(?:brown|red_)?mushroom_block)$/;
-    function extractLogFamily(blockTypeId: string): string {
-        // Remove the namespace by splitting on the colon (':') and taking the second part
-        const [, cleanedBlockTypeId] = blockTypeId.split(':');
+type BlockLogInfo = {
+    family: string;
+    isLog: boolean;
+}
+
+const validLogBlocks: RegExp = /(_log|_wood|crimson_stem|warped_stem|(?:brown|red_)?mushroom_block)$/;
 
-        // Split the remaining string by underscores
-        const parts = cleanedBlockTypeId.split('_');
+// Family and log-ness of every block id seen so far, seeded with the table generated
+// from the vanilla block ids so that a lookup is a single map probe.
+const blockLogInfo: Map<string, BlockLogInfo> = new Map(
+    Array.from(LOG_FAMILIES, ([blockTypeId, family]): [string, BlockLogInfo] => [blockTypeId, { family, isLog: true }])
+);
 
-        // Remove the last part (e.g., 'log', 'wood', 'stem')
-        return parts.slice(0, -1).join('_');
+function extractLogFamily(blockTypeId: string): string {
+    // Remove the namespace by splitting on the colon (':') and taking the second part
+    const [, cleanedBlockTypeId] = blockTypeId.split(':');
+
+    // Split the remaining string by underscores
+    const parts = cleanedBlockTypeId.split('_');
+
+    // Remove the last part (e.g., 'log', 'wood', 'stem')
+    return parts.slice(0, -1).join('_');
+}
+
+function getBlockLogInfo(blockTypeId: string): BlockLogInfo {
+    let info = blockLogInfo.get(blockTypeId);
+    if (!info) {
+        info = {
+            family: extractLogFamily(blockTypeId),
+            isLog: validLogBlocks.test(blockTypeId) && !blockTypeId.includes('stripped_')
+        };
+        blockLogInfo.set(blockTypeId, info);
     }
-    if(serverConfigurationCopy.excludedLog.values.includes(blockTypeId) || blockTypeId.includes('stripped_')) return false;
-    const extractedLogFamily = extractLogFamily(rootBlockTypeId);
-    const blockFamily = extractLogFamily(blockTypeId);
-    const isSameFamily = blockFamily === extractedLogFamily;
-    if((serverConfigurationCopy.includedLog.values.includes(blockTypeId) ||
-        validLogBlocks.test(blockTypeId)) && isSameFamily ) return true;
-    return false;
+    return info;
+}
+
+export function isLogIncluded(rootBlockTypeId: string, blockTypeId: string): boolean {
+    if(excludedLogs.has(blockTypeId)) return false;
+    const info = getBlockLogInfo(blockTypeId);
+    if(!info.isLog && (!includedLogs.has(blockTypeId) || blockTypeId.includes('stripped_'))) return false;
+    return info.family === getBlockLogInfo(rootBlockTypeId).family;
 }
 
 
@@ -34,6 +58,7 @@ export async function getTreeLogs(
     isInspectingTree: boolean = true
 ): Promise<VisitedBlockResult> {
     const firstBlock = dimension.getBlock(location);
+    const traversal = new TimingProbe('getTreeLogs');
     const visitedTree = await new Promise<VisitedBlockResult>((resolve) => {
         const graph = new Graph();
         const visitedTypeIDs: Map<string, number> = new Map();
@@ -91,6 +116,7 @@ export async function getTreeLogs(
             }
             
             system.clearJob(traversingTreeInterval);
+            traversal.end({ blocks: graph.getSize(), mode: isInspectingTree ? 'inspect' : 'chop' });
             resolve({
                 source: graph, 
                 blockOutlines: [], 
@@ -107,6 +133,7 @@ export async function getTreeLogs(
     const blockOutlines: Entity[] = [];
     const trunk = await getTreeTrunkSize(firstBlock, blockTypeId);
     return new Promise<VisitedBlockResult>((resolve) => {
+        const spawning = new TimingProbe('spawnOutlines');
         const t = system.runJob((function*(){
             // Create Block Entity based on the trunk. 
             for(const yOffset of visitedTree.yOffsets.keys()) {
@@ -127,6 +154,7 @@ export async function getTreeLogs(
                 yield;
             }
             system.clearJob(t);
+            spawning.end({ blocks: blockOutlines.length });
             resolve({
                 typeIds: visitedTree.typeIds,
                 source: visitedTree.source,
@@ -172,6 +200,7 @@ export function getTreeTrunkSize(blockInteracted: Block, blockTypeId: string): P
         const visited = new Set<string>(); // To avoid revisiting blocks
         const queue: Block[] = [blockInteracted]; // Queue for the floodfill process
         const originalY = blockInteracted.y; // Store the original Y position
+        const probe = new TimingProbe('getTreeTrunkSize');
 
         const t = system.runJob((function* () {
             while (queue.length > 0) {
@@ -218,6 +247,7 @@ export function getTreeTrunkSize(blockInteracted: Block, blockTypeId: string): P
             }
 
             system.clearJob(t);
+            probe.end({ blocks: i });
             fetchedTrunkSizeResolved({ center: centroidLog, size: i });
             return;
         })());
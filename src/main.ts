@@ -1,6 +1,6 @@
 import { world, ScriptEventCommandMessageAfterEvent, system, ScriptEventSource, Player, BlockPermutation, EntityEquippableComponent, EntityInventoryComponent, ItemDurabilityComponent, ItemEnchantableComponent, ItemLockMode, ItemStack, MolangVariableMap, Block, TicksPerSecond, Entity, ItemCooldownComponent } from '@minecraft/server';
 import { ADDON_IDENTIFIER, axeEquipments, originalDatabase, forceShow, getTreeLogs, getTreeTrunkSize, hashBlock, InteractedTreeResult, isLogIncluded, playerInteractedTimeLogMap, resetOutlinedTrees, SendMessageTo, serverConfigurationCopy, stackDistribution, VisitedBlockResult, visitedLogs} from "./index"
-import { Logger } from 'utils/logger';
+import { Logger, TimingProbe } from 'utils/logger';
 import './items/axes';
 import { MinecraftEnchantmentTypes, MinecraftBlockTypes } from 'modules/vanilla-types/index';
 import { Graph } from 'utils/graph';
@@ -217,6 +217,7 @@ world.beforeEvents.playerBreakBlock.subscribe((arg) => {
     }
     // /execute positioned -14462 84 11333 run fill ~1 ~ ~1 ~-1 ~10 ~-1 oak_log
     let size = 0;
+    const chopping = new TimingProbe('chopJob');
     system.runJob( (function* () {
       // Dust
       if(!(serverConfigurationCopy.immersiveMode.defaultValue) && isValidVerticalTree) {
@@ -270,6 +271,7 @@ world.beforeEvents.playerBreakBlock.subscribe((arg) => {
         }
         yield;
       }
+      chopping.end({ blocks: size });
       return;
     })());
     await system.waitTicks(3);
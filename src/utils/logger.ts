@@ -1,7 +1,7 @@
 // Import your configuration if necessary
 
 import { system } from "@minecraft/server";
-import { serverConfigurationCopy } from "index";
+import { serverConfigurationCopy } from "configuration/server_configuration";
 
 export enum LogLevel {
   DEBUG = 'DEBUG',
@@ -9,6 +9,12 @@ export enum LogLevel {
   ERROR = 'ERROR',
 }
 
+// Timing records are debug lines tagged with TIMING_TAG and followed by a JSON
+// object, so tools/timing_analyzer.py can pick them out of the content log.
+export const TIMING_TAG = 'timing';
+
+export type TimingFields = Record<string, number | string>;
+
 export class Logger {
   private static level: LogLevel = serverConfigurationCopy.debug.defaultValue ? LogLevel.DEBUG : LogLevel.INFO; // Default log level
 
@@ -51,4 +57,25 @@ export class Logger {
   static error(...message: any[]): void {
     if(serverConfigurationCopy.debug.defaultValue) Logger.log(LogLevel.ERROR, message);
   }
+
+  static timing(stage: string, fields: TimingFields): void {
+    if(serverConfigurationCopy.debug.defaultValue) Logger.log(LogLevel.DEBUG, `${TIMING_TAG} ${JSON.stringify({ stage, ...fields })}`);
+  }
+}
+
+// Measures a stage from its creation to end(), in game ticks and wall-clock
+// milliseconds. Stages spread over a system.runJob span several ticks.
+export class TimingProbe {
+  private readonly startTick: number = system.currentTick;
+  private readonly startTime: number = Date.now();
+
+  constructor(private readonly stage: string) {}
+
+  end(fields: TimingFields = {}): void {
+    Logger.timing(this.stage, {
+      ticks: system.currentTick - this.startTick,
+      ms: Date.now() - this.startTime,
+      ...fields
+    });
+  }
 }
\ No newline at end of file
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import socket
+import stat
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import build_daemon
+from build_daemon import BuildDaemon, request
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs Unix domain sockets')
+
+
+def fake_build(builds):
+    # Stands in for build.py: prints, records its arguments and fails with
+    # --fail.
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--watch', action='store_true')
+    parser.add_argument('--fail', action='store_true')
+    parser.add_argument('--target')
+
+    def main(argv):
+        builds.append(argv)
+        print('building', ' '.join(argv))
+        if parser.parse_args(argv).fail:
+            raise SystemExit('build failed')
+
+    return SimpleNamespace(parser=parser, main=main, profiler=SimpleNamespace(disable=lambda: None), compiler=None, tsc_path=None)
+
+def exchange(path, message):
+    # Everything the daemon answers to a request. The daemon redirects this
+    # process's stdout while it builds, so the client here must not echo.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(json.dumps(message).encode() + b'\n')
+        return b''.join(iter(lambda: conn.recv(4096), b'')).decode()
+
+@pytest.fixture
+def daemon(tmp_path):
+    # A daemon serving on a thread; short socket paths stay under the
+    # AF_UNIX length limit.
+    builds = []
+    path = str(tmp_path / 'd.sock')
+    server = BuildDaemon(path, idle=0)
+    server.build = fake_build(builds)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    while request({'command': 'status'}, path, echo=False) is None:
+        thread.join(0.01)
+    yield path, builds, thread
+    request({'command': 'stop'}, path, echo=False)
+    thread.join(5)
+    assert not os.path.exists(path)
+
+
+def test_socket_is_private(daemon):
+    path, _, _ = daemon
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+def test_builds_report_output_and_exit_code(daemon):
+    path, builds, _ = daemon
+    assert exchange(path, {'argv': ['--target', 'release']}) == 'building --target release\n\0exit 0\n'
+    assert exchange(path, {'argv': ['--fail']}) == 'building --fail\nbuild failed\n\0exit 1\n'
+    assert builds == [['--target', 'release'], ['--fail']]
+
+def test_watch_stays_in_the_client(daemon):
+    path, builds, _ = daemon
+    assert request({'argv': ['--watch']}, path, echo=False) == 'local'
+    assert builds == []
+
+def test_edited_tools_hand_the_build_back(daemon, monkeypatch):
+    path, builds, thread = daemon
+    restarts = []
+    monkeypatch.setattr(build_daemon, 'sources_state', lambda: {})
+    monkeypatch.setattr(os, 'execv', lambda *args: restarts.append(args))
+    assert request({'argv': []}, path, echo=False) == 'local'
+    assert builds == []
+    thread.join(5)
+    assert restarts and not os.path.exists(path)
@@ -0,0 +1,197 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from bundle_scripts import BundleError, bundle, find_typescript, script_entry
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not (shutil.which('node') and find_typescript()), reason='needs node and "npm install"')
+
+# Two modules declaring the same top-level names, read through shorthand
+# properties, property keys, members and locals shadowing them, plus a
+# default export, a re-export and a folder loaded with import() at the top
+# level of the entry.
+MODULES = {
+    'main.js': '''import { count, describe, shadow } from "./a.js";
+import { count as otherCount, label, Store } from "./b.js";
+import makeStore from "./store.js";
+const results = [];
+results.push(count, otherCount, describe(), label, shadow([2, 3]));
+const store = makeStore();
+results.push(store.count, new Store().count);
+const name = "one";
+const loaded = await import(`./handlers/${name}.js`);
+results.push(loaded.handle(2));
+console.log(JSON.stringify(results));
+''',
+    'a.js': '''export const count = 1;
+const label = "a";
+export function describe() {
+    const value = { count, label, nested: { count: 5 } };
+    return [value.count, value.label, value.nested.count];
+}
+export function shadow(list) {
+    let total = count;
+    for (const count of list) {
+        total += count;
+    }
+    try {
+        throw 3;
+    } catch (count) {
+        total += count;
+    }
+    {
+        const label = 100;
+        total += label;
+    }
+    const { count: first = 0, label: second = label } = {};
+    return [total, label, first, second];
+}
+''',
+    'b.js': '''export { Store } from "./store.js";
+export const count = 2;
+export const label = ((count) => `b${count}`)(count + 1);
+''',
+    'store.js': '''const count = 10;
+export class Store {
+    constructor() { this.count = count; }
+    get size() { return count; }
+}
+export default function () { return { count }; }
+''',
+    'handlers/one.js': '''import { count } from "../a.js";
+console.log("loading one");
+export function handle(value) { return value * 100 + count; }
+''',
+    'handlers/two.js': '''console.log("loading two");
+export function handle(value) { return -value; }
+''',
+}
+
+
+def write_modules(root, modules):
+    for path, source in modules.items():
+        os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+        with open(os.path.join(root, path), 'w', encoding='utf-8') as file:
+            file.write(source)
+    with open(os.path.join(root, 'package.json'), 'w', encoding='utf-8') as file:
+        file.write('{"type": "module"}\n')
+
+def run_node(path):
+    return subprocess.run(['node', path], capture_output=True, text=True, check=True, timeout=30).stdout
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+@pytest.fixture
+def scripts(tmp_path):
+    root = tmp_path / 'scripts'
+    write_modules(root, MODULES)
+    return root
+
+@pytest.fixture
+def out(scripts, tmp_path):
+    out = tmp_path / 'out'
+    bundle(str(scripts), 'main.js', str(out))
+    with open(out / 'package.json', 'w', encoding='utf-8') as file:
+        file.write('{"type": "module"}\n')
+    return out
+
+
+def test_clashing_names_are_renamed(out):
+    code = read(out / 'main.js') + read(out / 'chunks' / 'handlers' / 'one.js') + ''.join(
+        read(out / 'chunks' / name) for name in os.listdir(out / 'chunks') if name.startswith('shared-'))
+    # Every module's count is a different binding, and importers refer to the
+    # one they imported.
+    for declaration in ('const count$1=1;', 'const count$2=10;', 'const count$3=2;', 'const label$1="a";'):
+        assert declaration in code
+    assert 'results.push(count$1,count$3,describe(),label$2,shadow([2,3]))' in code
+    assert 'return value*100+count$1' in code
+    # Property keys and members keep their names and shorthand properties
+    # are spelled out.
+    assert '{count:count$1,label:label$1,nested:{count:5}}' in code
+    assert 'this.count=count$2' in code
+    assert 'return{count:count$2}' in code
+
+def test_shadowing_locals_keep_their_names(out):
+    code = read(out / 'main.js') + ''.join(
+        read(out / 'chunks' / name) for name in os.listdir(out / 'chunks') if name.startswith('shared-'))
+    # Parameters and block-scoped declarations shadowing a renamed binding
+    # are other bindings, and so are the references to them.
+    assert '((count)=>`b${count}`)(count$3+1)' in code
+    assert 'let total=count$1;for(const count of list){total+=count;}' in code
+    assert 'catch(count){total+=count;}' in code
+    assert '{const label=100;total+=label;}' in code
+    assert 'const{count:first=0,label:second=label$1}={};return[total,label$1,first,second];' in code
+
+def test_dynamic_imports_become_lazy_chunks(out):
+    main = read(out / 'main.js')
+    # Modules loaded with import() are left out of the entry, which loads
+    # their chunks on demand; the module they share with the entry moves to a
+    # chunk both import, so the entry's top-level await can't wait on itself.
+    assert 'loading' not in main
+    assert '"handlers/one.js":()=>import("./chunks/handlers/one.js")' in main
+    assert '"handlers/two.js":()=>import("./chunks/handlers/two.js")' in main
+    [shared] = [name for name in os.listdir(out / 'chunks') if name.startswith('shared-')]
+    assert f'from"./chunks/{shared}";' in main
+    assert f'import{{count$1}}from"../{shared}";' in read(out / 'chunks' / 'handlers' / 'one.js')
+    assert read(out / 'chunks' / 'handlers' / 'two.js').endswith('export{handle$2 as handle};\n')
+
+def test_bundle_behaves_like_the_modules(scripts, out):
+    expected = run_node(str(scripts / 'main.js'))
+    assert expected == 'loading one\n[1,2,[1,"a",5],"b3",[109,"a",0,"a"],10,10,201]\n'
+    # handlers/two.js is only loaded when it is imported.
+    assert run_node(str(out / 'main.js')) == expected
+
+def test_chunks_load_on_demand(tmp_path):
+    write_modules(tmp_path / 'scripts', {
+        'main.js': '''import { log } from "./log.js";
+log("main");
+export async function run(name) {
+    const { default: command } = await import(`./commands/${name}.js`);
+    return command();
+}
+''',
+        'log.js': 'export const lines = [];\nexport function log(line) { lines.push(line); }\n',
+        'commands/a.js': 'import { log, lines } from "../log.js";\nlog("a");\nexport default () => lines.join(",");\n',
+        'commands/b.js': 'import { log, lines } from "../log.js";\nlog("b");\nexport default () => lines.join(",");\n',
+    })
+    bundle(str(tmp_path / 'scripts'), 'main.js', str(tmp_path / 'out'))
+    with open(tmp_path / 'out' / 'package.json', 'w', encoding='utf-8') as file:
+        file.write('{"type": "module"}\n')
+    with open(tmp_path / 'run.mjs', 'w', encoding='utf-8') as file:
+        file.write('''const { run } = await import(process.argv[2]);
+console.log(await run("b"), await run("a"), await run("b"));
+''')
+    for root in ('scripts', 'out'):
+        result = run_node_args(str(tmp_path / 'run.mjs'), (tmp_path / root / 'main.js').as_uri())
+        # The log module runs once, before the commands, each of which runs
+        # once when first imported.
+        assert result == 'main,b main,b,a main,b,a\n'
+
+def run_node_args(path, *args):
+    return subprocess.run(['node', path, *args], capture_output=True, text=True, check=True, timeout=30).stdout
+
+def test_missing_export_fails(tmp_path):
+    write_modules(tmp_path / 'scripts', {'main.js': 'import { missing } from "./a.js";\nmissing();\n', 'a.js': 'export const present = 1;\n'})
+    with pytest.raises(BundleError, match='a.js does not export missing'):
+        bundle(str(tmp_path / 'scripts'), 'main.js', str(tmp_path / 'out'))
+
+def test_pack_scripts_bundle(tmp_path):
+    bp = os.path.join(REPO, 'BP')
+    out = tmp_path / 'bundle'
+    stats = bundle(os.path.join(bp, 'scripts'), script_entry(bp), str(out), source_map=True)
+    sources = []
+    for chunk in stats['chunks']:
+        source_map = json.loads(read(f'{out / chunk}.map'))
+        sources += source_map['sources']
+        assert read(out / chunk).endswith(f'//# sourceMappingURL={os.path.basename(chunk)}.map\n')
+    assert stats['chunks'][0] == 'main.js'
+    assert 'chunks/commands/help.js' in stats['chunks']
+    assert len(sources) == len(set(sources)) == stats['modules'] > 1
+    assert stats['bytes'] < stats['source_bytes']
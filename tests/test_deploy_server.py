@@ -0,0 +1,137 @@
+import ctypes
+import errno
+import json
+import os
+
+import pytest
+
+import deploy_server
+
+SCRIPT_UUID = '9717780a-c69f-4679-bbe6-dbf6dfcdd7de'
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def entries_of(root, top):
+    paths = [os.path.join(folder, filename) for folder, _, filenames in os.walk(root) for filename in filenames]
+    return sorted((path, f'{top}/{os.path.relpath(path, root).replace(os.sep, "/")}') for path in paths)
+
+@pytest.fixture
+def build(tmp_path):
+    bp, rp = str(tmp_path / 'build' / 'BP'), str(tmp_path / 'build' / 'RP')
+    write(os.path.join(bp, 'manifest.json'), json.dumps({'modules': [{'type': 'data', 'uuid': 'data'}, {'type': 'script', 'uuid': SCRIPT_UUID}]}))
+    write(os.path.join(bp, 'scripts', 'main.js'), 'main();')
+    write(os.path.join(rp, 'manifest.json'), '{}')
+    write(str(tmp_path / 'build' / 'variables.json'), '{"debug": false}')
+
+    def entries():
+        return (entries_of(bp, 'Axe BP') + entries_of(rp, 'Axe RP')
+            + [(str(tmp_path / 'build' / 'variables.json'), 'variables.json')])
+    entries.bp = bp
+    return entries
+
+@pytest.fixture
+def server(tmp_path):
+    return str(tmp_path / 'server')
+
+def live_bp(server):
+    return os.path.join(server, 'development_behavior_packs', 'Axe BP')
+
+def fallback_renameat2(*args):
+    # A renameat2 the filesystem doesn't support.
+    ctypes.set_errno(errno.EINVAL)
+    return -1
+
+
+def test_packs_and_variables_are_placed(build, server):
+    stats = deploy_server.deploy(server, build())
+    assert (stats['packs'], stats['copied'], stats['linked']) == (2, 3, 0)
+    assert read(os.path.join(live_bp(server), 'scripts', 'main.js')) == 'main();'
+    assert read(os.path.join(server, 'development_resource_packs', 'Axe RP', 'manifest.json')) == '{}'
+    # Scripts read their variables from the folder named after their module.
+    assert os.listdir(os.path.join(server, 'config')) == [SCRIPT_UUID]
+    assert read(os.path.join(server, 'config', SCRIPT_UUID, 'variables.json')) == '{"debug": false}'
+    assert sorted(os.listdir(os.path.join(server, 'development_behavior_packs'))) == ['Axe BP']
+
+def test_variables_without_a_script_module(build, server):
+    write(os.path.join(build.bp, 'manifest.json'), '{"modules": [{"type": "data", "uuid": "data"}]}')
+    deploy_server.deploy(server, build())
+    assert read(os.path.join(server, 'config', 'default', 'variables.json')) == '{"debug": false}'
+
+def test_unchanged_files_are_hardlinked(build, server):
+    deploy_server.deploy(server, build())
+    manifest = os.stat(os.path.join(live_bp(server), 'manifest.json'))
+    main = os.stat(os.path.join(live_bp(server), 'scripts', 'main.js'))
+
+    write(os.path.join(build.bp, 'scripts', 'main.js'), 'main(2);')
+    stats = deploy_server.deploy(server, build())
+    assert (stats['copied'], stats['linked'], stats['bytes']) == (1, 2, 8)
+    # The unchanged file is the same inode moved into the new pack; the changed
+    # one is a new file, so the old pack was never written to.
+    assert os.stat(os.path.join(live_bp(server), 'manifest.json')).st_ino == manifest.st_ino
+    assert os.stat(os.path.join(live_bp(server), 'scripts', 'main.js')).st_ino != main.st_ino
+    assert read(os.path.join(live_bp(server), 'scripts', 'main.js')) == 'main(2);'
+    # Staged folders, now holding the old packs, are gone.
+    assert sorted(os.listdir(os.path.join(server, 'development_behavior_packs'))) == ['Axe BP']
+
+def test_exchange_swaps_in_one_rename(tmp_path, monkeypatch):
+    if deploy_server.renameat2 is None:
+        pytest.skip('needs renameat2')
+    staged, live = str(tmp_path / 'staged'), str(tmp_path / 'live')
+    write(os.path.join(staged, 'new.txt'), 'new')
+    write(os.path.join(live, 'old.txt'), 'old')
+    monkeypatch.setattr(os, 'rename', lambda *args: pytest.fail('renamed live aside'))
+    try:
+        deploy_server.exchange(staged, live)
+    except OSError as err:
+        pytest.skip(f'renameat2 unsupported here: {err}')
+    assert os.listdir(live) == ['new.txt'] and os.listdir(staged) == ['old.txt']
+
+@pytest.mark.parametrize('renameat2', [None, fallback_renameat2])
+def test_exchange_falls_back_to_three_renames(tmp_path, monkeypatch, renameat2):
+    monkeypatch.setattr(deploy_server, 'renameat2', renameat2)
+    renames = []
+    rename = os.rename
+    monkeypatch.setattr(os, 'rename', lambda src, dst: renames.append((src, dst)) or rename(src, dst))
+    staged, live = str(tmp_path / 'staged'), str(tmp_path / 'live')
+    write(os.path.join(staged, 'new.txt'), 'new')
+    write(os.path.join(live, 'old.txt'), 'old')
+    deploy_server.exchange(staged, live)
+    assert renames == [(live, f'{staged}.old'), (staged, live), (f'{staged}.old', staged)]
+    assert os.listdir(live) == ['new.txt'] and os.listdir(staged) == ['old.txt']
+
+def test_exchange_errors_are_raised(tmp_path, monkeypatch):
+    def failing(*args):
+        ctypes.set_errno(errno.EACCES)
+        return -1
+    monkeypatch.setattr(deploy_server, 'renameat2', failing)
+    with pytest.raises(PermissionError):
+        deploy_server.exchange(str(tmp_path / 'staged'), str(tmp_path / 'live'))
+
+def test_fallback_deploys_the_same(build, server, monkeypatch):
+    monkeypatch.setattr(deploy_server, 'renameat2', None)
+    deploy_server.deploy(server, build())
+    write(os.path.join(build.bp, 'scripts', 'main.js'), 'main(2);')
+    deploy_server.deploy(server, build())
+    assert read(os.path.join(live_bp(server), 'scripts', 'main.js')) == 'main(2);'
+    assert sorted(os.listdir(os.path.join(server, 'development_behavior_packs'))) == ['Axe BP']
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='needs FIFOs')
+def test_reload_is_sent(build, server, tmp_path):
+    pipe = str(tmp_path / 'stdin')
+    os.mkfifo(pipe)
+    # Nobody reads the FIFO, so nothing is sent and nothing blocks.
+    assert not deploy_server.deploy(server, build(), pipe)['reloaded']
+    reader = os.open(pipe, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        assert deploy_server.deploy(server, build(), pipe)['reloaded']
+        assert os.read(reader, 64) == b'reload\n'
+    finally:
+        os.close(reader)
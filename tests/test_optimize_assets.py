@@ -0,0 +1,115 @@
+import glob
+import os
+import struct
+import zlib
+
+import pytest
+
+from optimize_assets import OPTIMIZER_VERSION, minify_json, optimize_trees, png_chunks, recompress_png
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bytes per pixel of 8-bit PNGs by colour type.
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+def decode_png(data):
+    # Rows of pixel bytes of an 8-bit, non-interlaced PNG, with the scanline
+    # filters undone.
+    chunks = list(png_chunks(data))
+    width, height, depth, colour, _, _, interlace = struct.unpack('>IIBBBBB', chunks[0][1])
+    assert depth == 8 and interlace == 0
+    bpp = CHANNELS[colour]
+    raw = zlib.decompress(b''.join(body for kind, body in chunks if kind == b'IDAT'))
+    stride = width * bpp
+    rows, previous = [], bytes(stride)
+    for y in range(height):
+        line = raw[y * (stride + 1):(y + 1) * (stride + 1)]
+        kind, row = line[0], bytearray(line[1:])
+        for x in range(stride):
+            a = row[x - bpp] if x >= bpp else 0
+            b = previous[x]
+            c = previous[x - bpp] if x >= bpp else 0
+            row[x] = (row[x] + (0, a, b, (a + b) // 2, paeth(a, b, c))[kind]) & 0xff
+        rows.append(bytes(row))
+        previous = row
+    return rows
+
+def png(width, height, rows, level=1, split=64):
+    # An RGBA PNG deflated at a low level and spread over several IDAT chunks,
+    # the way many editors write them.
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+    data = zlib.compress(b''.join(b'\x01' + row for row in rows), level)
+    idat = b''.join(chunk(b'IDAT', data[i:i + split]) for i in range(0, len(data), split))
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'tEXt', b'Comment\0axe') + idat + chunk(b'IEND', b'')
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_png_recompression_is_lossless():
+    rows = [bytes((x * 7 + y) & 0xff for x in range(64 * 4)) for y in range(32)]
+    data = png(64, 32, rows)
+    optimized = recompress_png(data)
+    assert len(optimized) < len(data)
+    assert decode_png(optimized) == decode_png(data)
+    # Every other chunk is kept as is, around one IDAT.
+    kinds = [kind for kind, _ in png_chunks(optimized)]
+    assert kinds == [b'IHDR', b'tEXt', b'IDAT', b'IEND']
+
+def test_pack_pngs_decode_the_same():
+    paths = glob.glob(os.path.join(REPO, 'RP', 'textures', '**', '*.png'), recursive=True)
+    assert paths
+    for path in paths:
+        data = read(path)
+        assert decode_png(recompress_png(data)) == decode_png(data), path
+
+def test_unreadable_pngs_are_kept():
+    data = png(4, 4, [bytes(16)] * 4)
+    start = data.index(b'IDAT') + 4
+    corrupt = data[:start] + b'\xff' * 8 + data[start + 8:]
+    for broken in (data[:start + 4], corrupt, b'GIF89a'):
+        assert recompress_png(broken) == broken
+
+def test_json_is_minified():
+    data = '﻿{\n    "format_version": 2,\n    "name": "Äxe",\n    "list": [1, 2]\n}\n'.encode('utf-8')
+    assert minify_json(data) == '{"format_version":2,"name":"Äxe","list":[1,2]}'.encode('utf-8')
+
+def test_json_with_duplicate_keys_is_kept():
+    # json.loads would keep only the last "damage", which isn't what the game
+    # reads, so the file is left as authored.
+    for data in (b'{"damage": 1, "damage": 2}', b'{"item": {"damage": 1, "damage": 2}}', b'[{"a": 1}, {"a": 1, "a": 1}]'):
+        assert minify_json(data) == data
+    assert minify_json(b'[{"a": 1}, {"a": 2}]') == b'[{"a":1},{"a":2}]'
+
+def test_stale_cache_entries_are_pruned(tmp_path):
+    src, dst, cache = str(tmp_path / 'BP'), str(tmp_path / 'out'), str(tmp_path / 'cache')
+    write(os.path.join(src, 'items', 'axe.json'), b'{ "damage": 1 }')
+    write(os.path.join(src, 'items', 'pick.json'), b'{ "damage": 2 }')
+    stats = optimize_trees([(src, dst)], cache, workers=1)
+    assert (stats['optimized'], stats['pruned']) == (2, 0)
+    assert len(os.listdir(cache)) == 2
+
+    # The results for an edited file's old content, a removed file and an
+    # older optimizer all go.
+    write(os.path.join(cache, f'{"0" * 64}-{OPTIMIZER_VERSION - 1}.json'), b'{}')
+    write(os.path.join(src, 'items', 'axe.json'), b'{ "damage": 3 }')
+    os.remove(os.path.join(src, 'items', 'pick.json'))
+    stats = optimize_trees([(src, dst)], cache, workers=1)
+    assert (stats['optimized'], stats['cached'], stats['pruned']) == (1, 0, 3)
+    assert [read(os.path.join(cache, name)) for name in os.listdir(cache)] == [b'{"damage":3}']
+    assert read(os.path.join(dst, 'items', 'axe.json')) == b'{"damage":3}'
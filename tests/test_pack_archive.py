@@ -0,0 +1,93 @@
+import os
+import zipfile
+
+import pytest
+
+from pack_archive import copy_atomic, pack_entries, stage_copy, write_archive
+
+
+@pytest.fixture
+def pack(tmp_path):
+    root = tmp_path / 'Axe BP'
+    files = {
+        'manifest.json': b'{"format_version": 2}',
+        'scripts/main.js': b'console.log("chop");\n' * 200,
+        'textures/noise.png': os.urandom(4096),
+        'texts/en_US.lang': 'pack.name=Äxe\n'.encode('utf-8'),
+        'empty.txt': b'',
+    }
+    for rel, data in files.items():
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(data)
+    return root, files
+
+def archive_bytes(path, entries, **options):
+    write_archive(str(path), entries, **options)
+    return path.read_bytes()
+
+
+def test_archive_is_byte_identical(pack, tmp_path, monkeypatch):
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    root, _ = pack
+    first = archive_bytes(tmp_path / 'first.zip', pack_entries(str(root), 'Axe BP'), workers=1)
+    # Other timestamps, permissions and worker counts change nothing.
+    for path, _ in pack_entries(str(root), 'Axe BP'):
+        os.utime(path, (1e9, 1e9))
+        os.chmod(path, 0o600)
+    second = archive_bytes(tmp_path / 'second.zip', pack_entries(str(root), 'Axe BP'), workers=8)
+    assert first == second
+
+def test_archive_round_trips(pack, tmp_path):
+    root, files = pack
+    path = tmp_path / 'pack.zip'
+    write_archive(str(path), pack_entries(str(root), 'Axe BP'))
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == sorted(f'Axe BP/{rel}' for rel in files)
+        for rel, data in files.items():
+            assert archive.read(f'Axe BP/{rel}') == data
+        methods = {info.filename: info.compress_type for info in archive.infolist()}
+    assert methods['Axe BP/scripts/main.js'] == zipfile.ZIP_DEFLATED
+    # Incompressible files are stored.
+    assert methods['Axe BP/textures/noise.png'] == zipfile.ZIP_STORED
+
+def test_entries_keep_their_given_order(pack, tmp_path):
+    root, _ = pack
+    entries = list(reversed(pack_entries(str(root), 'Axe BP')))
+    path = tmp_path / 'pack.zip'
+    write_archive(str(path), entries, compression='stored', workers=2)
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == [arcname for _, arcname in entries]
+
+def test_source_date_epoch_sets_timestamps(pack, tmp_path, monkeypatch):
+    root, _ = pack
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    path = tmp_path / 'pack.zip'
+    write_archive(str(path), pack_entries(str(root), 'Axe BP'))
+    with zipfile.ZipFile(path) as archive:
+        assert {info.date_time for info in archive.infolist()} == {(2023, 11, 14, 22, 13, 20)}
+
+def test_failed_write_keeps_previous_archive(pack, tmp_path):
+    root, _ = pack
+    path = tmp_path / 'pack.zip'
+    write_archive(str(path), pack_entries(str(root), 'Axe BP'))
+    before = path.read_bytes()
+    with pytest.raises(FileNotFoundError):
+        write_archive(str(path), pack_entries(str(root), 'Axe BP') + [(str(root / 'missing.js'), 'Axe BP/missing.js')])
+    assert path.read_bytes() == before
+    assert sorted(os.listdir(tmp_path)) == ['Axe BP', 'pack.zip']
+
+def test_staged_copies_are_private(pack, tmp_path):
+    root, files = pack
+    dst = tmp_path / 'out' / 'main.js'
+    # Two copies staged for the same file never share a temporary file, and
+    # dst is untouched until one is moved over it.
+    first, second = stage_copy(str(root / 'scripts/main.js'), str(dst)), stage_copy(str(root / 'manifest.json'), str(dst))
+    assert first != second and not dst.exists()
+    os.replace(second, dst)
+    os.replace(first, dst)
+    assert dst.read_bytes() == files['scripts/main.js']
+
+    copy_atomic(str(root / 'manifest.json'), str(dst))
+    assert dst.read_bytes() == files['manifest.json']
+    assert os.listdir(tmp_path / 'out') == ['main.js']
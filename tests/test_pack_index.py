@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import deploy_server, pack_archive
+from pack_index import apply_delta, build_index, make_delta
+
+MANIFEST = {'format_version': 2, 'header': {'version': [1, 0, 0]}, 'modules': [{'type': 'script', 'uuid': 'script-uuid'}]}
+V1 = {
+    'Axe BP/manifest.json': json.dumps(MANIFEST),
+    'Axe BP/scripts/main.js': 'console.log(1);',
+    'Axe BP/scripts/old.js': 'export {};',
+    'Axe RP/textures/axe.png': 'png',
+    'variables.json': '{"chopLimit": 64}',
+}
+V2 = {
+    'Axe BP/manifest.json': json.dumps(MANIFEST),
+    'Axe BP/scripts/main.js': 'console.log(2);',
+    'Axe BP/scripts/new.js': 'export const added = true;',
+    'Axe RP/textures/axe.png': 'png',
+    'variables.json': '{"chopLimit": 128}',
+}
+
+
+def build(tmp_path, name, files):
+    # Writes a build's files, its server.zip and its index.
+    entries = []
+    for arcname, text in files.items():
+        path = tmp_path / name / arcname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+        entries.append((str(path), arcname))
+    archive = str(tmp_path / f'{name}.zip')
+    pack_archive.write_archive(archive, entries)
+    return entries, build_index(entries, 'server', name, archive)
+
+def snapshot(server_dir):
+    files = {}
+    for dirpath, _, filenames in os.walk(server_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as file:
+                files[os.path.relpath(path, server_dir)] = file.read()
+    return files
+
+@pytest.fixture
+def builds(tmp_path):
+    old_entries, old = build(tmp_path, '1.0.0', V1)
+    new_entries, new = build(tmp_path, '1.0.1', V2)
+    server = str(tmp_path / 'server')
+    deploy_server.deploy(server, old_entries)
+    expected = str(tmp_path / 'expected')
+    deploy_server.deploy(expected, new_entries)
+    return old, new, server, snapshot(expected)
+
+
+def test_delta_lists_changes(builds, tmp_path):
+    old, new, _, _ = builds
+    delta = make_delta(old, new, str(tmp_path / 'delta.zip'))
+    assert sorted(delta['changed']) == ['Axe BP/scripts/main.js', 'Axe BP/scripts/new.js', 'variables.json']
+    assert list(delta['deleted']) == ['Axe BP/scripts/old.js']
+    assert delta['changed']['Axe BP/scripts/main.js']['previous'] == old['files']['Axe BP/scripts/main.js']['sha256']
+    assert delta['changed']['Axe BP/scripts/new.js']['previous'] is None
+    assert delta['packs'] == ['Axe BP', 'Axe RP']
+
+def test_applied_delta_matches_full_deploy(builds, tmp_path):
+    old, new, server, expected = builds
+    make_delta(old, new, str(tmp_path / 'delta.zip'))
+    _, stats = apply_delta(str(tmp_path / 'delta.zip'), server)
+    assert (stats['changed'], stats['deleted']) == (3, 1)
+    assert snapshot(server) == expected
+    assert b'128' in expected[os.path.join('config', 'script-uuid', 'variables.json')]
+    # Applying it again finds every file already patched.
+    apply_delta(str(tmp_path / 'delta.zip'), server)
+    assert snapshot(server) == expected
+
+def test_apply_refuses_modified_server(builds, tmp_path):
+    old, new, server, _ = builds
+    make_delta(old, new, str(tmp_path / 'delta.zip'))
+    live = os.path.join(deploy_server.pack_folder(server, 'Axe BP'), 'scripts', 'main.js')
+    with open(live, 'w', encoding='utf-8') as file:
+        file.write('edited on the server')
+    before = snapshot(server)
+    with pytest.raises(SystemExit, match='does not match v1.0.0'):
+        apply_delta(str(tmp_path / 'delta.zip'), server)
+    assert snapshot(server) == before
+
+def test_make_delta_refuses_rebuilt_archive(builds, tmp_path):
+    old, new, _, _ = builds
+    build(tmp_path, 'other', {**V2, 'Axe BP/scripts/main.js': 'console.log(3);'})
+    new = {**new, 'archive': str(tmp_path / 'other.zip')}
+    with pytest.raises(SystemExit, match='rebuild it first'):
+        make_delta(old, new, str(tmp_path / 'delta.zip'))
+    assert not os.path.exists(tmp_path / 'delta.zip')
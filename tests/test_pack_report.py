@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from bundle_scripts import find_typescript, module_graph
+from pack_report import build_report, category, check_budgets, effective_budgets
+from pack_archive import write_archive
+
+BUDGETS = {
+    'archive_kb': 100, 'raw_kb': 100, 'categories_raw_kb': {'BP/scripts': 2, 'RP/textures': 4},
+    'modules': 2, 'import_depth': 1, 'growth_percent': 10,
+    'bundled': {'archive_kb': 50, 'categories_raw_kb': {'BP/scripts': 1}},
+}
+
+
+def make_report(modules=2, depth=1, scripts_kb=1.5, archive_kb=10, bundled=False, version='1.0.0'):
+    return {
+        'version': version,
+        'archive': {'size': archive_kb * 1024, 'raw': 20 * 1024, 'compressed': 0},
+        'categories': {'BP/scripts': {'files': modules, 'size': scripts_kb * 1024, 'compressed': 0}},
+        'scripts': {'entry': 'main.js', 'bundled': bundled, 'modules': modules, 'depth': depth, 'bytes': 0},
+        'files': {},
+    }
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def test_categories():
+    assert category('Axe BP/scripts/main.js') == 'BP/scripts'
+    assert category('Axe RP/manifest.json') == 'RP'
+    assert category('variables.json') == 'config'
+
+def test_bundled_budgets_replace_the_others():
+    unbundled = effective_budgets(make_report(), BUDGETS)
+    assert unbundled['archive_kb'] == 100
+    assert unbundled['categories_raw_kb'] == {'BP/scripts': 2, 'RP/textures': 4}
+    assert 'bundled' not in unbundled
+    bundled = effective_budgets(make_report(bundled=True), BUDGETS)
+    assert bundled['archive_kb'] == 50
+    assert bundled['categories_raw_kb'] == {'BP/scripts': 1, 'RP/textures': 4}
+    assert bundled['modules'] == 2
+
+def test_check_budgets():
+    assert check_budgets(make_report(), None, BUDGETS) == []
+    assert check_budgets(make_report(bundled=True), None, BUDGETS) == ['BP/scripts is 1.5 KiB, over the budget of 1 KiB']
+    exceeded = check_budgets(make_report(modules=3, depth=2), None, BUDGETS)
+    assert exceeded == ['script modules is 3, over the budget of 2', 'import depth is 2, over the budget of 1']
+
+def test_growth_only_compares_builds_bundled_alike():
+    previous = make_report(archive_kb=5, bundled=True, version='0.9.0')
+    assert check_budgets(make_report(archive_kb=10), previous, BUDGETS) == []
+    previous['scripts']['bundled'] = False
+    assert check_budgets(make_report(archive_kb=10), previous, BUDGETS) == \
+        ['archive growth since v0.9.0 is 100.0%, over the budget of 10%']
+
+@pytest.mark.skipif(not (shutil.which('node') and find_typescript()), reason='needs node and "npm install"')
+def test_report_follows_the_source_modules(tmp_path):
+    scripts = tmp_path / 'BP' / 'scripts'
+    write(str(tmp_path / 'BP' / 'manifest.json'), json.dumps({'modules': [{'type': 'script', 'entry': 'scripts/main.js'}]}))
+    write(str(scripts / 'main.js'), 'import { a } from "./lib/a.js";\nimport("./lazy.js");\n')
+    write(str(scripts / 'lib' / 'a.js'), 'import { world } from "@minecraft/server";\nimport "utils/b";\nexport const a = 1;\n')
+    write(str(scripts / 'utils' / 'b.js'), 'export {};\n')
+    write(str(scripts / 'lazy.js'), 'export {};\n')
+    assert module_graph(str(scripts), 'main.js') == {'main.js': 0, 'lib/a.js': 1, 'lazy.js': 1, 'utils/b.js': 2}
+
+    # A bundled archive holds chunks, but the graph is that of the modules.
+    archive = str(tmp_path / 'pack.zip')
+    write_archive(archive, [(str(tmp_path / 'BP' / 'manifest.json'), 'Axe BP/manifest.json'), (str(scripts / 'main.js'), 'Axe BP/scripts/main.js')])
+    report = build_report(archive, 'release', '1.0.0', str(tmp_path / 'BP'), bundled=True)
+    assert report['scripts'] == {'entry': 'main.js', 'bundled': True, 'modules': 4, 'depth': 2,
+        'bytes': sum(os.path.getsize(scripts / path) for path in ('main.js', 'lib/a.js', 'utils/b.js', 'lazy.js'))}
+    assert report['categories']['BP/scripts']['files'] == 1
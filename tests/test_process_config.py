@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import pytest
+
+import process_config
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    for folder in ('src', 'setup'):
+        shutil.copytree(os.path.join(REPO, folder), tmp_path / folder)
+    (tmp_path / 'BP' / 'scripts').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_log_families_come_from_the_typings_source(project):
+    families = process_config.load_log_families()
+    assert families['minecraft:oak_log'] == 'oak'
+    assert families['minecraft:cherry_wood'] == 'cherry'
+    assert families['minecraft:crimson_stem'] == 'crimson'
+    assert not any('stripped_' in block_id for block_id in families)
+
+def test_config_generates_before_scripts_are_compiled(project):
+    # What build.py --clean --watch does: the compiled scripts are gone
+    # when the configuration is generated.
+    assert process_config.generate_config('debug')
+    log_blocks = (project / 'BP' / 'scripts' / 'configuration' / 'log_blocks.js').read_text(encoding='utf-8')
+    assert '["minecraft:spruce_log", "spruce"]' in log_blocks
+    with open(os.path.join(REPO, process_config.LOG_BLOCKS_TS_PATH), encoding='utf-8') as file:
+        assert (project / process_config.LOG_BLOCKS_TS_PATH).read_text(encoding='utf-8') == file.read()
+
+def test_missing_or_foreign_typings_fail(project):
+    with pytest.raises(SystemExit, match='does not exist'):
+        process_config.load_log_families('missing.ts')
+    (project / 'other.ts').write_text('BlockTypes.get("minecraft:oak_log")\n', encoding='utf-8')
+    with pytest.raises(SystemExit, match='Only 2 log blocks'):
+        process_config.load_log_families(str(project / 'other.ts'))
+
+def test_identical_content_is_not_rewritten(tmp_path, monkeypatch):
+    path = tmp_path / 'config.js'
+    assert process_config.write_if_changed(str(path), 'export const a = 1;\n')
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    with monkeypatch.context() as patch:
+        patch.setattr(process_config.json_cache, 'write_atomic', lambda *args: pytest.fail('rewrote the file'))
+        assert not process_config.write_if_changed(str(path), 'export const a = 1;\n')
+    assert path.stat().st_mtime_ns == 1_000_000_000
+    assert process_config.write_if_changed(str(path), 'export const a = 2;\n')
+    assert path.read_text(encoding='utf-8') == 'export const a = 2;\n'
+    assert path.stat().st_mtime_ns != 1_000_000_000
+
+def test_regenerating_the_config_touches_nothing(project):
+    assert process_config.generate_config('debug')
+    files = [path for path in project.rglob('*') if path.is_file()]
+    for path in files:
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    assert not process_config.generate_config('debug')
+    assert [path for path in files if path.stat().st_mtime_ns != 1_000_000_000] == []
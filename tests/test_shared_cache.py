@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from process_config import compute_hash
+from shared_cache import SharedCache, stage_key
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def files_in(folder):
+    return [os.path.join(dirpath, filename) for dirpath, _, filenames in os.walk(folder) for filename in filenames]
+
+def set_mtime(path, seconds_ago):
+    moment = time.time() - seconds_ago
+    os.utime(path, (moment, moment))
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Outputs are stored by their path relative to the project.
+    (tmp_path / 'project').mkdir()
+    monkeypatch.chdir(tmp_path / 'project')
+    return SharedCache(str(tmp_path / 'cache'), max_bytes=1 << 20)
+
+def store(cache, name, files):
+    for path, text in files.items():
+        write(path, text)
+    cache.store(stage_key(name, ''), list(files), compute_hash)
+    return stage_key(name, '')
+
+
+def test_restore_replaces_outputs(cache):
+    key = store(cache, 'scripts', {'out/main.js': 'main', 'out/lib/a.js': 'a'})
+    write('out/main.js', 'changed')
+    write('out/stale.js', 'stale')
+    os.remove('out/lib/a.js')
+    assert cache.restore(key, ['out'], lambda outputs: files_in(outputs[0]))
+    assert sorted(files_in('out')) == [os.path.join('out', 'lib', 'a.js'), os.path.join('out', 'main.js')]
+    assert read('out/main.js') == 'main'
+    assert read('out/lib/a.js') == 'a'
+
+def test_restore_never_writes_through_links(cache):
+    key = store(cache, 'scripts', {'out/main.js': 'main'})
+    write('elsewhere.js', 'keep')
+    os.remove('out/main.js')
+    os.link('elsewhere.js', 'out/main.js')
+    assert cache.restore(key, ['out'], lambda outputs: files_in(outputs[0]))
+    assert read('out/main.js') == 'main'
+    assert read('elsewhere.js') == 'keep'
+
+def test_identical_contents_are_stored_once(cache):
+    store(cache, 'a', {'a.js': 'same'})
+    store(cache, 'b', {'b.js': 'same'})
+    entries, refs, sizes = cache.usage()
+    assert len(entries) == 2
+    assert list(refs.values()) == [2]
+    assert cache.added == len('same')
+
+def test_missing_entry_or_object_is_a_miss(cache):
+    assert not cache.restore(stage_key('none', ''), ['out'], lambda outputs: [])
+    key = store(cache, 'scripts', {'out/main.js': 'main'})
+    os.remove(cache.object_path(compute_hash('out/main.js')))
+    assert not cache.restore(key, ['out'], lambda outputs: files_in(outputs[0]))
+    assert read('out/main.js') == 'main'
+
+def test_evict_drops_least_recently_restored(cache):
+    first = store(cache, 'first', {'shared.js': 'x' * 100})
+    second = store(cache, 'second', {'shared2.js': 'x' * 100, 'own.js': 'y' * 100})
+    third = store(cache, 'third', {'third.js': 'z' * 100})
+    for key, seconds_ago in ((first, 30), (second, 20), (third, 10)):
+        set_mtime(cache.entry_path(key), seconds_ago)
+    # Restoring touches the entry, so first becomes the most recent.
+    assert cache.restore(first, ['out'], lambda outputs: [])
+    assert cache.evict(max_bytes=250) == (1, 200)
+    assert not os.path.exists(cache.entry_path(second))
+    assert not os.path.exists(cache.object_path(compute_hash('own.js')))
+    # The object second shared with first stays.
+    assert os.path.exists(cache.object_path(compute_hash('shared.js')))
+    assert cache.evict(max_bytes=0) == (2, 0)
+    assert not os.listdir(os.path.join(cache.root, 'entries'))
+
+def test_evict_keeps_young_orphans_and_files_being_written(cache):
+    store(cache, 'scripts', {'main.js': 'main'})
+    orphan = cache.object_path('ab' * 32)
+    write(orphan, 'orphan')
+    partial = cache.object_path(compute_hash('main.js')) + '.123.tmp'
+    write(partial, 'partial')
+    assert cache.evict(grace=60) == (0, len('main') + len('orphan'))
+    assert os.path.exists(orphan)
+    set_mtime(orphan, 120)
+    assert cache.evict(grace=60) == (0, len('main'))
+    assert not os.path.exists(orphan)
+    assert os.path.exists(partial)
+
+def test_trim_only_evicts_after_a_store(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache, 'evict', lambda: calls.append(True))
+    cache.trim()
+    assert not calls
+    store(cache, 'scripts', {'main.js': 'main'})
+    cache.trim()
+    assert calls
@@ -0,0 +1,157 @@
+import importlib
+import os
+import time
+
+import pytest
+
+sync2com_mojang = importlib.import_module('sync2com-mojang')
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def files_in(folder):
+    return sorted(os.path.relpath(os.path.join(dirpath, filename), folder).replace(os.sep, '/')
+        for dirpath, _, filenames in os.walk(folder) for filename in filenames)
+
+def stats(copied=0, size=0, deleted=0, unchanged=0):
+    return {'copied': copied, 'bytes': size, 'deleted': deleted, 'unchanged': unchanged}
+
+@pytest.fixture
+def pack(tmp_path):
+    src, dst = str(tmp_path / 'BP'), str(tmp_path / 'com.mojang' / 'development_behavior_packs' / 'Axe BP')
+    write(os.path.join(src, 'manifest.json'), '{}')
+    write(os.path.join(src, 'scripts', 'main.js'), 'main();')
+    return src, dst, str(tmp_path / 'sync_index.json')
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def queue():
+    batches = []
+    clock = Clock()
+    queue = sync2com_mojang.EventQueue(batches.append, debounce=0.25, clock=clock)
+    queue.batches, queue.clock = batches, clock
+    return queue
+
+
+def test_index_round_trip(pack, monkeypatch):
+    src, dst, index = pack
+    sync = sync2com_mojang.DeltaSync([(src, dst)], index)
+    assert sync.sync_all() == stats(copied=2, size=9)
+    assert files_in(dst) == ['manifest.json', 'scripts/main.js']
+    assert read(os.path.join(dst, 'scripts', 'main.js')) == 'main();'
+
+    # A new sync reads the index back and knows every file is current from
+    # a stat alone, without hashing anything.
+    again = sync2com_mojang.DeltaSync([(src, dst)], index)
+    assert again.index == sync.index
+    monkeypatch.setattr(sync2com_mojang, 'compute_hash', lambda path: pytest.fail(f'hashed {path}'))
+    assert again.sync_all() == stats(unchanged=2)
+
+def test_removed_files_are_deleted(pack):
+    src, dst, index = pack
+    sync = sync2com_mojang.DeltaSync([(src, dst)], index)
+    sync.sync_all()
+    os.remove(os.path.join(src, 'scripts', 'main.js'))
+    assert sync.sync_all() == stats(deleted=1, unchanged=1)
+    # The folder it emptied goes too, and the index forgets the file.
+    assert files_in(dst) == ['manifest.json']
+    assert not os.path.exists(os.path.join(dst, 'scripts'))
+    assert list(sync2com_mojang.DeltaSync([(src, dst)], index).entries(dst)) == ['manifest.json']
+
+    # A batch of watch events deletes what it names.
+    write(os.path.join(src, 'items', 'axe.json'), '{}')
+    assert sync.sync_paths([os.path.join(src, 'items', 'axe.json')]) == stats(copied=1, size=2)
+    os.remove(os.path.join(src, 'items', 'axe.json'))
+    assert sync.sync_paths([os.path.join(src, 'items', 'axe.json')]) == stats(deleted=1)
+    assert files_in(dst) == ['manifest.json']
+
+def test_unchanged_files_are_skipped(pack):
+    src, dst, index = pack
+    sync = sync2com_mojang.DeltaSync([(src, dst)], index)
+    sync.sync_all()
+    main = os.path.join(dst, 'scripts', 'main.js')
+    copied_at = os.stat(main).st_mtime_ns
+
+    # Saving a file without changing it only refreshes the index.
+    later = time.time() + 10
+    os.utime(os.path.join(src, 'scripts', 'main.js'), (later, later))
+    assert sync.sync_all() == stats(unchanged=2)
+    assert os.stat(main).st_mtime_ns == copied_at
+
+    write(os.path.join(src, 'scripts', 'main.js'), 'main(1);')
+    assert sync.sync_all() == stats(copied=1, size=8, unchanged=1)
+    assert read(main) == 'main(1);'
+    # Files are staged beside their destination and moved in; none is left.
+    assert files_in(dst) == ['manifest.json', 'scripts/main.js']
+
+def test_events_are_debounced_into_one_batch(queue):
+    queue.put('BP/a.json')
+    queue.clock.advance(0.1)
+    queue.put('BP/b.json')
+    queue.put('BP/a.json')
+    # Every event restarts the window.
+    queue.clock.advance(0.2)
+    assert queue.pending() == pytest.approx(0.05)
+    assert not queue.poll()
+    queue.clock.advance(0.05)
+    assert queue.poll()
+    # Each path once, with the time of its first event.
+    assert queue.batches == [{'BP/a.json': 100.0, 'BP/b.json': 100.1}]
+    assert queue.pending() is None and queue.paths == {}
+
+def test_held_queue_flushes_on_release(queue):
+    queue.hold()
+    queue.put('BP/scripts/main.js')
+    queue.clock.advance(10)
+    assert queue.pending() is None
+    assert not queue.poll()
+    # Released, the batch goes out at once rather than after another window.
+    queue.release()
+    assert queue.pending() == 0
+    assert queue.poll()
+    assert queue.batches == [{'BP/scripts/main.js': 100.0}]
+    # A release with nothing queued has nothing to flush.
+    queue.release()
+    assert queue.pending() is None
+
+def test_tsc_output_holds_batches(queue):
+    queue.feed_tsc_line('[12:00:00 AM] File change detected. Starting incremental compilation...\n')
+    queue.put('BP/scripts/main.js')
+    queue.clock.advance(1)
+    queue.put('BP/scripts/commands/help.js')
+    queue.clock.advance(1)
+    assert not queue.poll()
+    queue.feed_tsc_line('[12:00:02 AM] Found 0 errors. Watching for file changes.\n')
+    assert queue.poll()
+    assert queue.batches == [{'BP/scripts/main.js': 100.0, 'BP/scripts/commands/help.js': 101.0}]
+
+    # Other lines leave the queue as it is.
+    queue.feed_tsc_line('src/main.ts(1,1): error TS1005: \';\' expected.\n')
+    queue.put('RP/textures/axe.png')
+    queue.clock.advance(0.25)
+    assert queue.poll()
+    assert queue.batches[-1] == {'RP/textures/axe.png': 102.0}
+
+def test_close_flushes_the_last_batch(queue):
+    queue.start()
+    queue.hold()
+    queue.put('BP/manifest.json')
+    queue.close()
+    assert queue.batches == [{'BP/manifest.json': 100.0}]
+    assert not queue.thread.is_alive()
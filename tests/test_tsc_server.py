@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from build_daemon import Compiler, typescript_package
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The typescript devDependency of package.json, installed by "npm install".
+NODE_MODULES = os.path.join(REPO, 'node_modules')
+TSC = os.path.join(NODE_MODULES, '.bin', 'tsc.cmd' if os.name == 'nt' else 'tsc')
+
+pytestmark = pytest.mark.skipif(not (shutil.which('node') and os.path.isfile(TSC)), reason='needs node and "npm install"')
+
+
+def project(root):
+    shutil.copytree(os.path.join(REPO, 'src'), root / 'src')
+    shutil.copy(os.path.join(REPO, 'tsconfig.json'), root)
+    os.symlink(NODE_MODULES, root / 'node_modules', target_is_directory=True)
+    return root
+
+def outputs(root):
+    files = {}
+    for dirpath, _, filenames in os.walk(root / 'BP'):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as file:
+                files[os.path.relpath(path, root)] = file.read()
+    return files
+
+@pytest.fixture
+def projects(tmp_path, monkeypatch):
+    (tmp_path / 'cold').mkdir()
+    (tmp_path / 'warm').mkdir()
+    cold, warm = project(tmp_path / 'cold'), project(tmp_path / 'warm')
+    # The warm compiler builds the project it was started in.
+    monkeypatch.chdir(warm)
+    compiler = Compiler(TSC, typescript_package(TSC))
+    assert compiler.typescript
+    yield cold, warm, compiler
+    compiler.stop()
+
+
+def test_warm_builds_match_cold_tsc(projects, capfd):
+    cold, warm, compiler = projects
+
+    def build():
+        code = subprocess.run([TSC, '-b'], cwd=cold, capture_output=True, text=True)
+        capfd.readouterr()
+        assert compiler.build() == code.returncode
+        assert capfd.readouterr().out == code.stdout
+        assert outputs(warm) == outputs(cold)
+
+    def both(change):
+        for root in (cold, warm):
+            change(root)
+        build()
+
+    build()
+    assert any(path.endswith('tsbuildinfo') for path in outputs(warm))
+    # An edited source, an output removed by a clean, and nothing to do.
+    both(lambda root: (root / 'src' / 'utils' / 'graph.ts').open('a').write('\nexport const edited = 1;\n'))
+    both(lambda root: os.remove(root / 'BP' / 'scripts' / 'main.js'))
+    both(lambda root: None)
+    assert compiler.process.poll() is None
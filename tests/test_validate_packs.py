@@ -0,0 +1,38 @@
+import os
+import shutil
+
+import pytest
+
+import validate_packs
+from validate_packs import PackValidator
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def packs(tmp_path):
+    for pack in ('BP', 'RP'):
+        shutil.copytree(os.path.join(REPO, pack), tmp_path / pack)
+    return (('BP', str(tmp_path / 'BP')), ('RP', str(tmp_path / 'RP'))), str(tmp_path / 'cache.json')
+
+def validate(packs, cache):
+    return PackValidator(packs, cache, workers=2).validate()
+
+
+def test_cached_run_finds_the_same_problems(packs, monkeypatch):
+    problems, files, parsed = validate(*packs)
+    assert parsed == files > validate_packs.POOL_THRESHOLD
+    assert validate(*packs) == (problems, files, 0)
+    # Parsing in this process finds what the pool found.
+    monkeypatch.setattr(validate_packs, 'POOL_THRESHOLD', files)
+    os.remove(packs[1])
+    assert validate(*packs) == (problems, files, files)
+
+def test_edited_file_is_parsed_again(packs):
+    problems, files, _ = validate(*packs)
+    path = os.path.join(packs[0][1][1], 'textures', 'item_texture.json')
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{')
+    new_problems, _, parsed = validate(*packs)
+    assert parsed == 1
+    assert [problem for problem in new_problems if problem not in problems][0][:2] == ('error', path.replace(os.sep, '/'))
@@ -0,0 +1,159 @@
+import json, argparse
+import copy
+import importlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import process_config, process_manifest, pack_archive, synthetic_pack
+sync2com_mojang = importlib.import_module('sync2com-mojang')
+
+# Timings only compare against runs on the same machine, so the baseline is
+# local and stays untracked under builds/; each checkout saves its own with
+# --save-baseline before comparing.
+BASELINE_PATH = 'builds/benchmark_baseline.json'
+
+
+def tree_bytes(root):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(root) for name in names)
+
+def measure(fn, setup=None, repeat=5):
+    # Best and median wall time over repeat runs, plus the peak Python heap
+    # allocated by fn (tracemalloc only runs for the last, separate pass).
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'best': min(times), 'median': statistics.median(times), 'peak_kib': peak / 1024}
+
+def run_benchmarks(project, dest, repeat):
+    # Every tool runs with the synthetic project as the working directory and
+    # a temporary folder standing in for com.mojang.
+    results = {}
+    bp_dest, rp_dest = os.path.join(dest, 'development_behavior_packs/Bench BP'), os.path.join(dest, 'development_resource_packs/Bench RP')
+    index_path = os.path.join(dest, 'sync_index.json')
+    pack_bytes = tree_bytes('BP') + tree_bytes('RP')
+    pack_files = sum(len(names) for root in ('BP', 'RP') for _, _, names in os.walk(root))
+
+    def record(name, result, amount, unit):
+        result['throughput'] = amount / result['best'] if result['best'] else 0
+        result['unit'] = unit
+        results[name] = result
+
+    settings = process_config.load_settings('debug')
+    record('generateScript', measure(lambda: process_config.generateScript(settings, '1.0.0', False), repeat=repeat * 20),
+        len(settings), 'settings/s')
+
+    def reset_config():
+        process_config.last_checked = None
+        for path in (process_config.CONFIG_TS_PATH, process_config.CONFIG_JS_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+    record('check_for_changes (cold)', measure(lambda: process_config.check_for_changes('debug'), reset_config, repeat),
+        len(settings), 'settings/s')
+    process_config.check_for_changes('debug')
+    record('check_for_changes (warm)', measure(lambda: process_config.check_for_changes('debug'), repeat=repeat * 20),
+        1, 'checks/s')
+
+    manifest = process_manifest.load_manifest()
+    module = manifest['bp_modules'][0]
+    manifest['bp_modules'] = [dict(module, description=f'module {i}') for i in range(pack_files)]
+    record('processJsonElement', measure(lambda: process_manifest.processJsonElement(copy.deepcopy(manifest), {}, {}), repeat=repeat),
+        pack_files, 'modules/s')
+
+    def clear_dest():
+        shutil.rmtree(dest, ignore_errors=True)
+    def sync():
+        sync2com_mojang.DeltaSync([('BP', bp_dest), ('RP', rp_dest)], index_path).sync_all()
+    record('sync_all (cold)', measure(sync, clear_dest, repeat), pack_bytes, 'bytes/s')
+    sync()
+    record('sync_all (no-op)', measure(sync, repeat=repeat), pack_files, 'files/s')
+
+    entries = pack_archive.pack_entries('BP', 'Bench BP') + pack_archive.pack_entries('RP', 'Bench RP')
+    archive = os.path.join(dest, 'bench.mcaddon')
+    for compression in ('stored', 'deflate'):
+        record(f'write_archive ({compression})', measure(lambda: pack_archive.write_archive(archive, entries, compression), repeat=repeat),
+            pack_bytes, 'bytes/s')
+    return results
+
+def format_rate(value, unit):
+    if unit == 'bytes/s':
+        return f'{value / 1024 / 1024:.1f} MiB/s'
+    return f'{value:,.0f} {unit}'
+
+def report(results, baseline, tolerance):
+    regressions = []
+    print(f'{"benchmark":<28} {"best ms":>10} {"median ms":>10} {"throughput":>22} {"peak KiB":>10} {"vs baseline":>12}')
+    for name, result in results.items():
+        versus = ''
+        if name in baseline:
+            ratio = result['best'] / baseline[name]['best'] if baseline[name]['best'] else 1
+            versus = f'{ratio:.2f}x'
+            if ratio > 1 + tolerance:
+                versus += ' !'
+                regressions.append(name)
+        print(f'{name:<28} {result["best"] * 1000:>10.2f} {result["median"] * 1000:>10.2f} '
+            f'{format_rate(result["throughput"], result["unit"]):>22} {result["peak_kib"]:>10.1f} {versus:>12}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the build tools against a synthetic pack.')
+    parser.add_argument('--scale', type=float, default=1, help='Multiplier applied to the synthetic pack size.')
+    parser.add_argument('--files', type=int, default=synthetic_pack.DEFAULTS['files'], help='Number of BP item/entity definitions.')
+    parser.add_argument('--texture-bytes', type=int, default=synthetic_pack.DEFAULTS['texture_bytes'], help='Total bytes of RP textures.')
+    parser.add_argument('--scripts', type=int, default=synthetic_pack.DEFAULTS['scripts'], help='Number of script modules in BP/scripts.')
+    parser.add_argument('--settings', type=int, default=synthetic_pack.DEFAULTS['settings'], help='Number of entries in configuration_settings.json.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark; the best run is reported.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help=f'Baseline results to compare against (default: {BASELINE_PATH}, local to this machine and untracked).')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline before a benchmark counts as regressed.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    repo = os.getcwd()
+    baseline_path = os.path.abspath(args.baseline)
+    workdir = tempfile.mkdtemp(prefix='lumber-axe-bench-')
+    try:
+        project = synthetic_pack.generate(os.path.join(workdir, 'project'), int(args.files * args.scale),
+            int(args.texture_bytes * args.scale), int(args.scripts * args.scale), int(args.settings * args.scale))
+        os.chdir(project)
+        results = run_benchmarks(project, os.path.join(workdir, 'com.mojang'), args.repeat)
+    finally:
+        os.chdir(repo)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        with open(baseline_path, 'r') as file:
+            baseline = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(f'no baseline at {args.baseline}; run with --save-baseline to record one on this machine.')
+        baseline = {}
+    regressions = report(results, baseline, args.tolerance)
+    if sys.platform.startswith('linux'):
+        import resource
+        print(f'peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB')
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'baseline saved to {args.baseline}')
+    if regressions:
+        sys.exit(f'regressed against baseline: {", ".join(regressions)}')
@@ -1,160 +1,407 @@
 from pathlib import Path
-import subprocess, sys, os, shutil
+from concurrent.futures import ProcessPoolExecutor
+import subprocess, sys, os, shutil, time
 import argparse, re, json
 
+import importlib
+from build_graph import BuildGraph
+import process_manifest, process_config, build_daemon, pack_archive, optimize_assets, bundle_scripts, deploy_server, pack_index, pack_report, shared_cache, validate_packs
+from profiler import profiler, DEFAULT_TRACE
+sync2com_mojang = importlib.import_module('sync2com-mojang')
+
+TARGETS = ['release', 'debug', 'server']
+
+def parse_targets(value):
+    targets = TARGETS if value == 'all' else [target.strip() for target in value.split(',')]
+    for target in targets:
+        if target not in TARGETS:
+            raise argparse.ArgumentTypeError(f'invalid target {target!r} (choose from {", ".join(TARGETS)} or all)')
+    return list(dict.fromkeys(targets))
+
 parser = argparse.ArgumentParser(description='Build and package the addon.')
 parser.add_argument('--init', '-i', action='store_true', help='Initialize "BP/scripts" folder if it does not exist.')
 parser.add_argument('--watch', '-w', choices=['stable', 'preview', 'server'], help='Whether to continually build and where to sync the project while editing it.')
-parser.add_argument('--target', choices=['release', 'debug', 'server'], default='debug', help='Whether to build the addon in debug or release mode.')
+parser.add_argument('--target', type=parse_targets, default=['debug'], help='Whether to build the addon in debug or release mode. Either one of release, debug, server, a comma separated list, or "all" to build each target into builds/<target>.')
 parser.add_argument('--clean', '-c', action='store_true', help='Clean "BP/scripts" folder before building.')
 parser.add_argument('--package-only', '-p', action='store_true', help='Only package what\'s already there.')
-args = parser.parse_args()
+parser.add_argument('--force', '-f', action='store_true', help='Ignore the build cache and run every stage.')
+parser.add_argument('--compression', choices=['stored', 'deflate'], default='deflate', help='How entries of the .mcaddon / server.zip are compressed.')
+parser.add_argument('--level', type=int, choices=range(0, 10), default=pack_archive.DEFAULT_LEVEL, metavar='[0-9]', help='Deflate compression level for packaging.')
+parser.add_argument('--optimize', action=argparse.BooleanOptionalAction, help='Whether to minify JSON and recompress PNGs before packaging. Defaults to on for release and server builds.')
+parser.add_argument('--bundle', action=argparse.BooleanOptionalAction, help='Whether to bundle, tree-shake and minify the scripts before packaging, into the entry module and a chunk per module loaded with import(). Defaults to on for release and server builds.')
+parser.add_argument('--source-map', action='store_true', help='Package a source map with the bundled scripts.')
+parser.add_argument('--staging', choices=['none', 'link'], help='Whether to keep "builds/<name> BP|RP" folders (hardlinked mirrors). Defaults to "link" for debug builds and "none" otherwise.')
+parser.add_argument('--profile', nargs='?', const=DEFAULT_TRACE, metavar='TRACE', help=f'Profile every stage and write a Chrome trace (default: {DEFAULT_TRACE}) plus a text summary.')
+parser.add_argument('--validate', choices=['none', 'warn', 'strict'], default='warn', help='Whether to check the packs for invalid files and broken references, and whether errors fail the build.')
+parser.add_argument('--budget', choices=['warn', 'strict'], default='strict', help=f'Whether packaged builds over the size and module budgets in {pack_report.BUDGET_PATH} fail or only warn.')
+parser.add_argument('--deploy', metavar='SERVER_DIR', help='Deploy the built packs (and variables.json for server builds) to this local Bedrock Dedicated Server folder, swapping them in atomically. With --watch server, the server folder to sync to.')
+parser.add_argument('--reload-pipe', metavar='FIFO', help='With --deploy, the FIFO the server reads its stdin from; "reload" is written to it once the packs are swapped in.')
+parser.add_argument('--shared-cache', default=shared_cache.DEFAULT_ROOT, metavar='DIR', help=f'Cache of compiled scripts, generated manifests/config and archives shared by every checkout (default: {shared_cache.DEFAULT_ROOT}), or "none".')
+parser.add_argument('--shared-cache-size', type=float, default=shared_cache.DEFAULT_MAX_MB, metavar='MB', help='Size above which the least recently used shared cache entries are evicted.')
+parser.add_argument('--debounce', type=float, default=250, help='Milliseconds without file events before watch mode syncs a batch of changes.')
+parser.add_argument('--telemetry-interval', type=float, default=60, metavar='SECONDS', help='How often watch mode prints the p50/p95/max latency of every hop from saving a file to it landing in the pack folder (0 only prints on exit).')
+parser.add_argument('--telemetry', metavar='JSON', help='File watch mode writes its latency telemetry to, with every print and on exit.')
+
+# The generated config module is owned by the config stage, which rewrites
+# its compiled output per target after tsc has run.
+GENERATED_CONFIG = [process_config.CONFIG_TS_PATH, process_config.CONFIG_JS_PATH,
+    process_config.LOG_BLOCKS_TS_PATH, process_config.LOG_BLOCKS_JS_PATH]
 
-addon_name = json.loads(open('setup/mc_manifest.json', 'r').read()).get("header").get("bp_name")
-build_pack_name = addon_name[:addon_name.rfind(" BP")]
-version_tag = 'v' + '.'.join(map(str, json.loads(open('setup/mc_manifest.json', 'r').read()).get("header").get("version")))
 
+def find_tsc():
+    # tsc on the PATH (tsc.cmd on Windows), else the typescript devDependency
+    # installed in node_modules.
+    path = shutil.which('tsc')
+    if path:
+        return path
+    local = os.path.join('node_modules', '.bin', 'tsc.cmd' if os.name == 'nt' else 'tsc')
+    return os.path.abspath(local) if os.path.isfile(local) else None
 
-def check_tsc_compiler():
-  try:
-      # Run the command and capture the output
-      result = subprocess.Popen(f"where tsc", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-      output, error = result.communicate()
-      if(error): raise Exception("Error from check_tsc_compiler")
-      paths = output.strip().splitlines()
-      if paths:
-          return paths[0]
-  except subprocess.CalledProcessError:
-      return None
+# Resolved on first use so cached builds don't pay for the lookup.
+tsc_path = None
+# Set by the build daemon to a compiler kept loaded between builds; its
+# build() replaces running tsc -b.
+compiler = None
 
-tsc_path = check_tsc_compiler()
+def get_tsc_path():
+    global tsc_path
+    if tsc_path is None:
+        tsc_path = find_tsc()
+        if tsc_path is None:
+            sys.exit('tsc was not found: install TypeScript globally or run "npm install".')
+    return tsc_path
+
+def tsc_version():
+    # Version of the typescript package the scripts are compiled with, part of
+    # the scripts key so that checkouts on another compiler never share
+    # output. None when TypeScript isn't installed.
+    tsc = tsc_path or find_tsc()
+    package = (tsc and build_daemon.typescript_package(tsc)) or os.path.join('node_modules', 'typescript')
+    try:
+        with open(os.path.join(package, 'package.json'), 'r', encoding='utf-8') as file:
+            return json.load(file).get('version')
+    except (OSError, ValueError):
+        return None
 
 def handleError(err):
     if err: exit(err)
 
-def regExpSub(regEx, replace, file):
-    with open(file, 'r') as f:
-        content = f.read()
-        contentNew = re.sub(regEx, replace, content, flags = re.M)
-    with open(file, 'w') as f:
-        f.write(contentNew)
-
-if not args.package_only:
-    # Check for input and output folder
-    if not os.path.isdir('src'):
-        sys.exit('The src folder does not exist in the current working directory!')
-    elif not os.path.isdir('BP/scripts'):
-        if args.init:
-            os.makedirs('BP/scripts', exist_ok=True)
-        else:
-            sys.exit('The output scripts folder does not exist in the current working directory!')
-        
-
-    # Clean script output folder
-    if args.clean:
-        print('cleaning script output folder...')
-        folder = 'BP/scripts'
-        for filename in os.listdir(folder):
-            file_path = os.path.join(folder, filename)
-            try:
-                if file_path.endswith('.txt'):
-                    continue
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                print('Failed to delete %s. Reason: %s' % (file_path, e))
-    
-    # Build manifests
-    if args.init:
-        handleError(subprocess.call([sys.executable, 'tools/process_manifest.py', f'--target={args.target}', '--init'], stdout=subprocess.DEVNULL))
-    else:
-        handleError(subprocess.call([sys.executable, 'tools/process_manifest.py', f'--target={args.target}'], stdout=subprocess.DEVNULL))
-
-
-    if args.watch:
-        print('syncing com.mojang folder...')
-        watch_target = 'server' if args.watch == 'server' else 'debug'
-        subprocess.call([sys.executable, 'tools/process_config.py', f'--target={watch_target}'], stdout=subprocess.DEVNULL)
-        subprocess.call([sys.executable, 'tools/sync2com-mojang.py', f'--dest={args.watch}'], stdout=subprocess.DEVNULL)
-
-        print('Watch mode: press control-C to stop.')
-        # tsc = subprocess.Popen('tsc -w', shell=True)
-        tsc = subprocess.Popen([tsc_path, '-w'], shell=True)
-        
-        # Build settings file
-        process_cfg = subprocess.Popen([sys.executable, 'tools/process_config.py', '-w', f'--target={watch_target}'], stdout=subprocess.DEVNULL)
-        # Sync to com.mojang
-        sync_mojang = subprocess.Popen([sys.executable, 'tools/sync2com-mojang.py', '-w', '--init=False', f'--dest={args.watch}'], stdout=subprocess.DEVNULL)
-        
-        from time import sleep
+def clean_scripts():
+    print('cleaning script output folder...')
+    folder = 'BP/scripts'
+    for filename in os.listdir(folder):
+        file_path = os.path.join(folder, filename)
         try:
-            while True:
-                sleep(1)
-        except KeyboardInterrupt:
-            tsc.kill()
-            process_cfg.kill()
-            sync_mojang.kill()
-            exit()
-    else:
-        print('building scripts...')
-        handleError(subprocess.call([tsc_path, '-b'], shell=True))
+            if file_path.endswith('.txt'):
+                continue
+            if os.path.isfile(file_path) or os.path.islink(file_path):
+                os.unlink(file_path)
+            elif os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+        except Exception as e:
+            print('Failed to delete %s. Reason: %s' % (file_path, e))
 
-    # Build manifests
-    if args.init:
-        handleError(subprocess.call([sys.executable, 'tools/process_manifest.py', f'--target={args.target}', '--init']))
-    else:
-        handleError(subprocess.call([sys.executable, 'tools/process_manifest.py', f'--target={args.target}']))
-        
-    # Build settings files
-    handleError(subprocess.call([sys.executable, 'tools/process_config.py', f'--target={args.target}']))
-    if args.target == 'server':
-        handleError(subprocess.call([sys.executable, 'tools/process_config.py', '--generateConfigJSON']))
-
-if not os.path.isdir('builds'):
-    os.makedirs('builds')
-
-if os.path.exists(f'builds/{build_pack_name} BP'):
-    shutil.rmtree(f'builds/{build_pack_name} BP')
-if os.path.exists(f'builds/{build_pack_name} RP'):
-    shutil.rmtree(f'builds/{build_pack_name} RP')
-try: shutil.copytree('BP', f'builds/{build_pack_name} BP')
-except: pass
-try: shutil.copytree('RP', f'builds/{build_pack_name} RP')
-except: pass
-
-if args.target != 'debug':
-    from zipfile import ZipFile;
-    
-    def zipWriteDir(zip, dirname, arcname):
-        for folderName, _, filenames in os.walk(dirname):
-            for filename in filenames:
-                filePath = os.path.join(folderName, filename)
-                zip.write(filePath, arcname / Path(filePath).relative_to(dirname))
-    
-    if args.target == 'release':
+def build_scripts():
+    print('building scripts...')
+    with profiler.span('tsc -b', cat='subprocess'):
+        handleError(compiler.build() if compiler else subprocess.call([get_tsc_path(), '-b']))
+
+def get_pack_name(manifest):
+    addon_name = manifest.get("header").get("bp_name")
+    return addon_name[:addon_name.rfind(" BP")]
+
+def get_archive_path(target, manifest):
+    build_pack_name = get_pack_name(manifest)
+    if target == 'release':
+        version_tag = 'v' + '.'.join(map(str, manifest.get("header").get("version")))
         formatted_build_pack_name = re.sub(r"[-\s]", "_", build_pack_name)
-        with ZipFile(f'builds/{version_tag}-{formatted_build_pack_name}_Addon.mcaddon', 'w') as zip:
-            zipWriteDir(zip, f'builds/{build_pack_name} BP', f'{build_pack_name} BP')
-            zipWriteDir(zip, f'builds/{build_pack_name} RP', f'{build_pack_name} RP')
-    elif args.target == 'server':
-        with ZipFile(f'builds/{build_pack_name}.server.zip', 'w') as zip:
-            zip.write('builds/variables.json', 'variables.json')
-            zipWriteDir(zip, f'builds/{build_pack_name} BP', f'{build_pack_name} BP')
-            zipWriteDir(zip, f'builds/{build_pack_name} RP', f'{build_pack_name} RP')
-            
-            
-            
-            
-"""
-Commands:
---init (reinitialize bp / rp, creating new uuid and stuffs)
---watch (sync dev)
---target (create a debug or release version of addon)
---clean (clean bp/scripts)
---package-only (idk)
-
-Add:
-- [-c | --create ]<args: addon(default) | pack> <pack_args: bp | rp> - creates new uuid (bp, rp, res, script) for mc_manifest
-"""
\ No newline at end of file
+        return f'builds/{version_tag}-{formatted_build_pack_name}_Addon.mcaddon'
+    elif target == 'server':
+        return f'builds/{build_pack_name}.server.zip'
+
+def get_archive_entries(target, manifest, bp_dir='BP', rp_dir='RP', variables='builds/variables.json', bundle_dir=None):
+    build_pack_name = get_pack_name(manifest)
+    entries = [(variables, 'variables.json')] if target == 'server' else []
+    bp_entries = pack_archive.pack_entries(bp_dir, f'{build_pack_name} BP')
+    if bundle_dir:
+        # The bundle takes the place of every compiled module.
+        scripts = f'{build_pack_name} BP/scripts/'
+        bp_entries = [(path, arcname) for path, arcname in bp_entries if not (arcname.startswith(scripts) and arcname.endswith('.js'))]
+        bp_entries += pack_archive.pack_entries(bundle_dir, scripts.rstrip('/'))
+    return entries + bp_entries + pack_archive.pack_entries(rp_dir, f'{build_pack_name} RP')
+
+def should_optimize(args, target):
+    return target != 'debug' and args.optimize is not False
+
+def optimize_packs(name, graph, target, bp_dir, rp_dir, inputs):
+    # Optimized copies live in builds/<target>/optimized and are what gets
+    # packaged; returns their BP and RP folders.
+    out_bp, out_rp = f'builds/{target}/optimized/BP', f'builds/{target}/optimized/RP'
+
+    def optimize():
+        optimize_assets.report(optimize_assets.optimize_trees([(bp_dir, out_bp), (rp_dir, out_rp)]))
+
+    graph.run(name, optimize,
+        inputs=inputs + ['tools/optimize_assets.py'],
+        outputs=[out_bp, out_rp])
+    return out_bp, out_rp
+
+def should_bundle(args, target):
+    return target != 'debug' and args.bundle is not False
+
+def bundle_packs(name, graph, args, target, bp_dir):
+    # Bundles the scripts of bp_dir into builds/<target>/bundle, which is
+    # packaged as the pack's scripts folder; returns that folder.
+    out_dir = f'builds/{target}/bundle'
+    scripts_dir = os.path.join(bp_dir, 'scripts')
+
+    def bundle():
+        entry = bundle_scripts.script_entry(bp_dir)
+        try:
+            stats = bundle_scripts.bundle(scripts_dir, entry, out_dir, args.source_map)
+        except bundle_scripts.BundleError as err:
+            sys.exit(f'Could not bundle the scripts: {err}. Build with --no-bundle to package them as they are.')
+        bundle_scripts.report(stats)
+
+    graph.run(name, bundle,
+        inputs=[scripts_dir, os.path.join(bp_dir, 'manifest.json'), 'tools/bundle_scripts.py', 'tools/bundle_scripts.js'],
+        outputs=[out_dir],
+        params={'source_map': args.source_map})
+    return out_dir
+
+def validate(args, graph):
+    # Checked once on BP/RP: target trees only differ in manifests and config.
+    def check():
+        errors = validate_packs.report(*validate_packs.PackValidator().validate())
+        if errors and args.validate == 'strict':
+            sys.exit(f'{errors} validation errors; use --validate warn to build anyway.')
+
+    if args.validate != 'none':
+        graph.run('validate', check,
+            inputs=['BP', 'RP', 'tools/validate_packs.py'],
+            params={'mode': args.validate})
+
+def report_pack(name, graph, args, target, manifest, archive, bp_dir, bundle_dir):
+    # Reports the archive's sizes and script modules against the previous
+    # version's report, and checks them against the budgets.
+    version = pack_index.pack_version(manifest)
+    scripts_dir = os.path.join(bp_dir, 'scripts')
+
+    def check():
+        exceeded = pack_report.report(archive, target, version, bp_dir, scripts_dir, bundled=bundle_dir is not None)
+        if exceeded and args.budget == 'strict':
+            sys.exit(f'{len(exceeded)} pack budgets exceeded; raise them in {pack_report.BUDGET_PATH} or use --budget warn.')
+
+    graph.run(name, check,
+        inputs=[archive, scripts_dir, os.path.join(bp_dir, 'manifest.json'), pack_report.BUDGET_PATH, 'tools/pack_report.py'],
+        outputs=[pack_report.report_path(target, version)],
+        params={'budget': args.budget, 'bundled': bundle_dir is not None})
+
+def build_target(args, target, manifest, graph):
+    # Single target build: manifests and config are generated in place in BP/RP.
+    settings = process_config.load_settings(target)
+    build_pack_name = get_pack_name(manifest)
+
+    def build_manifests():
+        process_manifest.build_manifests(target, args.init, manifest)
+
+    def build_config():
+        process_config.generate_config(target, manifest, settings)
+        if target == 'server':
+            process_config.generate_config_json(target, settings)
+
+    def stage_packs():
+        pack_archive.mirror_tree('BP', f'builds/{build_pack_name} BP')
+        pack_archive.mirror_tree('RP', f'builds/{build_pack_name} RP')
+
+    if not args.package_only:
+        graph.run('scripts', build_scripts,
+            inputs=['src', 'tsconfig.json'],
+            outputs=['BP/scripts'],
+            params={'tsc': tsc_version()},
+            exclude=GENERATED_CONFIG,
+            share=True)
+
+        # Build manifests
+        graph.run('manifests', build_manifests,
+            inputs=['setup/mc_manifest.json', 'tools/process_manifest.py'],
+            outputs=['BP/manifest.json', 'RP/manifest.json'],
+            params={'target': target},
+            always=args.init,
+            share=not args.init)
+
+        # Build settings files
+        graph.run('config', build_config,
+            inputs=['src/configuration_settings.json', 'setup/mc_manifest.json', process_config.VANILLA_BLOCKS_PATH, 'tools/process_config.py'],
+            outputs=GENERATED_CONFIG + (['builds/variables.json'] if target == 'server' else []),
+            params={'target': target},
+            share=True)
+
+    os.makedirs('builds', exist_ok=True)
+    validate(args, graph)
+
+    # Archives are built straight from BP/RP; the staged folders are only kept
+    # when asked for, as hardlinked/reflinked mirrors.
+    staging = args.staging or ('link' if target == 'debug' else 'none')
+    if staging == 'link':
+        graph.run('staging', stage_packs,
+            inputs=['BP', 'RP'],
+            outputs=[f'builds/{build_pack_name} BP', f'builds/{build_pack_name} RP'])
+
+    bp_dir, rp_dir, bundle_dir = 'BP', 'RP', None
+    if target != 'debug':
+        archive = get_archive_path(target, manifest)
+        if should_optimize(args, target):
+            bp_dir, rp_dir = optimize_packs('optimize', graph, target, bp_dir, rp_dir, ['BP', 'RP'])
+        bundle_dir = bundle_packs('bundle', graph, args, target, bp_dir) if should_bundle(args, target) else None
+
+        index = pack_index.index_path(target, pack_index.pack_version(manifest))
+
+        def package():
+            entries = get_archive_entries(target, manifest, bp_dir, rp_dir, bundle_dir=bundle_dir)
+            pack_archive.write_archive(archive, entries, args.compression, args.level)
+            pack_index.write_index(entries, target, manifest, archive, graph.file_digest)
+
+        graph.run('zip', package,
+            inputs=[bp_dir, rp_dir, 'tools/pack_archive.py'] + ([bundle_dir] if bundle_dir else [])
+                + (['builds/variables.json'] if target == 'server' else []),
+            outputs=[archive, index],
+            params={'target': target, 'compression': args.compression, 'level': args.level},
+            share=True)
+        report_pack('report', graph, args, target, manifest, archive, bp_dir, bundle_dir)
+
+    if args.deploy:
+        # Deploys what the archive holds, so a release deploy gets the
+        # optimized and bundled packs.
+        entries = get_archive_entries(target, manifest, bp_dir, rp_dir, bundle_dir=bundle_dir)
+        deploy_server.report(deploy_server.deploy(args.deploy, entries, args.reload_pipe), args.deploy)
+
+def build_matrix(args, targets, manifest, graph):
+    # Scripts are compiled once into BP/scripts. Every target then gets its own
+    # tree under builds/<target>, mirrored from BP/RP with hardlinks, into which
+    # that target's manifests and config are written (always by replacing the
+    # file, never through the shared link). Archives are packaged in parallel.
+    if not args.package_only:
+        graph.run('scripts', build_scripts,
+            inputs=['src', 'tsconfig.json'],
+            outputs=['BP/scripts'],
+            params={'tsc': tsc_version()},
+            exclude=GENERATED_CONFIG,
+            share=True)
+    validate(args, graph)
+
+    jobs = []
+    reports = []
+    for target in targets:
+        bp_dir, rp_dir = f'builds/{target}/BP', f'builds/{target}/RP'
+        variables = f'builds/{target}/variables.json'
+        settings = process_config.load_settings(target)
+
+        def build_tree(target=target, bp_dir=bp_dir, rp_dir=rp_dir, variables=variables, settings=settings):
+            pack_archive.mirror_tree('BP', bp_dir)
+            pack_archive.mirror_tree('RP', rp_dir)
+            process_manifest.build_manifests(target, False, manifest, bp_dir, rp_dir)
+            process_config.generate_config(target, manifest, settings,
+                ts_path=None, js_path=os.path.join(bp_dir, 'scripts/configuration/server_configuration.js'))
+            if target == 'server':
+                process_config.generate_config_json(target, settings, variables)
+
+        graph.run(f'tree:{target}', build_tree,
+            inputs=['BP', 'RP', 'setup/mc_manifest.json', 'src/configuration_settings.json', process_config.VANILLA_BLOCKS_PATH,
+                'tools/process_manifest.py', 'tools/process_config.py', 'tools/pack_archive.py'],
+            outputs=[bp_dir, rp_dir] + ([variables] if target == 'server' else []),
+            params={'target': target})
+
+        if target != 'debug':
+            archive = get_archive_path(target, manifest)
+            if should_optimize(args, target):
+                bp_dir, rp_dir = optimize_packs(f'optimize:{target}', graph, target, bp_dir, rp_dir, [bp_dir, rp_dir])
+            bundle_dir = bundle_packs(f'bundle:{target}', graph, args, target, bp_dir) if should_bundle(args, target) else None
+            jobs.append((f'zip:{target}', archive,
+                get_archive_entries(target, manifest, bp_dir, rp_dir, variables, bundle_dir),
+                {'target': target, 'compression': args.compression, 'level': args.level}))
+            reports.append((target, archive, bp_dir, bundle_dir))
+
+    pending = []
+    for name, archive, entries, params in jobs:
+        index = pack_index.index_path(params['target'], pack_index.pack_version(manifest))
+        key = graph.check(name, inputs=[path for path, _ in entries] + ['tools/pack_archive.py'], outputs=[archive, index], params=params)
+        if key and not graph.restore(name, key, [archive, index]):
+            pending.append((name, archive, entries, key, params['target']))
+    if pending:
+        start = time.perf_counter()
+        with profiler.span('package pool', cat='subprocess', files=sum(len(entries) for _, _, entries, _, _ in pending)), \
+                ProcessPoolExecutor(min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(pack_archive.write_archive, archive, entries, args.compression, args.level)
+                for _, archive, entries, _, _ in pending]
+            for (name, archive, entries, key, target), future in zip(pending, futures):
+                future.result()
+                index = pack_index.write_index(entries, target, manifest, archive, graph.file_digest)
+                graph.record(name, key, [archive, index], time.perf_counter() - start)
+                graph.share(name, key, [archive, index])
+    for target, archive, bp_dir, bundle_dir in reports:
+        report_pack(f'report:{target}', graph, args, target, manifest, archive, bp_dir, bundle_dir)
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    targets = args.target
+    if args.profile:
+        profiler.enable()
+    try:
+        build(args, targets)
+    finally:
+        if args.profile:
+            profiler.write_trace(args.profile)
+            print(profiler.summary())
+            print(f'trace written to {args.profile}')
+
+def build(args, targets):
+    # Parsed once and shared by every stage of this build.
+    manifest = process_manifest.load_manifest()
+    shared = None
+    if args.shared_cache != 'none':
+        shared = shared_cache.SharedCache(args.shared_cache, int(args.shared_cache_size * (1 << 20)))
+    graph = BuildGraph(force=args.force, shared=shared)
+
+    if len(targets) > 1 and (args.init or args.watch or args.deploy):
+        sys.exit('--init, --watch and --deploy take a single --target.')
+
+    if not args.package_only:
+        # Check for input and output folder
+        if not os.path.isdir('src'):
+            sys.exit('The src folder does not exist in the current working directory!')
+        elif not os.path.isdir('BP/scripts'):
+            if args.init:
+                os.makedirs('BP/scripts', exist_ok=True)
+            else:
+                sys.exit('The output scripts folder does not exist in the current working directory!')
+
+        # Clean script output folder
+        if args.clean:
+            clean_scripts()
+
+        if args.watch:
+            # Build manifests
+            process_manifest.build_manifests(targets[0], args.init, manifest)
+
+            print('syncing com.mojang folder...')
+            watch_target = 'server' if args.watch == 'server' else 'debug'
+            process_config.generate_config(watch_target, manifest)
+            sync2com_mojang.sync(args.watch, manifest, args.deploy)
+
+            from watch_orchestrator import watch
+            watch(get_tsc_path(), args.watch, watch_target, manifest, args.debounce / 1000, args.telemetry_interval, args.telemetry, args.deploy)
+            return
+
+    if len(targets) > 1:
+        build_matrix(args, targets, manifest, graph)
+    else:
+        build_target(args, targets[0], manifest, graph)
+
+    if shared:
+        shared.trim()
+    print(graph.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+import json, argparse
+import glob
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+SOCKET_PATH = 'builds/.build_daemon.sock'
+LOG_PATH = 'builds/.build_daemon.log'
+TSC_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tsc_server.js')
+EXIT_MARKER = '@@exit '
+DEFAULT_IDLE = 30
+# Ends the output of a request: "exit <code>", or "local" when the client has
+# to run the build itself.
+TRAILER = '\0'
+
+
+def typescript_package(tsc):
+    # The typescript package a resolved tsc belongs to: bin/tsc inside it once
+    # symlinks are followed, or node_modules/typescript beside an npm shim.
+    for path in (os.path.dirname(os.path.dirname(os.path.realpath(tsc))),
+            os.path.join(os.path.dirname(tsc), 'node_modules', 'typescript')):
+        if os.path.basename(path) == 'typescript' and os.path.isfile(os.path.join(path, 'package.json')):
+            return path
+    return None
+
+class Compiler:
+    # Compiles the scripts for build.py. With the typescript package found,
+    # tsc_server.js is run by node and keeps the compiler loaded between
+    # builds; a server that dies is restarted on the next build, and that
+    # build falls back to a cold tsc -b. Output is printed, so it reaches the
+    # client.
+
+    def __init__(self, tsc, typescript=None):
+        self.tsc = tsc
+        self.typescript = typescript if shutil.which('node') else None
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen(['node', TSC_SERVER, self.typescript],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, encoding='utf-8', errors='replace', bufsize=1)
+
+    def build(self):
+        if self.typescript:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            try:
+                self.process.stdin.write('build\n')
+                self.process.stdin.flush()
+                for line in self.process.stdout:
+                    if line.startswith(EXIT_MARKER):
+                        return int(line[len(EXIT_MARKER):])
+                    print(line, end='')
+            except OSError:
+                pass
+            print(f'warm compiler exited with code {self.process.wait()}, running tsc -b...')
+            self.process = None
+        result = subprocess.run([self.tsc, '-b'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace')
+        print(result.stdout, end='')
+        return result.returncode
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+class SocketWriter(io.TextIOBase):
+    # Text stream sending everything written to it to the client.
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.at_line_start = True
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self.conn.sendall(text.encode('utf-8', errors='replace'))
+            self.at_line_start = text.endswith('\n')
+        return len(text)
+
+    def finish(self, trailer):
+        self.write(('' if self.at_line_start else '\n') + TRAILER + trailer + '\n')
+
+def sources_state():
+    # Builds run the tools imported at startup; once any of them is edited
+    # the daemon restarts itself.
+    paths = glob.glob(os.path.join(os.path.dirname(TSC_SERVER), '*.py')) + [TSC_SERVER]
+    return {path: os.stat(path).st_mtime_ns for path in paths}
+
+class BuildDaemon:
+    # Runs builds for mcip in one long-lived process, one at a time. The tools
+    # stay imported, the manifest, settings and file-hash indexes stay parsed
+    # (json_cache), the tsc path is resolved once and scripts are compiled by
+    # a warm Compiler.
+
+    def __init__(self, path=SOCKET_PATH, idle=DEFAULT_IDLE):
+        import build
+        self.build = build
+        self.path = path
+        self.idle = idle
+        self.started = time.time()
+        self.builds = 0
+        self.sources = sources_state()
+        tsc = build.find_tsc()
+        if tsc:
+            build.tsc_path = tsc
+            build.compiler = Compiler(tsc, typescript_package(tsc))
+
+    def status(self):
+        compiler = self.build.compiler
+        return {
+            'pid': os.getpid(), 'uptime': round(time.time() - self.started), 'builds': self.builds,
+            'tsc': self.build.tsc_path, 'typescript': compiler and compiler.typescript,
+        }
+
+    def serve(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Anyone who can connect can run builds as this user.
+        umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        server.settimeout(self.idle * 60 if self.idle else None)
+        print(f'build daemon {os.getpid()} listening on {self.path}', flush=True)
+        restart = False
+        try:
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    print(f'idle for {self.idle} minutes, stopping', flush=True)
+                    break
+                with conn:
+                    action = self.handle(conn)
+                if action == 'stop':
+                    break
+                if action == 'restart':
+                    restart = True
+                    break
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            if self.build.compiler:
+                self.build.compiler.stop()
+        if restart:
+            print('tools changed, restarting', flush=True)
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def handle(self, conn):
+        request = json.loads(conn.makefile('rb').readline() or b'{}')
+        writer = SocketWriter(conn)
+        try:
+            command = request.get('command')
+            if command in ('stop', 'status'):
+                writer.write(json.dumps(self.status()) + '\n')
+                writer.finish('exit 0')
+                return command
+            if sources_state() != self.sources:
+                writer.finish('local')
+                return 'restart'
+            code = self.run(request['argv'], writer)
+            writer.finish('local' if code is None else f'exit {code}')
+        except OSError:
+            # The client went away.
+            pass
+        return None
+
+    def run(self, argv, writer):
+        # Returns the exit code of the build, or None for watch mode, which
+        # runs for as long as the client does and so stays in its process.
+        code = 0
+        start = time.perf_counter()
+        with redirect_stdout(writer), redirect_stderr(writer):
+            try:
+                if self.build.parser.parse_args(argv).watch:
+                    return None
+                self.build.main(argv)
+            except SystemExit as err:
+                if isinstance(err.code, str):
+                    print(err.code, file=sys.stderr)
+                code = 1 if isinstance(err.code, str) else err.code or 0
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                self.build.profiler.disable()
+        self.builds += 1
+        print(f'build {argv} exited with {code} in {time.perf_counter() - start:.2f}s', flush=True)
+        return code
+
+def request(message, path=SOCKET_PATH, echo=True):
+    # Sends a request to the daemon and echoes its output. Returns the
+    # trailer, or None when no daemon is listening.
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        return None
+    with conn:
+        conn.sendall(json.dumps(message).encode() + b'\n')
+        out = sys.stdout.buffer
+        for line in conn.makefile('rb'):
+            if line.startswith(TRAILER.encode()):
+                return line[1:].decode().strip()
+            if echo:
+                out.write(line)
+                out.flush()
+    return 'exit 1'
+
+def client(argv, path=SOCKET_PATH):
+    # Builds through the daemon when one is running, else in this process.
+    trailer = request({'argv': argv}, path)
+    if trailer and trailer.startswith('exit '):
+        return int(trailer[5:])
+    import build
+    build.main(argv)
+    return 0
+
+def start(path=SOCKET_PATH, idle=DEFAULT_IDLE):
+    if not hasattr(socket, 'AF_UNIX'):
+        sys.exit('The build daemon needs Unix domain sockets, which this Python does not support.')
+    if request({'command': 'status'}, path, echo=False) is not None:
+        return
+    os.makedirs(os.path.dirname(LOG_PATH) or '.', exist_ok=True)
+    with open(LOG_PATH, 'a', encoding='utf-8') as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--socket', path, '--idle', str(idle)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if request({'command': 'status'}, path, echo=False) is not None:
+            return
+        time.sleep(0.05)
+    sys.exit(f'The build daemon did not start, see {LOG_PATH}.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep a build process warm in the background and build through it.')
+    socket_parser = argparse.ArgumentParser(add_help=False)
+    socket_parser.add_argument('--socket', default=SOCKET_PATH, help='Unix socket the daemon listens on.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    start_parser = commands.add_parser('start', parents=[socket_parser], help='Start the daemon in the background unless it is running.')
+    serve_parser = commands.add_parser('serve', parents=[socket_parser], help='Run the daemon in the foreground.')
+    for command_parser in (start_parser, serve_parser):
+        command_parser.add_argument('--idle', type=float, default=DEFAULT_IDLE, help='Minutes without builds after which the daemon stops (0 never stops).')
+    commands.add_parser('stop', parents=[socket_parser], help='Stop the daemon.')
+    commands.add_parser('status', parents=[socket_parser], help='Show whether the daemon runs and what it keeps warm.')
+    commands.add_parser('build', parents=[socket_parser], help='Build through the daemon, or in this process when none is running. Takes the arguments of build.py.')
+    args, build_args = parser.parse_known_args()
+    if args.command != 'build' and build_args:
+        parser.error(f'unrecognized arguments: {" ".join(build_args)}')
+
+    if args.command == 'serve':
+        BuildDaemon(args.socket, args.idle).serve()
+    elif args.command == 'start':
+        start(args.socket, args.idle)
+        request({'command': 'status'}, args.socket)
+    elif args.command in ('stop', 'status'):
+        if request({'command': args.command}, args.socket) is None:
+            print('no build daemon is running')
+    else:
+        sys.exit(client(build_args[1:] if build_args[:1] == ['--'] else build_args, args.socket))
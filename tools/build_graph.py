@@ -0,0 +1,127 @@
+from pathlib import Path
+import hashlib, json, os, time
+
+import json_cache
+from process_config import compute_hash
+from profiler import profiler
+from shared_cache import stage_key
+
+CACHE_FILE = 'builds/.build_cache.json'
+CACHE_VERSION = 1
+
+
+def iter_files(paths, exclude=()):
+    exclude = {Path(p).as_posix() for p in exclude}
+    for path in paths:
+        if os.path.isfile(path):
+            if Path(path).as_posix() not in exclude:
+                yield Path(path).as_posix()
+        elif os.path.isdir(path):
+            for folderName, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    filePath = Path(folderName, filename).as_posix()
+                    if filePath not in exclude:
+                        yield filePath
+
+
+class BuildGraph:
+    # Persisted record of build stages keyed by a hash of their inputs.
+    # A stage is skipped when its key matches the last successful run and its
+    # outputs still hash to what that run produced. File digests are cached by
+    # (mtime, size) so unchanged files are never re-read.
+
+    def __init__(self, path=CACHE_FILE, force=False, shared=None):
+        self.path = path
+        self.force = force
+        self.shared = shared
+        self.results = []
+        self.files = {}
+        self.stages = {}
+        try:
+            data = json_cache.load(path)
+            if data.get('version') == CACHE_VERSION:
+                self.files = data.get('files', {})
+                self.stages = data.get('stages', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def file_digest(self, path):
+        st = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        digest = compute_hash(path)
+        self.files[path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def digest(self, paths, exclude=(), params=None):
+        h = hashlib.sha256()
+        h.update(json.dumps(params, sort_keys=True).encode())
+        for path in paths:
+            # Missing paths still change the key, so deleting an output is noticed.
+            h.update(f'\0{path}:{os.path.exists(path)}'.encode())
+        for path in iter_files(paths, exclude):
+            h.update(f'\0{path}\0{self.file_digest(path)}'.encode())
+        return h.hexdigest()
+
+    def check(self, name, inputs=(), outputs=(), params=None, exclude=(), always=False):
+        # Returns the stage key when the stage has to run, None on a cache hit.
+        with profiler.span(name, cat='cache check'):
+            key = self.digest(inputs, exclude, params)
+        record = self.stages.get(name)
+        if (not self.force and not always and record and record['key'] == key
+                and record['outputs'] == self.digest(outputs, exclude)):
+            self.results.append((name, 'cached', 0.0))
+            return None
+        return key
+
+    def record(self, name, key, outputs=(), elapsed=0.0, exclude=(), status='ran'):
+        self.results.append((name, status, elapsed))
+        self.stages[name] = {'key': key, 'outputs': self.digest(outputs, exclude)}
+        self.save()
+
+    def restore(self, name, key, outputs=(), exclude=()):
+        # Takes the outputs of a stage from the shared cache when a build with
+        # the same inputs has stored them, in this or another checkout.
+        if not self.shared or self.force:
+            return False
+        start = time.perf_counter()
+        if not self.shared.restore(stage_key(name, key), outputs, lambda paths: list(iter_files(paths, exclude))):
+            return False
+        self.record(name, key, outputs, time.perf_counter() - start, exclude, 'restored')
+        return True
+
+    def share(self, name, key, outputs=(), exclude=()):
+        if self.shared:
+            self.shared.store(stage_key(name, key), list(iter_files(outputs, exclude)), self.file_digest)
+
+    def run(self, name, action, inputs=(), outputs=(), params=None, exclude=(), always=False, share=False):
+        # With share, outputs are restored from and stored into the shared cache.
+        key = self.check(name, inputs, outputs, params, exclude, always)
+        if key is None:
+            return False
+        if share and self.restore(name, key, outputs, exclude):
+            return True
+        start = time.perf_counter()
+        with profiler.span(name):
+            action()
+        self.record(name, key, outputs, time.perf_counter() - start, exclude)
+        if share:
+            self.share(name, key, outputs, exclude)
+        return True
+
+    def save(self):
+        # Forget digests of files that no longer exist.
+        self.files = {path: entry for path, entry in self.files.items() if os.path.exists(path)}
+        json_cache.dump(self.path, {'version': CACHE_VERSION, 'files': self.files, 'stages': self.stages})
+
+    def summary(self):
+        lines = []
+        labels = {'ran': 'ran', 'restored': 'restored from shared cache', 'cached': 'cache hit'}
+        for name, status, elapsed in self.results:
+            lines.append(f'  {name:<14} {labels[status]}' + (f' ({elapsed:.2f}s)' if status != 'cached' else ''))
+        ran = sum(1 for _, status, _ in self.results if status == 'ran')
+        restored = sum(1 for _, status, _ in self.results if status == 'restored')
+        return (f'stages: {ran} ran, ' + (f'{restored} restored, ' if restored else '')
+            + f'{len(self.results) - ran - restored} cached\n' + '\n'.join(lines))
@@ -0,0 +1,906 @@
+// Bundles the compiled behavior pack scripts for bundle_scripts.py, with the
+// typescript package the scripts are compiled with. TypeScript parses and
+// binds every module, so an identifier is renamed only when it resolves to a
+// module's top-level binding, never when a local declaration shadows it.
+//
+// The entry and everything it imports statically become one module. Every
+// module loaded with import() becomes a chunk under chunks/ that the game
+// only loads when the import() runs, with the modules only it imports;
+// modules several chunks import go to shared chunks. Chunks import the
+// bindings they use from each other, so every module still runs once.
+//
+// Usage: node bundle_scripts.js <typescript> bundle <root> <entry> <out dir> [--source-map]
+//        node bundle_scripts.js <typescript> graph <root> <entry>
+// Each prints its result as JSON; a script that cannot be bundled exits
+// with ERROR_EXIT and the reason on stderr.
+'use strict';
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const ts = require(process.argv[2]);
+
+// Specifiers resolved by the game rather than shipped in the pack.
+const EXTERNAL_PREFIXES = ['@minecraft/'];
+// Modules whose top level has no side effects, so declarations and class
+// members nothing refers to can be dropped.
+const PURE_MODULES = ['modules/vanilla-types/'];
+const DYNAMIC_IMPORT = '__bundle_import';
+// Binding given to an anonymous default export.
+const DEFAULT_NAME = '__default';
+const CHUNKS = 'chunks';
+const ERROR_EXIT = 2;
+const BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/';
+const OPTIONS = { allowJs: true, noLib: true, noResolve: true, noEmit: true, types: [] };
+const WORD = /[\w$\u0080-\uffff#]/;
+const LINE_BREAK = /[\n\r\u2028\u2029]/;
+
+class BundleError extends Error {}
+
+function isExternal(specifier) {
+    return EXTERNAL_PREFIXES.some((prefix) => specifier.startsWith(prefix));
+}
+
+function isPure(modulePath) {
+    return PURE_MODULES.some((prefix) => modulePath.startsWith(prefix));
+}
+
+function modifiers(node) {
+    return (ts.canHaveModifiers(node) && ts.getModifiers(node)) || [];
+}
+
+function bindingNames(name) {
+    if (ts.isIdentifier(name)) {
+        return [name.text];
+    }
+    return name.elements.flatMap((element) => ts.isOmittedExpression(element) ? [] : bindingNames(element.name));
+}
+
+function relative(from, to) {
+    const rel = path.posix.relative(path.posix.dirname(from), to);
+    return rel.startsWith('.') ? rel : `./${rel}`;
+}
+
+function hash(text) {
+    return crypto.createHash('sha1').update(text).digest('hex').slice(0, 8);
+}
+
+// Property and member names, which no declaration can capture.
+function isPropertyName(node) {
+    const parent = node.parent;
+    return (ts.isPropertyAccessExpression(parent) || ts.isPropertyAssignment(parent) || ts.isClassElement(parent)) && parent.name === node
+        || ts.isBindingElement(parent) && parent.propertyName === node;
+}
+
+// Every file is an ES module to the game, with or without imports.
+function forceModule(file) {
+    file.externalModuleIndicator = true;
+}
+
+class Module {
+    constructor(root, modulePath) {
+        this.path = modulePath;
+        this.fileName = path.resolve(root, modulePath).split(path.sep).join('/');
+        let text;
+        try {
+            text = fs.readFileSync(this.fileName, 'utf8');
+        } catch {
+            throw new BundleError(`cannot read ${modulePath}`);
+        }
+        this.file = ts.createSourceFile(this.fileName, text,
+            { languageVersion: ts.ScriptTarget.Latest, setExternalModuleIndicator: forceModule }, true, ts.ScriptKind.JS);
+        // Specifiers of import and export ... from statements, in order.
+        this.requests = [];
+        // Local name -> { specifier, name } of every import; name is '*' for
+        // a namespace import.
+        this.imports = new Map();
+        // Exported name -> local name of the module's own bindings.
+        this.exports = new Map();
+        // Exported name -> { specifier, name } of export ... from.
+        this.reexports = new Map();
+        this.stars = [];
+        // import() calls: the call, and the specifier or folder prefix it loads.
+        this.dynamic = [];
+        // Nodes left out of the output; texts replacing leaves, and texts
+        // written after leaves, by the leaf's start.
+        this.skip = new Set();
+        this.replace = new Map();
+        this.insert = new Map();
+        // The statement an anonymous default export is named DEFAULT_NAME in.
+        this.defaultExport = null;
+        this.parse();
+    }
+
+    line(node) {
+        return this.file.getLineAndCharacterOfPosition(node.getStart(this.file)).line + 1;
+    }
+
+    parse() {
+        for (const statement of this.file.statements) {
+            if (ts.isImportDeclaration(statement)) {
+                const specifier = statement.moduleSpecifier.text;
+                const clause = statement.importClause;
+                this.requests.push(specifier);
+                if (clause && clause.name) {
+                    this.imports.set(clause.name.text, { specifier, name: 'default' });
+                }
+                const bindings = clause && clause.namedBindings;
+                if (bindings && ts.isNamespaceImport(bindings)) {
+                    this.imports.set(bindings.name.text, { specifier, name: '*' });
+                } else if (bindings) {
+                    for (const element of bindings.elements) {
+                        this.imports.set(element.name.text, { specifier, name: (element.propertyName || element.name).text });
+                    }
+                }
+                this.skip.add(statement);
+            } else if (ts.isExportDeclaration(statement)) {
+                const specifier = statement.moduleSpecifier && statement.moduleSpecifier.text;
+                const clause = statement.exportClause;
+                if (specifier !== undefined) {
+                    this.requests.push(specifier);
+                }
+                if (!clause) {
+                    this.stars.push(specifier);
+                } else if (ts.isNamespaceExport(clause)) {
+                    this.reexports.set(clause.name.text, { specifier, name: '*' });
+                } else {
+                    for (const element of clause.elements) {
+                        const local = (element.propertyName || element.name).text;
+                        if (specifier === undefined) {
+                            this.exports.set(element.name.text, local);
+                        } else {
+                            this.reexports.set(element.name.text, { specifier, name: local });
+                        }
+                    }
+                }
+                this.skip.add(statement);
+            } else if (ts.isExportAssignment(statement)) {
+                if (ts.isIdentifier(statement.expression)) {
+                    this.exports.set('default', statement.expression.text);
+                    this.skip.add(statement);
+                } else {
+                    this.exports.set('default', DEFAULT_NAME);
+                    this.defaultExport = statement;
+                }
+            } else if (modifiers(statement).some((modifier) => modifier.kind === ts.SyntaxKind.ExportKeyword)) {
+                let exported = null;
+                for (const modifier of modifiers(statement)) {
+                    if (modifier.kind === ts.SyntaxKind.ExportKeyword || modifier.kind === ts.SyntaxKind.DefaultKeyword) {
+                        this.skip.add(modifier);
+                        exported = modifier.kind === ts.SyntaxKind.DefaultKeyword ? 'default' : exported;
+                    }
+                }
+                if (ts.isVariableStatement(statement)) {
+                    for (const declaration of statement.declarationList.declarations) {
+                        for (const name of bindingNames(declaration.name)) {
+                            this.exports.set(name, name);
+                        }
+                    }
+                } else if (statement.name) {
+                    this.exports.set(exported || statement.name.text, statement.name.text);
+                } else {
+                    this.exports.set('default', DEFAULT_NAME);
+                    this.defaultExport = statement;
+                }
+            }
+        }
+        const visit = (node) => {
+            if (ts.isCallExpression(node) && node.expression.kind === ts.SyntaxKind.ImportKeyword) {
+                const argument = node.arguments[0];
+                if (argument && ts.isStringLiteralLike(argument)) {
+                    this.dynamic.push({ node, specifier: argument.text });
+                } else if (argument && ts.isTemplateExpression(argument) && argument.head.text.includes('/')) {
+                    this.dynamic.push({ node, prefix: argument.head.text });
+                } else {
+                    throw new BundleError(`${this.path}:${this.line(node)}: import() needs a string or a template literal starting with a folder`);
+                }
+            }
+            ts.forEachChild(node, visit);
+        };
+        visit(this.file);
+    }
+}
+
+class Bundler {
+    constructor(root) {
+        this.root = root;
+        this.modules = new Map();
+        // Modules in evaluation order: the entry's static imports, then those
+        // of each module loaded with import().
+        this.order = [];
+        this.dynamic = [];
+    }
+
+    load(modulePath) {
+        let module = this.modules.get(modulePath);
+        if (!module) {
+            module = new Module(this.root, modulePath);
+            this.modules.set(modulePath, module);
+        }
+        return module;
+    }
+
+    resolve(importer, specifier) {
+        if (isExternal(specifier)) {
+            return null;
+        }
+        let resolved;
+        if (specifier.startsWith('./') || specifier.startsWith('../')) {
+            resolved = path.posix.normalize(path.posix.join(path.posix.dirname(importer), specifier));
+        } else {
+            // The game resolves bare specifiers from the scripts folder.
+            resolved = path.posix.normalize(specifier);
+        }
+        if (resolved.startsWith('../')) {
+            throw new BundleError(`${importer}: ${specifier} points outside the scripts folder`);
+        }
+        return resolved.endsWith('.js') ? resolved : `${resolved}.js`;
+    }
+
+    dynamicTargets(module, call) {
+        // A string names one module, a template literal every .js file in the
+        // folder its prefix points to.
+        if (call.specifier !== undefined) {
+            return [this.resolve(module.path, call.specifier)].filter(Boolean);
+        }
+        const folder = path.posix.dirname(this.resolve(module.path, `${call.prefix}x`));
+        const dir = path.join(this.root, folder);
+        return fs.readdirSync(dir).sort()
+            .filter((name) => name.endsWith('.js') && fs.statSync(path.join(dir, name)).isFile())
+            .map((name) => folder === '.' ? name : `${folder}/${name}`);
+    }
+
+    requested(module) {
+        return module.requests.map((specifier) => this.resolve(module.path, specifier)).filter(Boolean);
+    }
+
+    visit(modulePath, stack) {
+        // Post-order walk of static imports, as in ES module evaluation.
+        if (this.order.includes(modulePath) || stack.has(modulePath)) {
+            return;
+        }
+        const module = this.load(modulePath);
+        stack.add(modulePath);
+        for (const target of this.requested(module)) {
+            this.visit(target, stack);
+        }
+        stack.delete(modulePath);
+        this.order.push(modulePath);
+    }
+
+    collect(entry) {
+        this.entry = entry;
+        this.visit(entry, new Set());
+        for (let i = 0; i < this.order.length; i++) {
+            const module = this.modules.get(this.order[i]);
+            for (const call of module.dynamic) {
+                call.targets = this.dynamicTargets(module, call);
+                for (const target of call.targets) {
+                    if (!this.dynamic.includes(target)) {
+                        this.dynamic.push(target);
+                        this.visit(target, new Set());
+                    }
+                }
+            }
+        }
+    }
+
+    graph(entry) {
+        // Every module the game loads from the entry, through static imports
+        // and import() alike, with the fewest imports it takes to reach it.
+        const depth = { [entry]: 0 };
+        const queue = [entry];
+        while (queue.length) {
+            const modulePath = queue.shift();
+            const module = this.load(modulePath);
+            const targets = this.requested(module).concat(...module.dynamic.map((call) => this.dynamicTargets(module, call)));
+            for (const target of targets) {
+                if (!(target in depth)) {
+                    depth[target] = depth[modulePath] + 1;
+                    queue.push(target);
+                }
+            }
+        }
+        return depth;
+    }
+
+    reach(entry) {
+        const found = new Set();
+        const stack = [entry];
+        while (stack.length) {
+            const modulePath = stack.pop();
+            if (!found.has(modulePath)) {
+                found.add(modulePath);
+                stack.push(...this.requested(this.modules.get(modulePath)));
+            }
+        }
+        return found;
+    }
+
+    split() {
+        // The file each module is emitted to. Static imports of the entry stay
+        // in it, except for the ones chunks import too: those are the first
+        // modules in evaluation order, so they move to a shared chunk the
+        // entry imports first, and a chunk never waits on the entry itself.
+        const reachable = this.reach(this.entry);
+        const main = this.order.filter((modulePath) => reachable.has(modulePath));
+        const reaches = this.dynamic.map((target) => [target, this.reach(target)]);
+        let cut = -1;
+        for (const [target, reached] of reaches) {
+            for (const modulePath of reached) {
+                cut = Math.max(cut, main.indexOf(modulePath));
+            }
+            cut = Math.max(cut, main.indexOf(target));
+        }
+        // Grown until no module before the cut imports one after it.
+        for (let grown = true; grown;) {
+            grown = false;
+            for (const modulePath of main.slice(0, cut + 1)) {
+                for (const target of this.requested(this.modules.get(modulePath))) {
+                    if (main.indexOf(target) > cut) {
+                        cut = main.indexOf(target);
+                        grown = true;
+                    }
+                }
+            }
+        }
+        const shared = cut < main.length - 1 ? `${CHUNKS}/shared-${hash(this.entry)}.js` : this.entry;
+        this.home = new Map();
+        for (const modulePath of this.order) {
+            const index = main.indexOf(modulePath);
+            if (index >= 0) {
+                this.home.set(modulePath, index <= cut ? shared : this.entry);
+                continue;
+            }
+            const entries = reaches.filter(([, reached]) => reached.has(modulePath)).map(([target]) => target);
+            this.home.set(modulePath, entries.length === 1 ? this.chunkFile(entries[0]) : `${CHUNKS}/shared-${hash(entries.join('\n'))}.js`);
+        }
+        const files = [this.entry, ...this.order.map((modulePath) => this.home.get(modulePath)), ...this.dynamic.map((target) => this.chunkFile(target))];
+        this.chunks = new Map([...new Set(files)].map((file) => [file, {
+            file, modules: [], externals: new Map(), imports: new Map(), exports: new Map(), calls: new Set() }]));
+        for (const modulePath of this.order) {
+            this.chunks.get(this.home.get(modulePath)).modules.push(this.modules.get(modulePath));
+        }
+    }
+
+    chunkFile(target) {
+        return `${CHUNKS}/${target}`;
+    }
+
+    bind() {
+        // Resolves every identifier to the binding it refers to: a key of
+        // "<module>\0<name>" for top-level bindings, "\0<specifier>\0<name>"
+        // for game module imports.
+        const files = new Map([...this.modules.values()].map((module) => [module.fileName, module.file]));
+        const host = ts.createCompilerHost(OPTIONS);
+        host.getSourceFile = (fileName) => files.get(fileName);
+        const program = ts.createProgram({ rootNames: [...files.keys()], options: OPTIONS, host });
+        for (const module of this.modules.values()) {
+            const [diagnostic] = program.getSyntacticDiagnostics(module.file);
+            if (diagnostic) {
+                const { line } = module.file.getLineAndCharacterOfPosition(diagnostic.start);
+                throw new BundleError(`${module.path}:${line + 1}: ${ts.flattenDiagnosticMessageText(diagnostic.messageText, ' ')}`);
+            }
+        }
+        const checker = program.getTypeChecker();
+        this.users = new Map();
+        this.names = new Map();
+        for (const modulePath of this.order) {
+            const module = this.modules.get(modulePath);
+            const keys = new Map();
+            module.keys = new Map();
+            for (const symbol of module.file.locals.values()) {
+                const name = ts.symbolName(symbol);
+                const imported = module.imports.get(name);
+                const key = imported ? this.findImport(modulePath, imported) : `${modulePath}\0${name}`;
+                module.keys.set(name, key);
+                keys.set(symbol, key);
+                if (symbol.exportSymbol) {
+                    keys.set(symbol.exportSymbol, key);
+                }
+            }
+            if (module.defaultExport) {
+                module.keys.set(DEFAULT_NAME, `${modulePath}\0${DEFAULT_NAME}`);
+            }
+            for (const [name, key] of module.keys) {
+                if (!this.users.has(key)) {
+                    this.users.set(key, new Map());
+                }
+                this.users.get(key).set(modulePath, name);
+            }
+            module.references = [];
+            const visit = (node, statement) => {
+                if (ts.isIdentifier(node) && !isPropertyName(node)) {
+                    if (!this.names.has(node.text)) {
+                        this.names.set(node.text, new Set());
+                    }
+                    this.names.get(node.text).add(modulePath);
+                }
+                // Only names declared at the top level can resolve to a
+                // top-level binding, which spares asking the checker about
+                // every property name.
+                if (ts.isIdentifier(node) && module.file.locals.has(node.escapedText)) {
+                    const shorthand = ts.isShorthandPropertyAssignment(node.parent) && node.parent.name === node;
+                    const symbol = shorthand ? checker.getShorthandAssignmentValueSymbol(node.parent) : checker.getSymbolAtLocation(node);
+                    const key = symbol && keys.get(symbol);
+                    if (key) {
+                        module.references.push({ node, key, statement, shorthand: shorthand || (ts.isBindingElement(node.parent)
+                            && node.parent.name === node && !node.parent.propertyName && !node.parent.dotDotDotToken
+                            && ts.isObjectBindingPattern(node.parent.parent)) });
+                    }
+                }
+                ts.forEachChild(node, (child) => visit(child, statement));
+            };
+            for (const statement of module.file.statements) {
+                if (!module.skip.has(statement)) {
+                    visit(statement, statement);
+                }
+            }
+        }
+        // What the entry and the modules loaded with import() export, which
+        // the files they are emitted to export in turn.
+        this.exported = [[this.entry, this.entry], ...this.dynamic.map((target) => [this.chunkFile(target), target])]
+            .flatMap(([file, modulePath]) => [...this.exportNames(modulePath)].sort()
+                .map((name) => ({ file, name, key: this.findExport(modulePath, name) })).filter(({ key }) => key));
+        if (this.names.has(DYNAMIC_IMPORT)) {
+            throw new BundleError(`${[...this.names.get(DYNAMIC_IMPORT)][0]}: ${DYNAMIC_IMPORT} is reserved for the bundle`);
+        }
+    }
+
+    findExport(modulePath, name, seen = new Set()) {
+        // The key of the binding an export resolves to, or null.
+        if (seen.has(modulePath)) {
+            return null;
+        }
+        const module = this.modules.get(modulePath);
+        if (module.exports.has(name)) {
+            const local = module.exports.get(name);
+            const imported = module.imports.get(local);
+            return imported ? this.findImport(modulePath, imported) : `${modulePath}\0${local}`;
+        }
+        if (module.reexports.has(name)) {
+            return this.findImport(modulePath, module.reexports.get(name));
+        }
+        if (name !== 'default') {
+            for (const specifier of module.stars) {
+                const target = this.resolve(modulePath, specifier);
+                const found = target && this.findExport(target, name, new Set([...seen, modulePath]));
+                if (found) {
+                    return found;
+                }
+            }
+        }
+        return null;
+    }
+
+    findImport(importer, { specifier, name }) {
+        const target = this.resolve(importer, specifier);
+        if (target === null) {
+            return `\0${specifier}\0${name}`;
+        }
+        if (name === '*') {
+            throw new BundleError(`${importer}: namespace imports of bundled modules are not supported`);
+        }
+        const found = this.findExport(target, name);
+        if (!found) {
+            throw new BundleError(`${importer}: ${target} does not export ${name}`);
+        }
+        return found;
+    }
+
+    exportNames(modulePath, seen = new Set()) {
+        const module = this.modules.get(modulePath);
+        const names = new Set([...module.exports.keys(), ...module.reexports.keys()]);
+        for (const specifier of module.stars) {
+            const target = this.resolve(modulePath, specifier);
+            if (target && !seen.has(target)) {
+                for (const name of this.exportNames(target, new Set([...seen, modulePath]))) {
+                    if (name !== 'default') {
+                        names.add(name);
+                    }
+                }
+            }
+        }
+        return names;
+    }
+
+    allocate() {
+        // Final names are unique across the bundle, so chunks can import them
+        // as they are. A module keeps its own spelling of a binding unless
+        // another binding has it, or another module has that identifier outside
+        // property names, where a local declaration could capture it.
+        this.final = new Map();
+        const taken = new Set([DYNAMIC_IMPORT]);
+        for (const [key, users] of this.users) {
+            // Game module imports are named as the first importer names them.
+            const base = key.startsWith('\0') ? users.values().next().value : key.split('\0')[1];
+            const fits = (candidate) => !taken.has(candidate)
+                && [...(this.names.get(candidate) || [])].every((user) => users.get(user) === candidate);
+            let final = base;
+            for (let i = 1; !fits(final); i++) {
+                final = `${base}$${i}`;
+            }
+            taken.add(final);
+            this.final.set(key, final);
+        }
+    }
+
+    shake() {
+        // Statements of pure modules are grouped by the bindings they declare,
+        // with statements only touching one of those (such as the function
+        // filling in an enum) joining its group. Groups are kept once kept
+        // code refers to them; the rest is dropped.
+        const groups = new Map();
+        const pending = this.exported.map(({ key }) => ({ key }));
+        for (const modulePath of this.order) {
+            const module = this.modules.get(modulePath);
+            const references = new Map(module.file.statements.map((statement) => [statement, []]));
+            for (const reference of module.references) {
+                references.get(reference.statement).push(reference);
+            }
+            for (const statement of module.file.statements) {
+                if (module.skip.has(statement)) {
+                    continue;
+                }
+                const used = references.get(statement);
+                const declared = this.declared(module, statement);
+                if (!isPure(modulePath)) {
+                    pending.push(...used);
+                } else if (declared.length) {
+                    const group = { module, statements: [statement], references: used, kept: false };
+                    for (const key of declared) {
+                        groups.set(key, group);
+                    }
+                } else {
+                    const own = new Set(used.map((reference) => reference.key).filter((key) => key.startsWith(`${modulePath}\0`)));
+                    const group = own.size === 1 && groups.get([...own][0]);
+                    if (group) {
+                        group.statements.push(statement);
+                        group.references.push(...used);
+                    } else {
+                        pending.push(...used);
+                    }
+                }
+            }
+        }
+        const kept = [...pending];
+        while (pending.length) {
+            const group = groups.get(pending.pop().key);
+            if (group && !group.kept) {
+                group.kept = true;
+                pending.push(...group.references);
+                kept.push(...group.references);
+            }
+        }
+        for (const group of new Set(groups.values())) {
+            for (const statement of group.statements) {
+                if (!group.kept) {
+                    group.module.skip.add(statement);
+                } else if (ts.isClassDeclaration(statement)) {
+                    this.shakeMembers(group.module, statement, kept);
+                }
+            }
+        }
+    }
+
+    declared(module, statement) {
+        let names = [];
+        if (ts.isVariableStatement(statement)) {
+            names = statement.declarationList.declarations.flatMap((declaration) => bindingNames(declaration.name));
+        } else if ((ts.isFunctionDeclaration(statement) || ts.isClassDeclaration(statement)) && statement.name) {
+            names = [statement.name.text];
+        } else if (statement === module.defaultExport) {
+            names = [DEFAULT_NAME];
+        }
+        return names.map((name) => module.keys.get(name)).filter(Boolean);
+    }
+
+    shakeMembers(module, declaration, kept) {
+        // Drops members never read through the class's name or this.
+        const key = declaration.name ? module.keys.get(declaration.name.text) : `${module.path}\0${DEFAULT_NAME}`;
+        const read = new Set();
+        if (this.exported.some((binding) => binding.key === key)) {
+            return;
+        }
+        for (const reference of kept) {
+            if (reference.key !== key || reference.node === declaration.name) {
+                continue;
+            }
+            const parent = reference.node.parent;
+            if (!ts.isPropertyAccessExpression(parent) || parent.expression !== reference.node) {
+                return;
+            }
+            read.add(parent.name.text);
+        }
+        const visit = (node) => {
+            if (ts.isPropertyAccessExpression(node) && node.expression.kind === ts.SyntaxKind.ThisKeyword) {
+                read.add(node.name.text);
+            }
+            ts.forEachChild(node, visit);
+        };
+        visit(declaration);
+        for (const member of declaration.members) {
+            const name = member.name && (ts.isIdentifier(member.name) || ts.isPrivateIdentifier(member.name)
+                || ts.isStringLiteral(member.name)) ? member.name.text : null;
+            if (ts.isSemicolonClassElement(member) || name !== null && !ts.isConstructorDeclaration(member) && !read.has(name)) {
+                module.skip.add(member);
+            }
+        }
+    }
+
+    live(module, node) {
+        for (let ancestor = node; ancestor !== module.file; ancestor = ancestor.parent) {
+            if (module.skip.has(ancestor)) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    link() {
+        // What each chunk imports and exports, and the edits renaming every
+        // reference to its final name.
+        const need = (chunk, key, exported) => {
+            const final = this.final.get(key);
+            if (key.startsWith('\0')) {
+                const [, specifier, name] = key.split('\0');
+                if (!chunk.externals.has(specifier)) {
+                    chunk.externals.set(specifier, new Map());
+                }
+                chunk.externals.get(specifier).set(final, name);
+            } else {
+                const home = this.chunks.get(this.home.get(key.split('\0')[0]));
+                if (home !== chunk) {
+                    if (!chunk.imports.has(home.file)) {
+                        chunk.imports.set(home.file, new Set());
+                    }
+                    chunk.imports.get(home.file).add(final);
+                    home.exports.set(final, final);
+                }
+            }
+            if (exported) {
+                chunk.exports.set(exported, final);
+            }
+        };
+        for (const chunk of this.chunks.values()) {
+            for (const module of chunk.modules) {
+                for (const specifier of module.requests) {
+                    if (isExternal(specifier) && !chunk.externals.has(specifier)) {
+                        chunk.externals.set(specifier, new Map());
+                    }
+                }
+                for (const reference of module.references) {
+                    if (this.live(module, reference.node)) {
+                        need(chunk, reference.key);
+                    }
+                    const final = this.final.get(reference.key);
+                    const local = reference.node.text;
+                    if (final !== local) {
+                        module.replace.set(reference.node.getStart(module.file), reference.shorthand ? `${local}:${final}` : final);
+                    }
+                }
+                for (const call of module.dynamic) {
+                    if (this.live(module, call.node)) {
+                        const [keyword, open] = call.node.getChildren(module.file);
+                        module.replace.set(keyword.getStart(module.file), DYNAMIC_IMPORT);
+                        module.replace.set(open.getStart(module.file), `(${JSON.stringify(path.posix.dirname(module.path))},`);
+                        call.targets.forEach((target) => chunk.calls.add(target));
+                    }
+                }
+                const statement = module.defaultExport;
+                if (statement) {
+                    module.defaultName = this.final.get(module.keys.get(DEFAULT_NAME));
+                }
+                if (statement && !ts.isExportAssignment(statement)) {
+                    const keyword = statement.asteriskToken || statement.getChildren(module.file).find((child) =>
+                        child.kind === ts.SyntaxKind.FunctionKeyword || child.kind === ts.SyntaxKind.ClassKeyword);
+                    module.insert.set(keyword.getStart(module.file), module.defaultName);
+                }
+            }
+        }
+        for (const { file, name, key } of this.exported) {
+            need(this.chunks.get(file), key, name);
+        }
+    }
+
+    emit(sourceMap) {
+        const files = [];
+        for (const chunk of this.chunks.values()) {
+            const writer = new Writer(sourceMap);
+            const lines = [];
+            for (const [specifier, names] of chunk.externals) {
+                const named = [...names].filter(([, name]) => name !== '*')
+                    .map(([final, name]) => name === final ? final : `${name} as ${final}`).sort();
+                for (const [final, name] of names) {
+                    if (name === '*') {
+                        lines.push(`import*as ${final} from${JSON.stringify(specifier)};`);
+                    }
+                }
+                if (named.length || !names.size) {
+                    lines.push(named.length ? `import{${named.join(',')}}from${JSON.stringify(specifier)};` : `import${JSON.stringify(specifier)};`);
+                }
+            }
+            for (const file of this.chunks.keys()) {
+                if (chunk.imports.has(file)) {
+                    lines.push(`import{${[...chunk.imports.get(file)].sort().join(',')}}from${JSON.stringify(relative(chunk.file, file))};`);
+                }
+            }
+            if (chunk.calls.size) {
+                lines.push(this.runtime(chunk));
+            }
+            if (lines.length) {
+                writer.write(`${lines.join('\n')}\n`);
+            }
+            chunk.modules.forEach((module, index) => writer.module(module, index));
+            if (chunk.exports.size) {
+                const names = [...chunk.exports].map(([exported, final]) => exported === final ? final : `${final} as ${exported}`);
+                writer.write(`export{${names.sort().join(',')}};\n`);
+            }
+            files.push({ file: chunk.file, code: writer.parts.join(''), mappings: sourceMap && writer.encode(),
+                sources: chunk.modules.map((module) => module.path), sourcesContent: chunk.modules.map((module) => module.file.text) });
+        }
+        return files;
+    }
+
+    runtime(chunk) {
+        // Stands in for import() in the chunk: resolves the specifier against
+        // the importing module's folder and loads the chunk of that module.
+        const entries = [...chunk.calls].map((target) =>
+            `${JSON.stringify(target)}:()=>import(${JSON.stringify(relative(chunk.file, this.chunkFile(target)))})`);
+        return `const ${DYNAMIC_IMPORT}=((modules)=>async(base,specifier)=>{const parts=[];`
+            + 'for(const part of(specifier.startsWith(".")?base+"/"+specifier:specifier).split("/")){'
+            + 'if(part===".."){parts.pop()}else if(part&&part!=="."){parts.push(part)}}'
+            + 'let path=parts.join("/");if(!path.endsWith(".js")){path+=".js"}'
+            + 'if(!(path in modules)){throw new ReferenceError(`Could not find module ${path}`)}'
+            + `return modules[path]()})({__proto__:null,${entries.join(',')}});`;
+    }
+}
+
+class Writer {
+    // Writes the kept tokens with only the whitespace they need. Line breaks
+    // are kept where automatic semicolon insertion could depend on them.
+    // With a source map, follows the output as source map v3 "mappings".
+
+    constructor(sourceMap) {
+        this.parts = [];
+        this.lines = sourceMap ? [[]] : null;
+        this.column = 0;
+    }
+
+    write(text) {
+        this.parts.push(text);
+        if (this.lines) {
+            const breaks = text.split('\n').length - 1;
+            if (breaks) {
+                this.lines.push(...Array.from({ length: breaks }, () => []));
+                this.column = text.length - text.lastIndexOf('\n') - 1;
+            } else {
+                this.column += text.length;
+            }
+        }
+    }
+
+    token(text, newline, number, segment) {
+        const previous = this.previous;
+        if (previous !== null) {
+            if (newline && ![';', '{', ','].includes(previous) && !['}', ';'].includes(text)) {
+                this.write('\n');
+            } else if (WORD.test(previous[previous.length - 1]) && WORD.test(text[0])
+                    || ['++', '--', '//', '/*'].includes(previous[previous.length - 1] + text[0])
+                    || this.number && text[0] === '.') {
+                this.write(' ');
+            }
+        }
+        if (this.lines && segment) {
+            this.lines[this.lines.length - 1].push([this.column, ...segment]);
+        }
+        this.write(text);
+        this.previous = text;
+        this.number = number;
+    }
+
+    module(module, index) {
+        const file = module.file;
+        this.previous = null;
+        const position = (node) => {
+            const { line, character } = file.getLineAndCharacterOfPosition(node.getStart(file));
+            return [index, line, character];
+        };
+        const visit = (node) => {
+            if (module.skip.has(node) || node.kind >= ts.SyntaxKind.FirstJSDocNode && node.kind <= ts.SyntaxKind.LastJSDocNode) {
+                return;
+            }
+            if (node === module.defaultExport && ts.isExportAssignment(node)) {
+                this.token(`const ${module.defaultName}=`, LINE_BREAK.test(file.text.slice(node.pos, node.getStart(file))), false, position(node));
+                visit(node.expression);
+                this.token(';', false, false, null);
+                return;
+            }
+            const children = node.getChildren(file);
+            if (children.length) {
+                children.forEach(visit);
+                return;
+            }
+            const start = node.getStart(file);
+            if (start === node.end) {
+                return;
+            }
+            const text = module.replace.has(start) ? module.replace.get(start) : file.text.slice(start, node.end);
+            this.token(text, LINE_BREAK.test(file.text.slice(node.pos, start)), node.kind === ts.SyntaxKind.NumericLiteral, position(node));
+            if (module.insert.has(start)) {
+                this.token(module.insert.get(start), false, false, null);
+            }
+        };
+        visit(file);
+        this.write('\n');
+    }
+
+    encode() {
+        const state = [0, 0, 0, 0];
+        return this.lines.map((segments) => {
+            state[0] = 0;
+            return segments.map((segment) => {
+                const encoded = segment.map((value, k) => vlq(value - state[k])).join('');
+                state.splice(0, 4, ...segment);
+                return encoded;
+            }).join(',');
+        }).join(';');
+    }
+}
+
+function vlq(value) {
+    value = value < 0 ? (-value << 1) | 1 : value << 1;
+    let encoded = '';
+    do {
+        const digit = value & 31;
+        value >>>= 5;
+        encoded += BASE64[digit | (value ? 32 : 0)];
+    } while (value);
+    return encoded;
+}
+
+function bundle(root, entry, outDir, sourceMap) {
+    const bundler = new Bundler(root);
+    bundler.collect(path.posix.normalize(entry));
+    bundler.split();
+    bundler.bind();
+    bundler.allocate();
+    bundler.shake();
+    bundler.link();
+    const files = bundler.emit(sourceMap);
+    let bytes = 0;
+    for (const { file, code, mappings, sources, sourcesContent } of files) {
+        const out = path.join(outDir, file);
+        const text = sourceMap ? `${code}//# sourceMappingURL=${path.basename(file)}.map\n` : code;
+        fs.mkdirSync(path.dirname(out), { recursive: true });
+        fs.writeFileSync(out, text);
+        if (sourceMap) {
+            fs.writeFileSync(`${out}.map`, JSON.stringify({ version: 3, file: path.basename(file),
+                sources, sourcesContent, names: [], mappings }));
+        }
+        bytes += Buffer.byteLength(text);
+    }
+    return {
+        modules: bundler.order.length, chunks: files.map(({ file }) => file), bytes,
+        source_bytes: bundler.order.reduce((total, modulePath) => total + fs.statSync(path.join(root, modulePath)).size, 0),
+    };
+}
+
+function main([command, root, entry, outDir, ...flags]) {
+    if (command === 'bundle') {
+        return bundle(root, entry, outDir, flags.includes('--source-map'));
+    }
+    if (command === 'graph') {
+        return new Bundler(root).graph(path.posix.normalize(entry));
+    }
+    throw new Error(`unknown command ${command}`);
+}
+
+try {
+    process.stdout.write(`${JSON.stringify(main(process.argv.slice(3)))}\n`);
+} catch (err) {
+    if (!(err instanceof BundleError)) {
+        throw err;
+    }
+    process.stderr.write(`${err.message}\n`);
+    process.exitCode = ERROR_EXIT;
+}
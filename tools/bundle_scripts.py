@@ -0,0 +1,73 @@
+import json, argparse
+import os
+import posixpath
+import shutil
+import subprocess
+
+from build_daemon import typescript_package
+from profiler import profiler
+
+BUNDLER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bundle_scripts.js')
+# Exit code of bundle_scripts.js for scripts it cannot bundle.
+ERROR_EXIT = 2
+
+
+class BundleError(Exception):
+    pass
+
+
+def find_typescript():
+    # The typescript devDependency of this repository, else the package of
+    # the tsc on the PATH.
+    local = os.path.join(os.path.dirname(os.path.dirname(BUNDLER)), 'node_modules', 'typescript')
+    if os.path.isfile(os.path.join(local, 'package.json')):
+        return local
+    tsc = shutil.which('tsc')
+    return tsc and typescript_package(tsc)
+
+def run(command, *args):
+    # Runs a command of bundle_scripts.js, which parses the scripts with the
+    # TypeScript compiler, and returns what it printed.
+    typescript = find_typescript()
+    if not typescript or not shutil.which('node'):
+        raise BundleError('bundling needs node and the typescript package (npm install)')
+    result = subprocess.run(['node', BUNDLER, typescript, command, *args], capture_output=True, text=True, encoding='utf-8')
+    if result.returncode:
+        raise BundleError(result.stderr.strip() if result.returncode == ERROR_EXIT else f'bundle_scripts.js failed:\n{result.stderr}')
+    return json.loads(result.stdout)
+
+def bundle(root, entry, out_dir, source_map=False):
+    # Bundles root/entry and everything it imports into out_dir: the entry,
+    # and a chunk under out_dir/chunks per module loaded with import().
+    with profiler.span('bundle scripts', files=0) as span:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        stats = run('bundle', root, entry, out_dir, *(['--source-map'] if source_map else []))
+        span['files'] = stats['modules']
+        return stats
+
+def module_graph(root, entry):
+    # Every module the game loads from the entry, through static imports and
+    # import() alike, with its depth: the fewest imports from the entry.
+    return run('graph', root, entry)
+
+def script_entry(bp_dir='BP'):
+    # The manifest's script entry, relative to the pack's scripts folder.
+    with open(os.path.join(bp_dir, 'manifest.json'), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    for module in manifest.get('modules', []):
+        if module.get('type') == 'script':
+            return posixpath.relpath(module['entry'], 'scripts')
+    raise BundleError(f'{bp_dir}/manifest.json has no script module')
+
+def report(stats):
+    print(f'bundled {stats["modules"]} modules into {len(stats["chunks"])} files: {stats["source_bytes"] / 1024:.1f} KiB -> {stats["bytes"] / 1024:.1f} KiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bundle the behavior pack scripts into an entry module and a chunk per module loaded with import().')
+    parser.add_argument('--bp', default='BP', help='Behavior pack whose manifest entry and scripts folder are bundled.')
+    parser.add_argument('--out', default='builds/bundle', help='Folder the bundle is written to.')
+    parser.add_argument('--source-map', action='store_true', help='Also write source maps next to the bundled files.')
+    args = parser.parse_args()
+
+    report(bundle(os.path.join(args.bp, 'scripts'), script_entry(args.bp), args.out, args.source_map))
@@ -0,0 +1,165 @@
+import json, argparse
+import ctypes
+import errno
+import os
+import shutil
+import time
+
+from profiler import profiler, DEFAULT_TRACE
+
+# Where a Bedrock Dedicated Server looks for packs and per-module config.
+PACK_FOLDERS = {'BP': 'development_behavior_packs', 'RP': 'development_resource_packs'}
+CONFIG_FOLDER = 'config'
+# renameat2(2) flag and the "relative to the working directory" fd.
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+
+def load_renameat2():
+    try:
+        return ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return None
+
+renameat2 = load_renameat2()
+
+def exchange(staged, live):
+    # Swaps two folders so that live holds the staged tree and staged the old
+    # one. On Linux this is a single atomic renameat2; elsewhere live is moved
+    # aside first, leaving it missing between two renames.
+    if renameat2 is not None:
+        if renameat2(AT_FDCWD, os.fsencode(staged), AT_FDCWD, os.fsencode(live), RENAME_EXCHANGE) == 0:
+            return
+        if ctypes.get_errno() not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), live)
+    aside = f'{staged}.old'
+    os.rename(live, aside)
+    os.rename(staged, live)
+    os.rename(aside, staged)
+
+def pack_folder(server_dir, top):
+    # "Name BP" goes to the behavior packs, "Name RP" to the resource packs.
+    return os.path.join(server_dir, PACK_FOLDERS[top[top.rfind(' ') + 1:]], top)
+
+def script_module_uuid(manifest_path):
+    # Scripts read their variables.json from config/<script module uuid>.
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    for module in manifest.get('modules', []):
+        if module.get('type') == 'script':
+            return module['uuid']
+    return 'default'
+
+def stage_pack(files, live, staged, stats):
+    # Builds the new pack beside the live one. Files the live pack already
+    # has with the same size and mtime are hardlinked from it (deployed files
+    # are never written in place); everything else is copied.
+    shutil.rmtree(staged, ignore_errors=True)
+    for src, rel in files:
+        dst = os.path.join(staged, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        src_stat = os.stat(src)
+        try:
+            live_stat = os.stat(os.path.join(live, rel))
+            if live_stat.st_size == src_stat.st_size and live_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                os.link(os.path.join(live, rel), dst)
+                stats['linked'] += 1
+                continue
+        except OSError:
+            pass
+        shutil.copy2(src, dst)
+        stats['copied'] += 1
+        stats['bytes'] += src_stat.st_size
+
+def send_command(pipe, command):
+    # Writes a console command to the server through the FIFO (or file) its
+    # stdin is read from. Never blocks when no server is reading the FIFO.
+    try:
+        fd = os.open(pipe, os.O_WRONLY | os.O_APPEND | os.O_NONBLOCK)
+    except OSError as err:
+        if err.errno != errno.ENXIO:
+            raise
+        print(f'{command} not sent: no server is reading {pipe}.')
+        return False
+    with os.fdopen(fd, 'w') as file:
+        file.write(command + '\n')
+    return True
+
+def deploy(server_dir, entries, reload_pipe=None):
+    # Installs (path, arcname) entries, as packaged into a .mcaddon or
+    # server.zip, into a local server. Every pack and the variables.json are
+    # staged in full first, then swapped in one after another, so the server
+    # only sees the old or the new version of each pack.
+    with profiler.span('deploy', cat='deploy', files=len(entries)) as span:
+        stats = deploy_entries(server_dir, entries, reload_pipe)
+        span.update(files=stats['copied'], bytes=stats['bytes'])
+    return stats
+
+def deploy_entries(server_dir, entries, reload_pipe):
+    stats = {'packs': 0, 'copied': 0, 'linked': 0, 'bytes': 0, 'window_ms': 0.0, 'reloaded': False}
+    packs = {}
+    variables = None
+    for path, arcname in entries:
+        if arcname == 'variables.json':
+            variables = path
+            continue
+        top, rel = arcname.split('/', 1)
+        packs.setdefault(top, []).append((path, rel))
+
+    swaps = []
+    for top, files in packs.items():
+        live = pack_folder(server_dir, top)
+        staged = f'{live}.staged'
+        stage_pack(files, live, staged, stats)
+        swaps.append((staged, live))
+    if variables:
+        bp = next((files for top, files in packs.items() if top.endswith(' BP')), [])
+        manifest = next((src for src, rel in bp if rel == 'manifest.json'), None)
+        config_path = os.path.join(server_dir, CONFIG_FOLDER, script_module_uuid(manifest) if manifest else 'default', 'variables.json')
+        os.makedirs(os.path.dirname(config_path), exist_ok=True)
+        staged_config = f'{config_path}.staged'
+        shutil.copyfile(variables, staged_config)
+
+    start = time.perf_counter()
+    for staged, live in swaps:
+        if os.path.isdir(live):
+            exchange(staged, live)
+        else:
+            os.makedirs(os.path.dirname(live), exist_ok=True)
+            os.rename(staged, live)
+    if variables:
+        os.replace(staged_config, config_path)
+    stats['window_ms'] = (time.perf_counter() - start) * 1000
+    stats['packs'] = len(swaps)
+
+    if reload_pipe:
+        stats['reloaded'] = send_command(reload_pipe, 'reload')
+    # The previous packs now sit in the staged folders.
+    for staged, _ in swaps:
+        shutil.rmtree(staged, ignore_errors=True)
+    return stats
+
+def report(stats, server_dir):
+    print(f'deployed {stats["packs"]} packs to {server_dir}: {stats["copied"]} files copied '
+        f'({stats["bytes"] / 1024:.1f} KiB), {stats["linked"]} unchanged, swapped in {stats["window_ms"]:.2f} ms'
+        + (', reload sent' if stats['reloaded'] else ''))
+
+
+if __name__ == '__main__':
+    import process_manifest
+    from build import get_archive_entries
+
+    parser = argparse.ArgumentParser(description='Deploy the packs to a local Bedrock Dedicated Server, swapping them in atomically.')
+    parser.add_argument('server', help='Folder of the Bedrock Dedicated Server.')
+    parser.add_argument('--target', choices=['release', 'debug', 'server'], default='server', help='Target the BP/RP folders were built for; server also deploys builds/variables.json.')
+    parser.add_argument('--reload-pipe', help='FIFO the server reads its stdin from; "reload" is written to it after deploying.')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_TRACE, metavar='TRACE', help=f'Profile deploying and write a Chrome trace (default: {DEFAULT_TRACE}) plus a text summary.')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+    manifest = process_manifest.load_manifest()
+    report(deploy(args.server, get_archive_entries(args.target, manifest), args.reload_pipe), args.server)
+    if args.profile:
+        profiler.write_trace(args.profile)
+        print(profiler.summary())
@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+import json, os, tempfile
+
+# Parsed JSON files of this process keyed by path, with the (mtime, size)
+# they were parsed at. A one-shot build reads every file once anyway; the
+# build daemon keeps the manifest, settings and hash indexes parsed between
+# builds and only reads a file again once something else rewrote it.
+loaded = {}
+
+# mkstemp creates files only the owner can read; written files get the
+# permissions open() would have given them.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextmanager
+def write_atomic(path, mode='w', **kwargs):
+    # Opens a temporary file of its own beside path and moves it over path
+    # once the block is done, so readers never see a partial file and
+    # concurrent writers never share a temporary file.
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=folder)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            yield file
+        os.chmod(tmp, 0o666 & ~UMASK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def load(path):
+    # The parsed content is shared with later calls: callers that change it
+    # either copy it first or write it back with dump.
+    key = stat_key(path)
+    cached = loaded.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    loaded[path] = (key, data)
+    return data
+
+def dump(path, data, **kwargs):
+    with write_atomic(path, encoding='utf-8') as file:
+        json.dump(data, file, **kwargs)
+    loaded[path] = (stat_key(path), data)
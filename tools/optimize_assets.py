@@ -0,0 +1,174 @@
+from concurrent.futures import ProcessPoolExecutor
+import json, argparse
+import os
+import struct
+import zlib
+
+from json_cache import write_atomic
+from pack_archive import clone_file, mirror_tree
+from process_config import compute_hash
+from profiler import profiler
+
+# Bump when an optimizer changes its output, so cached results are redone.
+OPTIMIZER_VERSION = 1
+CACHE_DIR = 'builds/.asset_cache'
+JSON_EXTENSIONS = ('.json', '.material')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def reject_duplicate_keys(pairs):
+    # Dropping a repeated key would change what the game reads, so such files
+    # are left as authored.
+    keys = [key for key, _ in pairs]
+    if len(keys) != len(set(keys)):
+        raise ValueError('duplicate key')
+    return dict(pairs)
+
+def minify_json(data):
+    try:
+        content = json.loads(data.decode('utf-8-sig'), object_pairs_hook=reject_duplicate_keys)
+    except ValueError:
+        return data
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def png_chunks(data):
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        yield kind, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+def png_chunk(kind, body):
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+def recompress_png(data):
+    # Re-deflates the image data at the highest level and joins it into a
+    # single IDAT chunk. Pixels, filters and every other chunk are kept as is.
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    try:
+        chunks = list(png_chunks(data))
+        if any(kind == b'acTL' for kind, _ in chunks):
+            return data
+        raw = zlib.decompress(b''.join(body for kind, body in chunks if kind == b'IDAT'))
+    except (struct.error, zlib.error):
+        return data
+
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidate = compressor.compress(raw) + compressor.flush()
+        if best is None or len(candidate) < len(best):
+            best = candidate
+
+    output = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b'IDAT':
+            if best is not None:
+                output.append(png_chunk(b'IDAT', best))
+                best = None
+        else:
+            output.append(png_chunk(kind, body))
+    optimized = b''.join(output)
+    return optimized if len(optimized) < len(data) else data
+
+def optimizer_for(path):
+    if path.endswith(JSON_EXTENSIONS):
+        return minify_json
+    if path.endswith('.png'):
+        return recompress_png
+    return None
+
+def optimize_asset(src, cache_path):
+    # Runs in a worker process; the result goes straight to the cache so only
+    # the sizes travel back.
+    with open(src, 'rb') as file:
+        data = file.read()
+    optimized = optimizer_for(src)(data)
+    with write_atomic(cache_path, 'wb') as file:
+        file.write(optimized)
+    return len(data), len(optimized)
+
+def find_duplicates(hashes):
+    # Groups of files with identical content, largest waste first.
+    groups = {}
+    for path, (digest, size) in hashes.items():
+        groups.setdefault(digest, []).append((path, size))
+    duplicates = [(files[0][1], sorted(path for path, _ in files)) for files in groups.values() if len(files) > 1]
+    return sorted(duplicates, key=lambda group: -group[0] * (len(group[1]) - 1))
+
+def optimize_trees(trees, cache_dir=CACHE_DIR, workers=None):
+    # Mirrors each (src, dst) pair and swaps optimized copies of JSON and PNG
+    # files into dst. Results are cached by source content hash, so only new
+    # or changed assets are handed to the process pool; cached results no
+    # asset of this build refers to are removed.
+    with profiler.span('optimize assets', files=0) as span:
+        return optimize_trees_into(trees, cache_dir, workers, span)
+
+def optimize_trees_into(trees, cache_dir, workers, span):
+    os.makedirs(cache_dir, exist_ok=True)
+    hashes = {}
+    assets = []
+    for src, dst in trees:
+        mirror_tree(src, dst)
+        for folderName, _, filenames in os.walk(src):
+            for filename in filenames:
+                path = os.path.join(folderName, filename)
+                digest = compute_hash(path)
+                hashes[path] = (digest, os.path.getsize(path))
+                if optimizer_for(path):
+                    ext = os.path.splitext(path)[1]
+                    cache_path = os.path.join(cache_dir, f'{digest}-{OPTIMIZER_VERSION}{ext}')
+                    assets.append((path, os.path.join(dst, os.path.relpath(path, src)), cache_path))
+
+    misses = list({cache_path: src for src, _, cache_path in assets if not os.path.exists(cache_path)}.items())
+    if len(misses) > 1:
+        with ProcessPoolExecutor(min(len(misses), workers or os.cpu_count() or 1)) as pool:
+            list(pool.map(optimize_asset, [src for _, src in misses], [cache_path for cache_path, _ in misses]))
+    else:
+        for cache_path, src in misses:
+            optimize_asset(src, cache_path)
+    span['files'] = len(misses)
+
+    stats = {'assets': len(assets), 'optimized': len(misses), 'cached': len(assets) - len(misses), 'before': 0, 'after': 0}
+    for src, dst, cache_path in assets:
+        stats['before'] += hashes[src][1]
+        stats['after'] += os.path.getsize(cache_path)
+        try:
+            if os.path.samestat(os.stat(cache_path), os.stat(dst)):
+                continue
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        clone_file(cache_path, dst)
+    stats['duplicates'] = find_duplicates(hashes)
+    stats['pruned'] = prune_cache(cache_dir, {os.path.basename(cache_path) for _, _, cache_path in assets})
+    return stats
+
+def prune_cache(cache_dir, keep):
+    # Results of edited, removed or older-version assets would otherwise pile
+    # up forever. Copies already in dst are hardlinks or clones of their own.
+    pruned = 0
+    for filename in os.listdir(cache_dir):
+        if filename not in keep:
+            os.remove(os.path.join(cache_dir, filename))
+            pruned += 1
+    return pruned
+
+def report(stats):
+    saved = stats['before'] - stats['after']
+    print(f'optimized {stats["assets"]} assets ({stats["optimized"]} processed, {stats["cached"]} cached): '
+        f'{stats["before"] / 1024:.1f} KiB -> {stats["after"] / 1024:.1f} KiB ({saved / 1024:.1f} KiB saved), '
+        f'{stats["pruned"]} stale cache entries removed')
+    for size, paths in stats['duplicates']:
+        print(f'duplicate asset ({size / 1024:.1f} KiB x {len(paths)}): {", ".join(paths)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Minify JSON and recompress PNGs of the packs into optimized copies.')
+    parser.add_argument('--bp', default='BP', help='Behavior pack folder to optimize.')
+    parser.add_argument('--rp', default='RP', help='Resource pack folder to optimize.')
+    parser.add_argument('--out', default='builds/optimized', help='Folder receiving the optimized BP and RP.')
+    args = parser.parse_args()
+
+    report(optimize_trees([(args.bp, os.path.join(args.out, 'BP')), (args.rp, os.path.join(args.out, 'RP'))]))
@@ -0,0 +1,173 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import os, shutil, struct, tempfile, time, zlib
+
+from json_cache import write_atomic
+from profiler import profiler
+
+COMPRESSION = {'stored': 0, 'deflate': 8}
+# Deflate level of every archive unless build.py --level says otherwise.
+DEFAULT_LEVEL = 9
+ZIP_VERSION = 20
+UTF8_FLAG = 0x800
+# Regular file, rw-r--r--
+EXTERNAL_ATTR = 0o100644 << 16
+# Linux ioctl for cloning a file's extents (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def pack_entries(dirname, arcname):
+    # (path, arcname) pairs for every file under dirname, in a stable order.
+    entries = []
+    for folderName, dirnames, filenames in os.walk(dirname):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            filePath = os.path.join(folderName, filename)
+            entries.append((filePath, (Path(arcname) / Path(filePath).relative_to(dirname)).as_posix()))
+    return entries
+
+def clone_file(src, dst):
+    # Hardlink, else reflink (copy-on-write clone), else a plain copy.
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    copy_file(src, dst)
+
+def copy_file(src, dst):
+    # Reflink (copy-on-write clone), else a plain copy; never shares the inode,
+    # so dst can be written in place without touching src.
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return
+    except (ImportError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+    shutil.copy2(src, dst)
+
+def stage_copy(src, dst):
+    # copy_file into a temporary file of its own beside dst, which the caller
+    # moves over dst with os.replace, possibly with a whole batch of others.
+    folder = os.path.dirname(dst) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{os.path.basename(dst)}.', suffix='.tmp', dir=folder)
+    os.close(fd)
+    try:
+        copy_file(src, tmp)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+def copy_atomic(src, dst):
+    # copy_file that readers of dst never see half done.
+    os.replace(stage_copy(src, dst), dst)
+
+def mirror_tree(src, dst):
+    # Incrementally update dst to mirror src using clone_file. Files already
+    # linked to (or matching the size and mtime of) their source are left
+    # alone and files missing from src are removed.
+    with profiler.span(f'mirror {src}', files=0) as span:
+        mirror_tree_into(src, dst, span)
+
+def mirror_tree_into(src, dst, span):
+    sources = set()
+    for folderName, _, filenames in os.walk(src):
+        rel_folder = os.path.relpath(folderName, src)
+        os.makedirs(os.path.join(dst, rel_folder), exist_ok=True)
+        for filename in filenames:
+            rel = os.path.normpath(os.path.join(rel_folder, filename))
+            sources.add(rel)
+            src_file = os.path.join(src, rel)
+            dst_file = os.path.join(dst, rel)
+            try:
+                src_stat = os.stat(src_file)
+                dst_stat = os.stat(dst_file)
+                if os.path.samestat(src_stat, dst_stat) or (
+                        src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns):
+                    continue
+                os.remove(dst_file)
+            except FileNotFoundError:
+                pass
+            clone_file(src_file, dst_file)
+            span['files'] += 1
+
+    for folderName, _, filenames in os.walk(dst, topdown=False):
+        for filename in filenames:
+            rel = os.path.normpath(os.path.relpath(os.path.join(folderName, filename), dst))
+            if rel not in sources:
+                os.remove(os.path.join(folderName, filename))
+        if folderName != dst and not os.listdir(folderName):
+            os.rmdir(folderName)
+
+def dos_timestamp():
+    # Fixed entry timestamps keep archives byte-identical across builds;
+    # SOURCE_DATE_EPOCH overrides the ZIP epoch when a real date is wanted.
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    year, month, day, hour, minute, second = time.gmtime(int(epoch))[:6] if epoch else (1980, 1, 1, 0, 0, 0)
+    year = max(year, 1980)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+def compress_entry(path, method, level):
+    with open(path, 'rb') as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    if method == COMPRESSION['deflate']:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Incompressible files (mostly PNGs) are smaller stored as-is.
+        if len(compressed) < len(data):
+            return method, crc, compressed, len(data)
+    return COMPRESSION['stored'], crc, data, len(data)
+
+def write_archive(path, entries, compression='deflate', level=DEFAULT_LEVEL, workers=None):
+    # Entries are compressed in parallel (zlib releases the GIL) and streamed
+    # into the archive in their given order, keeping only a bounded window of
+    # compressed entries in memory.
+    with profiler.span(f'archive {os.path.basename(path)}', files=len(entries)):
+        write_archive_entries(path, entries, compression, level, workers)
+
+def write_archive_entries(path, entries, compression, level, workers):
+    method = COMPRESSION[compression]
+    dos_time, dos_date = dos_timestamp()
+    central = []
+    with ThreadPoolExecutor(workers) as pool, write_atomic(path, 'wb') as out:
+        window = (workers or os.cpu_count() or 1) * 4
+        pending = deque()
+        queue = iter(entries)
+
+        def submit():
+            for source, arcname in queue:
+                pending.append((arcname, pool.submit(compress_entry, source, method, level)))
+                if len(pending) >= window:
+                    return
+
+        submit()
+        while pending:
+            arcname, future = pending.popleft()
+            entry_method, crc, data, size = future.result()
+            submit()
+            name = arcname.encode('utf-8')
+            offset = out.tell()
+            if offset > 0xFFFFFFFF or len(data) > 0xFFFFFFFF or size > 0xFFFFFFFF:
+                raise ValueError(f'{path} is too large for a non-ZIP64 archive')
+            out.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, ZIP_VERSION, UTF8_FLAG, entry_method,
+                dos_time, dos_date, crc, len(data), size, len(name), 0))
+            out.write(name)
+            out.write(data)
+            central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | ZIP_VERSION, ZIP_VERSION,
+                UTF8_FLAG, entry_method, dos_time, dos_date, crc, len(data), size, len(name), 0, 0, 0, 0,
+                EXTERNAL_ATTR, offset) + name)
+
+        if len(central) > 0xFFFF:
+            raise ValueError(f'{path} has too many entries for a non-ZIP64 archive')
+        central_offset = out.tell()
+        for record in central:
+            out.write(record)
+        out.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central),
+            out.tell() - central_offset, central_offset, 0))
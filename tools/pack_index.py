@@ -0,0 +1,152 @@
+import json, argparse
+import os
+import sys
+import tempfile
+import zipfile
+
+import pack_archive, deploy_server
+from json_cache import write_atomic
+from process_config import compute_hash
+from profiler import profiler
+
+INDEX_DIR = 'builds/index'
+INDEX_VERSION = 1
+DELTA_MANIFEST = 'delta.json'
+
+
+def pack_version(manifest):
+    version = manifest['header']['version']
+    return version if type(version) is str else '.'.join(map(str, version))
+
+def index_path(target, version):
+    return os.path.join(INDEX_DIR, target, f'v{version}.json')
+
+def build_index(entries, target, version, archive=None, digest=compute_hash):
+    # Size and sha256 of every archive entry, keyed by its path in the archive.
+    return {
+        'format': INDEX_VERSION, 'target': target, 'version': version, 'archive': archive,
+        'files': {arcname: {'size': os.path.getsize(path), 'sha256': digest(path)} for path, arcname in entries},
+    }
+
+def write_index(entries, target, manifest, archive=None, digest=compute_hash):
+    # Every build leaves builds/index/<target>/v<version>.json behind, so any
+    # two versions built on this machine can be diffed later.
+    version = pack_version(manifest)
+    path = index_path(target, version)
+    with profiler.span('index', cat='stage', files=len(entries)):
+        index = build_index(entries, target, version, archive, digest)
+    with write_atomic(path, encoding='utf-8') as file:
+        json.dump(index, file, indent=1, sort_keys=True)
+    return path
+
+def load_index(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    if index.get('format') != INDEX_VERSION:
+        sys.exit(f'{path} is not a version {INDEX_VERSION} pack index.')
+    return index
+
+def diff_indexes(old, new):
+    # Entries added or changed in new, and entries new no longer has.
+    changed = {arcname: entry for arcname, entry in new['files'].items() if old['files'].get(arcname) != entry}
+    deleted = sorted(arcname for arcname in old['files'] if arcname not in new['files'])
+    return changed, deleted
+
+def make_delta(old, new, out):
+    # Writes a zip holding the changed files, read from the new build's
+    # archive, and a delta.json naming both versions, the expected hashes
+    # before and after, and the deleted files.
+    if old['target'] != new['target']:
+        sys.exit(f'Cannot diff a {old["target"]} build against a {new["target"]} build.')
+    changed, deleted = diff_indexes(old, new)
+    delta = {
+        'format': INDEX_VERSION, 'target': new['target'], 'from': old['version'], 'to': new['version'],
+        'packs': sorted({arcname.split('/', 1)[0] for arcname in new['files'] if '/' in arcname}),
+        'changed': {arcname: {**entry, 'previous': old['files'].get(arcname, {}).get('sha256')} for arcname, entry in changed.items()},
+        'deleted': {arcname: old['files'][arcname]['sha256'] for arcname in deleted},
+    }
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(new['archive']) as archive:
+        entries = []
+        for arcname, entry in sorted(changed.items()):
+            path = archive.extract(arcname, tmp)
+            if compute_hash(path) != entry['sha256']:
+                sys.exit(f'{new["archive"]} no longer matches the v{new["version"]} index ({arcname} differs); rebuild it first.')
+            entries.append((path, arcname))
+        manifest_path = os.path.join(tmp, DELTA_MANIFEST)
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            json.dump(delta, file, indent=1, sort_keys=True)
+        pack_archive.write_archive(out, [(manifest_path, DELTA_MANIFEST)] + entries)
+    return delta
+
+def live_path(server_dir, arcname, uuid):
+    if arcname == 'variables.json':
+        return os.path.join(server_dir, deploy_server.CONFIG_FOLDER, uuid, 'variables.json')
+    top, rel = arcname.split('/', 1)
+    return os.path.join(deploy_server.pack_folder(server_dir, top), rel)
+
+def apply_delta(delta_path, server_dir, reload_pipe=None):
+    # Patches the packs deployed in a server folder. Every file the delta
+    # touches must still hold its previous (or already its new) content; the
+    # patched packs are then staged and swapped in by deploy_server.
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(delta_path) as bundle:
+        delta = json.loads(bundle.read(DELTA_MANIFEST))
+        packs = {arcname.split('/', 1)[0] for arcname in list(delta['changed']) + list(delta['deleted']) if '/' in arcname}
+        # variables.json is placed by the script module uuid of the BP manifest.
+        bp = next((top for top in delta['packs'] if top.endswith(' BP')), None)
+        manifest = bp and os.path.join(deploy_server.pack_folder(server_dir, bp), 'manifest.json')
+        uuid = deploy_server.script_module_uuid(manifest) if manifest and os.path.isfile(manifest) else 'default'
+        if 'variables.json' in delta['changed'] and bp:
+            packs.add(bp)
+
+        expected = {arcname: (entry['previous'], entry['sha256']) for arcname, entry in delta['changed'].items()}
+        expected.update({arcname: (previous, None) for arcname, previous in delta['deleted'].items()})
+        for arcname, (previous, current) in expected.items():
+            path = live_path(server_dir, arcname, uuid)
+            digest = compute_hash(path) if os.path.isfile(path) else None
+            if digest not in (previous, current):
+                sys.exit(f'{path} does not match v{delta["from"]}; deploy the full v{delta["to"]} build instead.')
+
+        # The complete new packs: every live file the delta leaves alone, plus
+        # the changed files from the bundle.
+        entries = []
+        for top in sorted(packs):
+            live = deploy_server.pack_folder(server_dir, top)
+            for path, arcname in pack_archive.pack_entries(live, top) if os.path.isdir(live) else []:
+                if arcname not in delta['changed'] and arcname not in delta['deleted']:
+                    entries.append((path, arcname))
+        for arcname in delta['changed']:
+            entries.append((bundle.extract(arcname, tmp), arcname))
+        stats = deploy_server.deploy(server_dir, entries, reload_pipe)
+    stats['changed'], stats['deleted'] = len(delta['changed']), len(delta['deleted'])
+    return delta, stats
+
+def resolve(value, target):
+    # Either an index file or a version of the given target.
+    return value if os.path.isfile(value) else index_path(target, value.lstrip('v'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Diff versioned pack indexes into delta bundles and apply them to server folders.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    diff_parser = commands.add_parser('diff', help='Write a delta bundle with the files changed between two indexed builds.')
+    diff_parser.add_argument('old', help='Index file, or version of --target, to diff from.')
+    diff_parser.add_argument('new', help='Index file, or version of --target, to diff to.')
+    diff_parser.add_argument('--target', default='server', help='Target whose indexes versions refer to.')
+    diff_parser.add_argument('--out', help='Delta bundle to write (default: builds/<target>-<old>-to-<new>.delta.zip).')
+    apply_parser = commands.add_parser('apply', help='Apply a delta bundle to the packs deployed in a server folder.')
+    apply_parser.add_argument('delta', help='Delta bundle written by diff.')
+    apply_parser.add_argument('server', help='Folder of the Bedrock Dedicated Server.')
+    apply_parser.add_argument('--reload-pipe', help='FIFO the server reads its stdin from; "reload" is written to it after patching.')
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        old, new = load_index(resolve(args.old, args.target)), load_index(resolve(args.new, args.target))
+        out = args.out or f'builds/{new["target"]}-v{old["version"]}-to-v{new["version"]}.delta.zip'
+        delta = make_delta(old, new, out)
+        size = sum(entry['size'] for entry in delta['changed'].values())
+        print(f'{out}: {len(delta["changed"])} changed ({size / 1024:.1f} KiB), {len(delta["deleted"])} deleted, '
+            f'{os.path.getsize(out) / 1024:.1f} KiB bundle')
+    else:
+        delta, stats = apply_delta(args.delta, args.server, args.reload_pipe)
+        print(f'patched v{delta["from"]} -> v{delta["to"]}: {stats["changed"]} changed, {stats["deleted"]} deleted')
+        deploy_server.report(stats, args.server)
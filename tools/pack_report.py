@@ -0,0 +1,204 @@
+import json, argparse
+import os
+import re
+import sys
+import zipfile
+
+import bundle_scripts
+from json_cache import write_atomic
+from profiler import profiler
+
+REPORT_DIR = 'builds/reports'
+REPORT_VERSION = 1
+BUDGET_PATH = 'setup/pack_budget.json'
+# Files listed as largest and as having grown most.
+TOP_FILES = 5
+
+
+def category(arcname):
+    # "<Name> BP/scripts/main.js" is in BP/scripts, files at the root of a
+    # pack in BP or RP, and the server's variables.json in config.
+    if '/' not in arcname:
+        return 'config'
+    top, rel = arcname.split('/', 1)
+    pack = top[top.rfind(' ') + 1:]
+    return f'{pack}/{rel.split("/", 1)[0]}' if '/' in rel else pack
+
+def short_name(arcname):
+    # The arcname with the pack folder shortened to BP or RP.
+    if '/' not in arcname:
+        return arcname
+    top, rel = arcname.split('/', 1)
+    return f'{top[top.rfind(" ") + 1:]}/{rel}'
+
+def build_report(archive, target, version, bp_dir='BP', scripts_dir=None, bundled=False):
+    # Sizes of every archive entry (raw and compressed) and per category,
+    # and the module graph of the compiled scripts. A bundled archive merges
+    # modules into chunks, so the graph is always followed in the compiled
+    # modules the bundle is made from.
+    scripts_dir = scripts_dir or os.path.join(bp_dir, 'scripts')
+    with zipfile.ZipFile(archive) as bundle:
+        files = {info.filename: {'size': info.file_size, 'compressed': info.compress_size}
+            for info in bundle.infolist() if not info.is_dir()}
+    categories = {}
+    for arcname, entry in sorted(files.items()):
+        total = categories.setdefault(category(arcname), {'files': 0, 'size': 0, 'compressed': 0})
+        total['files'] += 1
+        total['size'] += entry['size']
+        total['compressed'] += entry['compressed']
+    try:
+        entry = bundle_scripts.script_entry(bp_dir)
+        depth = bundle_scripts.module_graph(scripts_dir, entry)
+    except bundle_scripts.BundleError as err:
+        sys.exit(f'Could not follow the imports of the packaged scripts: {err}')
+    return {
+        'format': REPORT_VERSION, 'target': target, 'version': version,
+        'archive': {'path': archive, 'size': os.path.getsize(archive),
+            'raw': sum(entry['size'] for entry in files.values()),
+            'compressed': sum(entry['compressed'] for entry in files.values())},
+        'categories': categories,
+        'scripts': {'entry': entry, 'bundled': bundled, 'modules': len(depth), 'depth': max(depth.values()),
+            'bytes': sum(os.path.getsize(os.path.join(scripts_dir, path)) for path in depth)},
+        'files': files,
+    }
+
+def report_path(target, version):
+    return os.path.join(REPORT_DIR, target, f'v{version}.json')
+
+def version_key(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+def load_report(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    if report.get('format') != REPORT_VERSION:
+        sys.exit(f'{path} is not a version {REPORT_VERSION} pack report.')
+    return report
+
+def previous_report(target, version):
+    # The report of the highest version of the target below version.
+    folder = os.path.join(REPORT_DIR, target)
+    versions = [filename[1:-5] for filename in os.listdir(folder) if filename.startswith('v') and filename.endswith('.json')] \
+        if os.path.isdir(folder) else []
+    older = [other for other in versions if version_key(other) < version_key(version)]
+    return load_report(report_path(target, max(older, key=version_key))) if older else None
+
+def write_report(report):
+    path = report_path(report['target'], report['version'])
+    with write_atomic(path, encoding='utf-8') as file:
+        json.dump(report, file, indent=1, sort_keys=True)
+    return path
+
+def load_budgets(path=BUDGET_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def bundled(report):
+    return report['scripts'].get('bundled', False)
+
+def effective_budgets(report, budgets):
+    # The budgets under "bundled" replace the others for bundled archives,
+    # whose scripts are a fraction of the size of the compiled modules.
+    budgets = dict(budgets)
+    overrides = budgets.pop('bundled', {})
+    if bundled(report):
+        categories = {**budgets.get('categories_raw_kb', {}), **overrides.get('categories_raw_kb', {})}
+        budgets.update(overrides)
+        budgets['categories_raw_kb'] = categories
+    return budgets
+
+def check_budgets(report, previous, budgets):
+    # Every budget the report exceeds, as a message. Sizes are in KiB, of the
+    # archive as players download it and of everything else unpacked.
+    exceeded = []
+    budgets = effective_budgets(report, budgets)
+
+    def check(name, value, limit, unit=''):
+        if limit is not None and value > limit:
+            shown = f'{value:.1f}' if isinstance(value, float) else value
+            exceeded.append(f'{name} is {shown}{unit}, over the budget of {limit}{unit}')
+
+    kib = 1 / 1024
+    check('archive', report['archive']['size'] * kib, budgets.get('archive_kb'), ' KiB')
+    check('unpacked archive', report['archive']['raw'] * kib, budgets.get('raw_kb'), ' KiB')
+    for name, limit in budgets.get('categories_raw_kb', {}).items():
+        check(name, report['categories'].get(name, {}).get('size', 0) * kib, limit, ' KiB')
+    limit = budgets.get('file_raw_kb')
+    for arcname, entry in report['files'].items():
+        check(arcname, entry['size'] * kib, limit, ' KiB')
+    check('script modules', report['scripts']['modules'], budgets.get('modules'))
+    check('import depth', report['scripts']['depth'], budgets.get('import_depth'))
+    # Growth from an archive bundled differently says nothing about the pack.
+    if previous and previous['archive']['size'] and bundled(previous) == bundled(report):
+        growth = (report['archive']['size'] / previous['archive']['size'] - 1) * 100
+        check(f'archive growth since v{previous["version"]}', growth, budgets.get('growth_percent'), '%')
+    return exceeded
+
+def format_delta(value, previous):
+    return '' if previous is None else f'{(value - previous) / 1024:+.1f}'
+
+def format_report(report, previous=None):
+    archive, scripts = report['archive'], report['scripts']
+    versus = f'vs v{previous["version"]}' if previous else ''
+    old_categories = previous['categories'] if previous else {}
+    lines = [f'{report["target"]} v{report["version"]}: {len(report["files"])} files, {archive["raw"] / 1024:.1f} KiB raw, '
+        f'{archive["compressed"] / 1024:.1f} KiB compressed ({archive["size"] / 1024:.1f} KiB archive), '
+        f'{scripts["modules"]} script modules{" bundled" if bundled(report) else ""}, import depth {scripts["depth"]}']
+    if previous:
+        old_archive, old_scripts = previous['archive'], previous['scripts']
+        lines.append(f'  vs v{previous["version"]}: archive {format_delta(archive["size"], old_archive["size"])} KiB, '
+            f'raw {format_delta(archive["raw"], old_archive["raw"])} KiB, '
+            f'modules {scripts["modules"] - old_scripts["modules"]:+d}, depth {scripts["depth"] - old_scripts["depth"]:+d}')
+    lines.append(f'  {"category":<24} {"files":>6} {"raw KiB":>9} {"zip KiB":>9} {versus:>10}')
+    for name, total in sorted(report['categories'].items(), key=lambda item: -item[1]['size']):
+        old = old_categories.get(name, {}).get('size', 0) if previous else None
+        lines.append(f'  {name:<24} {total["files"]:>6} {total["size"] / 1024:>9.1f} {total["compressed"] / 1024:>9.1f} '
+            f'{format_delta(total["size"], old):>10}')
+    largest = sorted(report['files'].items(), key=lambda item: -item[1]['size'])[:TOP_FILES]
+    lines.append('  largest: ' + ', '.join(f'{short_name(arcname)} ({entry["size"] / 1024:.1f} KiB)' for arcname, entry in largest))
+    if previous:
+        changes = [(entry['size'] - previous['files'].get(arcname, {}).get('size', 0), arcname) for arcname, entry in report['files'].items()]
+        grown = [(change, arcname) for change, arcname in sorted(changes, reverse=True)[:TOP_FILES] if change > 0]
+        removed = [arcname for arcname in previous['files'] if arcname not in report['files']]
+        added = [arcname for arcname in report['files'] if arcname not in previous['files']]
+        if grown:
+            lines.append('  grew most: ' + ', '.join(f'{short_name(arcname)} (+{change / 1024:.1f} KiB)' for change, arcname in grown))
+        lines.append(f'  {len(added)} files added, {len(removed)} removed')
+    return '\n'.join(lines)
+
+def report(archive, target, version, bp_dir='BP', scripts_dir=None, bundled=False, budget_path=BUDGET_PATH):
+    # Writes and prints the report of a packaged archive against the previous
+    # version's, and returns the budgets it exceeds.
+    with profiler.span('pack report', cat='stage'):
+        new = build_report(archive, target, version, bp_dir, scripts_dir, bundled)
+        write_report(new)
+        previous = previous_report(target, version)
+    print(format_report(new, previous))
+    exceeded = check_budgets(new, previous, load_budgets(budget_path))
+    for message in exceeded:
+        print(f'  over budget: {message}')
+    return exceeded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show the size report of a packaged version against the previous one and check it against the budgets.')
+    parser.add_argument('--target', default='release', help='Target whose reports are shown.')
+    parser.add_argument('--version', help='Version to show (default: the latest reported).')
+    parser.add_argument('--budgets', default=BUDGET_PATH, help='Budget file to check the report against.')
+    args = parser.parse_args()
+
+    folder = os.path.join(REPORT_DIR, args.target)
+    versions = [filename[1:-5] for filename in os.listdir(folder) if filename.endswith('.json')] if os.path.isdir(folder) else []
+    if not versions:
+        sys.exit(f'No {args.target} build has been reported yet.')
+    version = args.version.lstrip('v') if args.version else max(versions, key=version_key)
+    current = load_report(report_path(args.target, version))
+    previous = previous_report(args.target, version)
+    print(format_report(current, previous))
+    exceeded = check_budgets(current, previous, load_budgets(args.budgets))
+    for message in exceeded:
+        print(f'  over budget: {message}')
+    sys.exit(1 if exceeded else 0)
@@ -3,40 +3,43 @@ import json, argparse
 import hashlib
 import os
 import re
-import shutil
+import sys
 import time
 
-parser = argparse.ArgumentParser(description='Build config file from configuration_settings.json')
-parser.add_argument('--target', choices=['release', 'debug', 'server'], default='debug', help='Whether to build the addon in debug or release mode or for servers')
-parser.add_argument('--watch', '-w', action='store_true', help='Watch config.js and wordedit_settings.json for changes and update')
-parser.add_argument('--generateConfigTS', action='store_true', help='Generate/update config.ts in the src folder')
-parser.add_argument('--generateConfigJSON', action='store_true', help='Generate/update variables.json in the builds folder')
-args = parser.parse_args()
-
-settings = {
-    "debug": {
-        "description": "Enables debug messages to content logs.",
-        "name": "Debug Mode",
-        "default": args.target == 'debug'
-    }
-}
-version_str = ''
-configuration_path = "configuration";
+import json_cache
+
+configuration_path = "configuration"
+SETTINGS_PATH = 'src/configuration_settings.json'
+MANIFEST_PATH = 'setup/mc_manifest.json'
+CONFIG_TS_PATH = f'src/{configuration_path}/server_configuration.ts'
+CONFIG_JS_PATH = f'BP/scripts/{configuration_path}/server_configuration.js'
+CONFIG_HASHES_PATH = 'src/.config_hashes'
+LOG_BLOCKS_NAME = 'log_blocks'
+LOG_BLOCKS_TS_PATH = f'src/{configuration_path}/{LOG_BLOCKS_NAME}.ts'
+LOG_BLOCKS_JS_PATH = f'BP/scripts/{configuration_path}/{LOG_BLOCKS_NAME}.js'
+VANILLA_BLOCKS_PATH = 'src/modules/vanilla-types/mojang-block.ts'
+# Fewer log blocks than this means the block ids were not read from the
+# vanilla typings.
+MIN_LOG_BLOCKS = 10
+# Same test as validLogBlocks in src/functions/tree_utils.ts
+LOG_BLOCK_PATTERN = re.compile(r'(_log|_wood|crimson_stem|warped_stem|(?:brown|red_)?mushroom_block)$')
 
 def compute_hash(filename):
+    # sha256 of a file, read in chunks. Every tool hashing files uses it.
     with open(filename, 'rb') as f:
         file_hash = hashlib.sha256()
-        while chunk := f.read(8192):
+        while chunk := f.read(1 << 16):
             file_hash.update(chunk)
     return file_hash.hexdigest()
 
 
-def generateScript(isServer):
+def generateScript(settings, version_str, isServer):
     result = ''
     if isServer:
         result += 'import { variables } from "@minecraft/server-admin";\n\n'
     result += 'import { FormBuilder } from "utils/form_builder";\n'
-    result += 'import { cloneConfiguration } from "./configuration_handler";\n\n'
+    result += 'import { cloneConfiguration } from "./configuration_handler";\n'
+    result += f'import {{ refreshLogSets }} from "./{LOG_BLOCKS_NAME}";\n\n'
     result += 'export const serverConfiguration = {\n'
     for name, data in settings.items():
         if isServer:
@@ -53,9 +56,9 @@ def generateScript(isServer):
                 if len(value) > 0:
                     list_representation = repr(value)
                     value = f'new FormBuilder("{form_name}").createDropdown({list_representation}, "{value[0]}")'
-                else: 
+                else:
                     value = f'new FormBuilder("{form_name}").createDropdown(["Empty"], "")'
-            
+
             result += '  /**\n'
             for line in data['description'].splitlines():
                 result += f'   * {line}\n'
@@ -63,16 +66,68 @@ def generateScript(isServer):
             result += f'  {name}: {value},\n'
     result += '};\n\n'
 
-    result += 'export let serverConfigurationCopy = cloneConfiguration(serverConfiguration);\n'
-    result += 'export let setServerConfiguration = (newServerConfig) => serverConfigurationCopy = newServerConfig;\n'
-    result += 'export let resetServerConfiguration = () => serverConfigurationCopy = cloneConfiguration(serverConfiguration);\n\n'
+    result += 'export let serverConfigurationCopy = refreshLogSets(cloneConfiguration(serverConfiguration));\n'
+    result += 'export let setServerConfiguration = (newServerConfig) => refreshLogSets(serverConfigurationCopy = newServerConfig);\n'
+    result += 'export let resetServerConfiguration = () => refreshLogSets(serverConfigurationCopy = cloneConfiguration(serverConfiguration));\n\n'
     result += '\n'.join([
         '// version (do not change)',
         f'export const VERSION = "{version_str}";'
     ])
     return result
 
-def generateVariables():
+def log_family(block_id):
+    # Same as extractLogFamily in src/functions/tree_utils.ts
+    return '_'.join(block_id.split(':')[1].split('_')[:-1])
+
+def load_log_families(path=VANILLA_BLOCKS_PATH):
+    # Every vanilla log, wood, stem and mushroom block id with its family.
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            block_ids = set(re.findall(r'BlockTypes\.get\("([^"]+)"\)', file.read()))
+    except FileNotFoundError:
+        sys.exit(f'Unable to load the vanilla block ids: {path} does not exist.')
+    # Typings from before the wood blocks were split per species only list
+    # minecraft:wood, while every <family>_log has had a <family>_wood since.
+    block_ids |= {block_id[:-len('_log')] + '_wood' for block_id in block_ids if block_id.endswith('_log')}
+    families = {block_id: log_family(block_id) for block_id in sorted(block_ids)
+        if LOG_BLOCK_PATTERN.search(block_id) and 'stripped_' not in block_id}
+    if len(families) < MIN_LOG_BLOCKS:
+        sys.exit(f'Only {len(families)} log blocks found in {path}; expected the vanilla block ids.')
+    return families
+
+def generateLogBlocks(settings, families, typed):
+    # Lookup tables for isLogIncluded: the family of every known log and the
+    # include/exclude lists as sets, refreshed whenever the configuration is.
+    def setting_values(name):
+        value = settings.get(name, {}).get('default', [])
+        return value if type(value) is list else []
+
+    result = f'// Generated by tools/process_config.py from {VANILLA_BLOCKS_PATH} and {SETTINGS_PATH} (do not change)\n\n'
+    result += f'export const LOG_FAMILIES{": ReadonlyMap<string, string>" if typed else ""} = new Map([\n'
+    for block_id, family in families.items():
+        result += f'  [{json.dumps(block_id)}, {json.dumps(family)}],\n'
+    result += ']);\n\n'
+    for name, setting in (('includedLogs', 'includedLog'), ('excludedLogs', 'excludedLog')):
+        result += f'export const {name}{": Set<string>" if typed else ""} = new Set({json.dumps(setting_values(setting))});\n'
+    result += '\n'
+    if typed:
+        result += 'type LogSetting = { values?: string[] } | string[] | undefined;\n\n'
+    result += '\n'.join([
+        f'function fillSet(set{": Set<string>" if typed else ""}, setting{": LogSetting" if typed else ""}){": void" if typed else ""} {{',
+        '  set.clear();',
+        '  for (const value of (Array.isArray(setting) ? setting : setting?.values) ?? []) set.add(value);',
+        '}',
+        '',
+        f'export function refreshLogSets{"<T extends Record<string, any>>(configuration: T): T" if typed else "(configuration)"} {{',
+        '  fillSet(includedLogs, configuration?.includedLog);',
+        '  fillSet(excludedLogs, configuration?.excludedLog);',
+        '  return configuration;',
+        '}',
+        '',
+    ])
+    return result
+
+def generateVariables(settings):
     result = []
     for name, data in settings.items():
         value = data["default"]
@@ -81,7 +136,7 @@ def generateVariables():
             value = f'"{value}"'
         elif type(value) is bool:
             value = "true" if value else "false"
-        
+
         var = '\n    /**\n'
         for line in data['description'].splitlines():
             var += f'     * {line}\n'
@@ -90,121 +145,144 @@ def generateVariables():
         result.append(var)
     return '{' + ",".join(result) + '\n}'
 
-prevResult = ''
-
-def update():
-    global prevResult
-    # Load settings from configuration_settings.json before updating
-    load_settings()
-    
-    with open(f'src/{configuration_path}/server_configuration.ts', 'w') as file:
-        file.write(generateScript(False))
-
-    time.sleep(0.5)
-    with open(f'BP/scripts/{configuration_path}/server_configuration.js', 'w') as file:
-        prevResult = generateScript(args.target == 'server')
-        file.write(prevResult)
-    
-        
-def check_for_changes():
-    settings_hash = compute_hash(f'src/configuration_settings.json')
-    config_js_hash = compute_hash(f'BP/scripts/{configuration_path}/server_configuration.js')
-    config_ts_hash = compute_hash(f'src/{configuration_path}/server_configuration.ts')
-
-    try:
-        with open(f'src/.config_hashes', 'r') as f:
-            data = f.read().splitlines()
-    except FileNotFoundError:
-        data = ['', '', '']
-        
-    if data[0] == settings_hash and data[1] == config_js_hash:
-        return False
-    else:
-        with open(f'src/.config_hashes', 'w') as f:
-            f.write(f"{settings_hash}\n{config_js_hash}\n{config_ts_hash}\n")
-
-        # Update config.js
-        update()
-
-        # Copy config.js to BP/scripts if not already there
-        if not os.path.exists(f'BP/scripts/{configuration_path}/server_configuration.js'):
-            shutil.copyfile(f'BP/scripts/{configuration_path}/server_configuration.js', f'BP/scripts/{configuration_path}/server_configuration.js')
-
-        # Update config.ts
-        with open(f'src/{configuration_path}/server_configuration.ts', 'r') as f:
-            config_ts_content = f.read()
-            with open(f'src/{configuration_path}/server_configuration.ts', 'w') as f:
-                f.write(re.sub(r"const VERSION = .+;", f"const VERSION = \"{version_str}\";", config_ts_content))
-        
-        return True     
-    
-
-def load_settings():
-    global settings
+def load_settings(target):
+    settings = {
+        "debug": {
+            "description": "Enables debug messages to content logs.",
+            "name": "Debug Mode",
+            "default": target == 'debug'
+        }
+    }
     try:
-        os.utime(f'src/configuration_settings.json', None)
-        with open(f'src/configuration_settings.json', 'r') as file:
-            settings = {**json.load(file), **settings}
-            
+        settings = {**json_cache.load(SETTINGS_PATH), **settings}
+
     except (FileNotFoundError, json.JSONDecodeError):
         # Handle the case where the file is empty or not valid JSON.
         print("Error: Unable to load settings from configuration_settings.json.")
-    finally:
-        # print(settings)
-        pass
-
-# load settings file
-load_settings()
+    return settings
 
-# load addon version
-with open('setup/mc_manifest.json', 'r') as file:
-    manifest = json.load(file)
+def get_version_str(manifest=None):
+    # load addon version
+    if manifest is None:
+        with open(MANIFEST_PATH, 'r') as file:
+            manifest = json.load(file)
     version = manifest['header']['version']
 
     if type(version) is str:
-        version_str = version
-    else:
-        version_str = '.'.join(map(str, version)) + (' [BETA]' if len(version) > 3 else '')\
+        return version
+    return '.'.join(map(str, version)) + (' [BETA]' if len(version) > 3 else '')
+
+def write_if_changed(path, content):
+    # Leave the file (and its mtime) alone when the bytes are already there,
+    # so watchers and tsc -w don't see a change that isn't one.
+    data = content.encode()
+    try:
+        with open(path, 'rb') as file:
+            if file.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with json_cache.write_atomic(path, 'wb') as file:
+        file.write(data)
+    return True
+
+def log_blocks_path(config_path, ext):
+    return os.path.join(os.path.dirname(config_path), f'{LOG_BLOCKS_NAME}.{ext}')
+
+def update(target, settings, version_str, ts_path=CONFIG_TS_PATH, js_path=CONFIG_JS_PATH):
+    # The log-block tables are written next to each server_configuration file.
+    changed = False
+    families = load_log_families()
+    if ts_path:
+        changed |= write_if_changed(ts_path, generateScript(settings, version_str, False))
+        changed |= write_if_changed(log_blocks_path(ts_path, 'ts'), generateLogBlocks(settings, families, True))
+    changed |= write_if_changed(js_path, generateScript(settings, version_str, target == 'server'))
+    changed |= write_if_changed(log_blocks_path(js_path, 'js'), generateLogBlocks(settings, families, False))
+    return changed
+
+def generate_config(target, manifest=None, settings=None, ts_path=CONFIG_TS_PATH, js_path=CONFIG_JS_PATH):
+    if settings is None:
+        settings = load_settings(target)
+    return update(target, settings, get_version_str(manifest), ts_path, js_path)
 
 # Generate src/config.ts
-if args.generateConfigTS:
-    with open(f'src/{configuration_path}/server_configuration.ts', 'w') as file:
-        file.write(generateScript(False))
-    exit(0)
+def generate_config_ts(target, manifest=None, settings=None):
+    if settings is None:
+        settings = load_settings(target)
+    changed = write_if_changed(CONFIG_TS_PATH, generateScript(settings, get_version_str(manifest), False))
+    return write_if_changed(LOG_BLOCKS_TS_PATH, generateLogBlocks(settings, load_log_families(), True)) or changed
 
 # Generate builds/variables.json
-if args.generateConfigJSON:
-    with open('builds/variables.json', 'w') as file:
-        file.write(generateVariables())
-    exit(0)
+def generate_config_json(target, settings=None, path='builds/variables.json'):
+    if settings is None:
+        settings = load_settings(target)
+    return write_if_changed(path, generateVariables(settings))
+
+
+def stat_key(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+# (target, stats of the settings and generated files) as of the last check.
+last_checked = None
+
+def check_for_changes(target):
+    global last_checked
+    paths = [SETTINGS_PATH, MANIFEST_PATH, VANILLA_BLOCKS_PATH, CONFIG_JS_PATH, CONFIG_TS_PATH, LOG_BLOCKS_JS_PATH, LOG_BLOCKS_TS_PATH]
+    state = (target, [stat_key(path) for path in paths])
+    if state == last_checked:
+        return False
+
+    changed = update(target, load_settings(target), get_version_str())
+    if changed:
+        write_if_changed(CONFIG_HASHES_PATH, ''.join(f'{compute_hash(path)}\n' for path in [SETTINGS_PATH, CONFIG_JS_PATH, CONFIG_TS_PATH]))
+    last_checked = (target, [stat_key(path) for path in paths])
+    return changed
 
-if args.watch:
+def watch(target):
+    from pathlib import Path
     from watchdog.observers import Observer
     from watchdog.events import FileSystemEventHandler
-    
+
+    watched = {Path(path).resolve() for path in (SETTINGS_PATH, CONFIG_JS_PATH, LOG_BLOCKS_JS_PATH)}
 
     class MyHandler(FileSystemEventHandler):
         def on_modified(self, ev):
-            if ev.src_path in ['src\\configuration_settings.json']:
-                if check_for_changes():
+            if Path(ev.src_path).resolve() in watched:
+                if check_for_changes(target):
                     print("Settings changed! Updating...")
-    
-    obsSettings = Observer()
-    obsSettings.schedule(MyHandler(),  path='src')
-    obsSettings.start()
 
-    obsConfigJS = Observer()
-    obsConfigJS.schedule(MyHandler(),  path='BP\\scripts')
-    obsConfigJS.start()
+    check_for_changes(target)
+    observer = Observer()
+    observer.schedule(MyHandler(),  path='src')
+    observer.schedule(MyHandler(),  path=os.path.dirname(CONFIG_JS_PATH))
+    observer.start()
 
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        obsSettings.stop()
-        obsConfigJS.stop()
-    
-    obsSettings.join()
-    obsConfigJS.join()
-else:
-    update()
\ No newline at end of file
+        observer.stop()
+
+    observer.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build config file from configuration_settings.json')
+    parser.add_argument('--target', choices=['release', 'debug', 'server'], default='debug', help='Whether to build the addon in debug or release mode or for servers')
+    parser.add_argument('--watch', '-w', action='store_true', help='Watch config.js and wordedit_settings.json for changes and update')
+    parser.add_argument('--generateConfigTS', action='store_true', help='Generate/update config.ts in the src folder')
+    parser.add_argument('--generateConfigJSON', action='store_true', help='Generate/update variables.json in the builds folder')
+    args = parser.parse_args()
+
+    if args.generateConfigTS:
+        generate_config_ts(args.target)
+    elif args.generateConfigJSON:
+        generate_config_json(args.target)
+    elif args.watch:
+        watch(args.target)
+    else:
+        generate_config(args.target)
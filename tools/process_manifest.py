@@ -1,16 +1,14 @@
 import json, argparse
+import copy
 import uuid
 import shutil
 import os
 
+import json_cache
+from process_config import write_if_changed
 
-parser = argparse.ArgumentParser(description='Build manifest files from \'mc_manifest.json\'.')
-parser.add_argument('--init', '-i', action='store_true', help='Initialize UUID and versions.')
-parser.add_argument('--target', choices=['release', 'debug', 'server'], default='debug', help='Whether to build the addon in debug or release mode or for servers.')
-args = parser.parse_args()
+MANIFEST_PATH = 'setup/mc_manifest.json'
 
-bp_manifest = {}
-rp_manifest = {}
 
 def processJsonElement(element, bp_element, rp_element):
     def process(key, value):
@@ -30,7 +28,7 @@ def processJsonElement(element, bp_element, rp_element):
                 bp_element[key] = value
                 rp_element[key] = value
 
-    
+
     if isinstance(element, dict):
         for [key, value] in element.items():
             if key.startswith('bp_'):
@@ -52,54 +50,72 @@ def processJsonElement(element, bp_element, rp_element):
             process(i, value)
             i = i + 1
 
-# load base manifest
-with open('setup/mc_manifest.json', 'r', encoding='utf-8') as file:
-    manifest = json.load(file)
+def load_manifest(path=MANIFEST_PATH):
+    # Shared by every stage of a build, which only read it.
+    return json_cache.load(path)
+
+def build_manifests(target='debug', init=False, manifest=None, bp_dir='BP', rp_dir='RP'):
+    if manifest is None:
+        manifest = load_manifest()
+    # processJsonElement shares nested values with its input, so work on a copy
+    # to keep a caller's parsed manifest reusable across builds.
+    manifest = copy.deepcopy(manifest)
+
+    bp_manifest = {}
+    rp_manifest = {}
     processJsonElement(manifest, bp_manifest, rp_manifest)
 
-# Generate UUIDv4 for bp_uuid and rp_uuid and set default versions
-if args.init:
-    bp_manifest['header']['uuid'] = str(uuid.uuid4())
-    rp_manifest['header']['uuid'] = str(uuid.uuid4())
-
-    # Set default version
-    bp_manifest['header']['version'] = [1, 0, 0]
-    rp_manifest['header']['version'] = [1, 0, 0]
-
-    # Set default min_engine_version
-    bp_manifest['header']['min_engine_version'] = [1, 20, 1]
-    rp_manifest['header']['min_engine_version'] = [1, 20, 1]
-    
-    # Ensure BP and RP directories exist
-    os.makedirs('BP', exist_ok=True)
-    os.makedirs('RP', exist_ok=True)
-
-    # Copy pack_icon.png to BP and RP folders
-    shutil.copy('setup/pack_icon.png', 'BP/')
-    shutil.copy('setup/pack_icon.png', 'RP/')
-
-version = manifest['header']['version']
-bp_manifest['header']['name'] += ' §8(' + '.'.join(map(str, version)) + ')'
-rp_manifest['header']['name'] += ' §8(' + '.'.join(map(str, version)) + ')'
-
-if not type(version) is str:
-    version = version[:3]
-bp_manifest['header']['version'] = version
-rp_manifest['header']['version'] = version
-
-if not 'dependencies' in bp_manifest:
-    bp_manifest['dependencies'] = []
-bp_manifest['dependencies'].append({
-    'uuid': rp_manifest['header']['uuid'],
-    'version': rp_manifest['header']['version']
-})
-
-if args.target == 'debug':
-    bp_manifest['header']['name'] += ' [DEBUG]'
-    rp_manifest['header']['name'] += ' [DEBUG]'
-
-# export behaviour and resource manifests
-with open('BP/manifest.json', 'w', encoding='utf-8') as file:
-    json.dump(bp_manifest, file, indent=4, ensure_ascii=False)
-with open('RP/manifest.json', 'w', encoding='utf-8') as file:
-    json.dump(rp_manifest, file, indent=4, ensure_ascii=False)
\ No newline at end of file
+    # Generate UUIDv4 for bp_uuid and rp_uuid and set default versions
+    if init:
+        bp_manifest['header']['uuid'] = str(uuid.uuid4())
+        rp_manifest['header']['uuid'] = str(uuid.uuid4())
+
+        # Set default version
+        bp_manifest['header']['version'] = [1, 0, 0]
+        rp_manifest['header']['version'] = [1, 0, 0]
+
+        # Set default min_engine_version
+        bp_manifest['header']['min_engine_version'] = [1, 20, 1]
+        rp_manifest['header']['min_engine_version'] = [1, 20, 1]
+
+        # Ensure BP and RP directories exist
+        os.makedirs('BP', exist_ok=True)
+        os.makedirs('RP', exist_ok=True)
+
+        # Copy pack_icon.png to BP and RP folders
+        shutil.copy('setup/pack_icon.png', 'BP/')
+        shutil.copy('setup/pack_icon.png', 'RP/')
+
+    version = manifest['header']['version']
+    bp_manifest['header']['name'] += ' §8(' + '.'.join(map(str, version)) + ')'
+    rp_manifest['header']['name'] += ' §8(' + '.'.join(map(str, version)) + ')'
+
+    if not type(version) is str:
+        version = version[:3]
+    bp_manifest['header']['version'] = version
+    rp_manifest['header']['version'] = version
+
+    if not 'dependencies' in bp_manifest:
+        bp_manifest['dependencies'] = []
+    bp_manifest['dependencies'].append({
+        'uuid': rp_manifest['header']['uuid'],
+        'version': rp_manifest['header']['version']
+    })
+
+    if target == 'debug':
+        bp_manifest['header']['name'] += ' [DEBUG]'
+        rp_manifest['header']['name'] += ' [DEBUG]'
+
+    # export behaviour and resource manifests
+    write_if_changed(os.path.join(bp_dir, 'manifest.json'), json.dumps(bp_manifest, indent=4, ensure_ascii=False))
+    write_if_changed(os.path.join(rp_dir, 'manifest.json'), json.dumps(rp_manifest, indent=4, ensure_ascii=False))
+    return bp_manifest, rp_manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build manifest files from \'mc_manifest.json\'.')
+    parser.add_argument('--init', '-i', action='store_true', help='Initialize UUID and versions.')
+    parser.add_argument('--target', choices=['release', 'debug', 'server'], default='debug', help='Whether to build the addon in debug or release mode or for servers.')
+    args = parser.parse_args()
+
+    build_manifests(args.target, args.init)
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+import json, os, threading, time
+
+DEFAULT_TRACE = 'builds/profile.trace.json'
+
+
+def read_io():
+    # Bytes this process has read and written, on platforms exposing /proc.
+    try:
+        with open('/proc/self/io', 'r') as file:
+            fields = dict(line.split(': ') for line in file.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def cpu_times():
+    # CPU of this process plus that of subprocesses which have been waited on.
+    times = os.times()
+    return times.user + times.system, times.children_user + times.children_system
+
+
+class Profiler:
+    # Records wall time, CPU time, bytes read/written and caller supplied
+    # counters for named spans. Spans can be exported as a Chrome trace
+    # (chrome://tracing, ui.perfetto.dev) and summarized as text.
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        # Drops the recorded spans, so a long-lived process can profile its
+        # next run on its own.
+        self.enabled = False
+        with self.lock:
+            self.events = []
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, cat='stage', **counters):
+        if not self.enabled:
+            yield counters
+            return
+        io = read_io()
+        cpu, children_cpu = cpu_times()
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            end = time.perf_counter()
+            end_cpu, end_children_cpu = cpu_times()
+            args = {
+                'cpu_ms': round((end_cpu - cpu) * 1000, 3),
+                'subprocess_cpu_ms': round((end_children_cpu - children_cpu) * 1000, 3),
+            }
+            end_io = read_io()
+            if io and end_io:
+                args['bytes_read'] = end_io[0] - io[0]
+                args['bytes_written'] = end_io[1] - io[1]
+            args.update(counters)
+            with self.lock:
+                self.events.append({
+                    'name': name, 'cat': cat, 'ph': 'X',
+                    'ts': round((start - self.origin) * 1e6, 1),
+                    'dur': round((end - start) * 1e6, 1),
+                    'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'args': args,
+                })
+
+    def write_trace(self, path=DEFAULT_TRACE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    def summary(self):
+        # One line per span name: count, total wall and CPU time, bytes, files.
+        totals = {}
+        with self.lock:
+            for event in self.events:
+                total = totals.setdefault((event['cat'], event['name']), {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'read': 0, 'written': 0, 'files': 0})
+                total['count'] += 1
+                total['wall'] += event['dur'] / 1000
+                total['cpu'] += event['args']['cpu_ms'] + event['args']['subprocess_cpu_ms']
+                total['read'] += event['args'].get('bytes_read', 0)
+                total['written'] += event['args'].get('bytes_written', 0)
+                total['files'] += event['args'].get('files', 0)
+        lines = [f'{"span":<24} {"category":<12} {"n":>4} {"wall ms":>10} {"cpu ms":>10} {"read KiB":>10} {"write KiB":>10} {"files":>6}']
+        for (cat, name), total in sorted(totals.items(), key=lambda item: -item[1]['wall']):
+            lines.append(f'{name[:24]:<24} {cat[:12]:<12} {total["count"]:>4} {total["wall"]:>10.1f} {total["cpu"]:>10.1f} '
+                f'{total["read"] / 1024:>10.1f} {total["written"] / 1024:>10.1f} {total["files"]:>6}')
+        return '\n'.join(lines)
+
+
+# Shared by every tool in the process; spans are no-ops until enabled.
+profiler = Profiler()
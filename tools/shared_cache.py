@@ -0,0 +1,198 @@
+import json, argparse
+from contextlib import contextmanager
+import hashlib
+import os
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from json_cache import write_atomic
+from pack_archive import copy_atomic
+from profiler import profiler
+
+DEFAULT_ROOT = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'mcaddon-build')
+DEFAULT_MAX_MB = 1024
+# Objects no entry refers to are only removed once they are this old (s): a
+# store of another process may have written them and not its entry yet.
+ORPHAN_GRACE = 15 * 60
+
+
+class SharedCache:
+    # Content-addressable store of stage outputs, shared by every checkout and
+    # worktree on the machine. File contents are stored once under
+    # objects/<sha256>, and each stage result is an entry under
+    # entries/<key>.json mapping the output paths (relative to the project) to
+    # their contents. Restoring an entry touches it; once the objects outgrow
+    # max_bytes the least recently restored entries are dropped, together with
+    # the objects no remaining entry refers to.
+    #
+    # Stores hold a shared lock on the cache and eviction an exclusive one, so
+    # checkouts building at the same time never evict the objects of a store
+    # in progress. Without fcntl (Windows) only the grace period of orphaned
+    # objects protects them.
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=DEFAULT_MAX_MB << 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        # Bytes of objects this process stored since it last evicted.
+        self.added = 0
+
+    @contextmanager
+    def locked(self, exclusive=False):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'lock'), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def entry_path(self, key):
+        return os.path.join(self.root, 'entries', f'{key}.json')
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def lookup(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not all(os.path.exists(self.object_path(digest)) for digest in entry['files'].values()):
+            return None
+        os.utime(path)
+        return entry
+
+    def restore(self, key, outputs, files_of):
+        # Makes outputs hold exactly the files of the entry: cached files are
+        # copied in (replacing, never writing through, what is there) and any
+        # other file files_of lists under outputs is removed.
+        with self.locked():
+            entry = self.lookup(key)
+            if entry is None:
+                return False
+            self.copy_out(entry, outputs, files_of)
+        return True
+
+    def copy_out(self, entry, outputs, files_of):
+        with profiler.span('restore', cat='shared cache', files=len(entry['files'])):
+            for path in files_of(outputs):
+                if path not in entry['files']:
+                    os.remove(path)
+            for path, digest in entry['files'].items():
+                copy_atomic(self.object_path(digest), path)
+
+    def store(self, key, paths, digest_of):
+        # Eviction is left to trim, once the build is done.
+        with profiler.span('store', cat='shared cache', files=len(paths)), self.locked():
+            files = {path: digest_of(path) for path in paths}
+            for path, digest in files.items():
+                target = self.object_path(digest)
+                if os.path.exists(target):
+                    continue
+                copy_atomic(path, target)
+                self.added += os.path.getsize(target)
+            self.write_entry(key, {'files': files})
+
+    def trim(self):
+        # Evicts down to max_bytes if this process stored anything, so builds
+        # that stored nothing do not walk the cache.
+        if self.added:
+            with profiler.span('evict', cat='shared cache'):
+                self.evict()
+
+    def write_entry(self, key, entry):
+        with write_atomic(self.entry_path(key), encoding='utf-8') as file:
+            json.dump(entry, file)
+
+    def usage(self):
+        # Entries oldest first with the objects they use, the reference count
+        # of every object, and the size and mtime of every object. Files being
+        # written (*.tmp) are left out.
+        entries = []
+        folder = os.path.join(self.root, 'entries')
+        for filename in os.listdir(folder) if os.path.isdir(folder) else []:
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(folder, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    digests = set(json.load(file)['files'].values())
+                entries.append((os.stat(path).st_mtime_ns, path, digests))
+            except (OSError, ValueError, KeyError):
+                continue
+        entries.sort()
+        refs, sizes = {}, {}
+        for _, _, digests in entries:
+            for digest in digests:
+                refs[digest] = refs.get(digest, 0) + 1
+        objects = os.path.join(self.root, 'objects')
+        for folderName, _, filenames in os.walk(objects):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(folderName, filename))
+                except FileNotFoundError:
+                    continue
+                sizes[filename] = (st.st_size, st.st_mtime)
+        return entries, refs, sizes
+
+    def evict(self, max_bytes=None, grace=ORPHAN_GRACE):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self.locked(exclusive=True):
+            entries, refs, stats = self.usage()
+            sizes = {digest: size for digest, (size, _) in stats.items()}
+            total = sum(sizes.values())
+            removed = 0
+            # Objects left behind by an interrupted store belong to no entry.
+            now = time.time()
+            for digest in [digest for digest in sizes if digest not in refs and now - stats[digest][1] >= grace]:
+                total -= self.remove_object(digest, sizes)
+            self.added = 0
+            for _, path, digests in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                for digest in digests:
+                    refs[digest] -= 1
+                    if not refs[digest]:
+                        total -= self.remove_object(digest, sizes)
+        return removed, total
+
+    def remove_object(self, digest, sizes):
+        try:
+            os.remove(self.object_path(digest))
+        except FileNotFoundError:
+            pass
+        return sizes.pop(digest, 0)
+
+
+def stage_key(name, key):
+    return hashlib.sha256(f'{name}\0{key}'.encode()).hexdigest()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or trim the build cache shared between checkouts.')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='Folder of the shared cache.')
+    parser.add_argument('--trim', type=float, metavar='MB', help='Evict least recently used entries until the cache is at most this size.')
+    parser.add_argument('--clear', action='store_true', help='Remove every entry.')
+    args = parser.parse_args()
+
+    cache = SharedCache(args.root)
+    if args.clear or args.trim is not None:
+        removed, total = cache.evict(0 if args.clear else int(args.trim * (1 << 20)), 0 if args.clear else ORPHAN_GRACE)
+        print(f'evicted {removed} entries')
+    entries, refs, sizes = cache.usage()
+    print(f'{args.root}: {len(entries)} entries, {len(sizes)} objects, {sum(size for size, _ in sizes.values()) / (1 << 20):.1f} MiB')
@@ -1,109 +1,377 @@
 from pathlib import Path
-import glob, os, shutil
+from concurrent.futures import ThreadPoolExecutor
+import os, sys, threading, time
 import argparse, json
 
-bp_name = json.loads(open('setup/mc_manifest.json', 'r').read()).get("header").get("bp_name")
-pack_folder = "".join(bp_name[:bp_name.rfind(" BP")].split(" "))
+from deploy_server import PACK_FOLDERS
+from json_cache import write_atomic
+from pack_archive import stage_copy
+from process_config import compute_hash
+from profiler import profiler, DEFAULT_TRACE
 
+INDEX_FILE = 'builds/.sync_index.json'
 SERVER_LOCATION = '%appdata%\\.minecraft_bedrock\\servers\\1.20.10.24'
+COM_MOJANG = {
+    'stable': '%localappdata%\\Packages\\Microsoft.MinecraftUWP_8wekyb3d8bbwe\\LocalState\\games\\com.mojang',
+    'preview': '%localappdata%\\Packages\\Microsoft.MinecraftWindowsBeta_8wekyb3d8bbwe\\LocalState\\games\\com.mojang',
+}
 
-parser = argparse.ArgumentParser(description='Syncs the project folder\'s data with Minecraft (Windows 10/11 only).\nNote: Will only sync CHANGED files in watch mode.')
-parser.add_argument('--watch', '-w', action='store_true', help='Whether to watch for file changes.')
-parser.add_argument('--init', choices=['False', 'True'], default='True', help='Whether to initially sync com.mojang before watching file changes.')
-parser.add_argument('--dest', choices=['stable', 'preview', 'server'], default='stable', help='The place to sync the addon to')
-args = parser.parse_args()
+def get_pack_folder(manifest=None):
+    if manifest is None:
+        manifest = json.loads(open('setup/mc_manifest.json', 'r').read())
+    bp_name = manifest.get("header").get("bp_name")
+    return "".join(bp_name[:bp_name.rfind(" BP")].split(" "))
 
-if args.dest == 'stable':
-    com_mojang = os.path.expandvars('%localappdata%\\Packages\\Microsoft.MinecraftUWP_8wekyb3d8bbwe\\LocalState\\games\\com.mojang')
-elif args.dest == 'preview':
-    com_mojang = os.path.expandvars('%localappdata%\\Packages\\Microsoft.MinecraftWindowsBeta_8wekyb3d8bbwe\\LocalState\\games\\com.mojang')
-elif args.dest == 'server':
-    com_mojang = os.path.expandvars(SERVER_LOCATION)
+def get_com_mojang(dest, server_dir=None):
+    # The game's com.mojang folder, or the folder of a dedicated server, which
+    # lays its packs out the same way (server_dir, as for build.py --deploy,
+    # or the default Windows install).
+    if dest == 'server' and server_dir:
+        return server_dir
+    path = SERVER_LOCATION if dest == 'server' else COM_MOJANG[dest]
+    expanded = os.path.expandvars(path)
+    if '%' in expanded:
+        variable = path[path.find('%'):path.find('%', path.find('%') + 1) + 1]
+        sys.exit(f'Cannot find where to sync to {dest}: {variable} is only set on Windows. '
+            'Sync to the folder of a dedicated server instead (build.py --watch server --deploy SERVER_DIR).')
+    return expanded
 
+def get_pack_paths(dest, manifest=None, server_dir=None):
+    com_mojang = get_com_mojang(dest, server_dir)
+    pack_folder = get_pack_folder(manifest)
+    behaviour_pack = os.path.join(com_mojang, PACK_FOLDERS['BP'], f'{pack_folder} BP')
+    resource_pack = os.path.join(com_mojang, PACK_FOLDERS['RP'], f'{pack_folder} RP')
+    return behaviour_pack, resource_pack
 
-behaviour_pack = os.path.join(com_mojang, 'development_behavior_packs', f'{pack_folder} BP')
-resource_pack = os.path.join(com_mojang, 'development_resource_packs', f'{pack_folder} RP')
 
-def sync_file(path, from_root, to_root):
-    from_file = Path(path).relative_to(from_root)
-    to_file = Path(to_root, from_file)
-    try:
-        if os.path.exists(path):
-            to_folder = to_file.parent
-            if not os.path.exists(to_folder):
-                os.makedirs(to_folder)
-            shutil.copy(path, to_folder)
-            print(f'synced {path} to com.mojang')
-        else:
-            os.remove(to_file)
-            print(f'deleted {path} from com.mojang')
-    except OSError:
-        pass
-
-def remove_dir_if_exists(path):
-    if os.path.exists(path):
-        shutil.rmtree(path)
-
-def sync_all():
-    remove_dir_if_exists(behaviour_pack)
-    remove_dir_if_exists(resource_pack)
-
-    for file in glob.iglob('BP/**', recursive=True):
-        if os.path.isfile(file):
-            sync_file(file, './BP', behaviour_pack)
-    for file in glob.iglob('RP/**', recursive=True):
-        if os.path.isfile(file):
-            sync_file(file, './RP', resource_pack)
-
-if args.watch:
-    import time
+class DeltaSync:
+    # Mirrors source folders into destination folders, copying only new or
+    # changed files and deleting only orphans. The index remembers, per
+    # destination, the source mtime/size/hash and destination mtime of every
+    # file it wrote, so unchanged files are recognized from a stat alone.
+    #
+    # Every sync is applied in two phases: all changed files are first copied
+    # to temp files beside their destination, then renamed into place and the
+    # orphans removed, so the game never sees a half applied batch.
+
+    def __init__(self, packs, index_path=INDEX_FILE, workers=None):
+        self.packs = packs
+        self.index_path = index_path
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.stats = {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                self.index = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def save(self):
+        with write_atomic(self.index_path, encoding='utf-8') as file:
+            json.dump(self.index, file)
+
+    def entries(self, dst_root):
+        return self.index.setdefault(os.path.abspath(dst_root), {})
+
+    def is_current(self, entries, rel, src_stat, dst):
+        entry = entries.get(rel)
+        if not entry or entry[0] != src_stat.st_mtime_ns or entry[1] != src_stat.st_size:
+            return False
+        try:
+            dst_stat = os.stat(dst)
+        except FileNotFoundError:
+            return False
+        return dst_stat.st_size == entry[1] and dst_stat.st_mtime_ns == entry[3]
+
+    def stage_file(self, entries, rel, src, dst, src_stat):
+        digest = compute_hash(src)
+        entry = entries.get(rel)
+        try:
+            dst_stat = os.stat(dst)
+            # Same content already in place: only refresh the index.
+            if dst_stat.st_size == src_stat.st_size and (
+                    (entry and entry[2] == digest and entry[3] == dst_stat.st_mtime_ns) or compute_hash(dst) == digest):
+                with self.lock:
+                    entries[rel] = [src_stat.st_mtime_ns, src_stat.st_size, digest, dst_stat.st_mtime_ns]
+                    self.stats['unchanged'] += 1
+                return None
+        except FileNotFoundError:
+            pass
+        return entries, rel, dst, stage_copy(src, dst), [src_stat.st_mtime_ns, src_stat.st_size, digest]
+
+    def apply(self, pending, orphans):
+        with ThreadPoolExecutor(self.workers) as pool:
+            staged = [staged for staged in pool.map(lambda job: self.stage_file(*job), pending) if staged]
+
+        for entries, rel, dst, tmp, entry in staged:
+            os.replace(tmp, dst)
+            entries[rel] = entry + [os.stat(dst).st_mtime_ns]
+            self.stats['copied'] += 1
+            self.stats['bytes'] += entry[1]
+        for entries, rel, dst in orphans:
+            try:
+                os.remove(dst)
+                self.stats['deleted'] += 1
+            except FileNotFoundError:
+                pass
+            entries.pop(rel, None)
+        self.save()
+        return self.stats
+
+    def reset_stats(self):
+        self.stats = {'copied': 0, 'bytes': 0, 'deleted': 0, 'unchanged': 0}
+
+    def sync_all(self):
+        with profiler.span('sync_all', cat='sync') as span:
+            self.sync_all_packs()
+            span.update(files=self.stats['copied'] + self.stats['deleted'], bytes=self.stats['bytes'])
+        return self.stats
+
+    def sync_all_packs(self):
+        self.reset_stats()
+        pending = []
+        orphans = []
+        empty_dirs = []
+        for src_root, dst_root in self.packs:
+            entries = self.entries(dst_root)
+            sources = set()
+            for folderName, _, filenames in os.walk(src_root):
+                for filename in filenames:
+                    src = os.path.join(folderName, filename)
+                    rel = Path(src).relative_to(src_root).as_posix()
+                    dst = os.path.join(dst_root, rel)
+                    sources.add(rel)
+                    src_stat = os.stat(src)
+                    if self.is_current(entries, rel, src_stat, dst):
+                        self.stats['unchanged'] += 1
+                    else:
+                        pending.append((entries, rel, src, dst, src_stat))
+
+            for folderName, _, filenames in os.walk(dst_root, topdown=False):
+                remaining = len(filenames)
+                for filename in filenames:
+                    dst = os.path.join(folderName, filename)
+                    rel = Path(dst).relative_to(dst_root).as_posix()
+                    if rel not in sources:
+                        orphans.append((entries, rel, dst))
+                        remaining -= 1
+                if folderName != dst_root and not remaining:
+                    empty_dirs.append(folderName)
+            for rel in [rel for rel in entries if rel not in sources]:
+                entries.pop(rel)
+
+        self.apply(pending, orphans)
+        # Folders emptied by the orphan pass, deepest first.
+        for folderName in empty_dirs:
+            try:
+                os.rmdir(folderName)
+            except OSError:
+                pass
+        return self.stats
+
+    def sync_paths(self, paths):
+        with profiler.span('sync batch', cat='sync', events=len(paths)) as span:
+            self.sync_batch(paths)
+            span.update(files=self.stats['copied'] + self.stats['deleted'], bytes=self.stats['bytes'])
+        return self.stats
+
+    def sync_batch(self, paths):
+        self.reset_stats()
+        pending = []
+        orphans = []
+        for path in paths:
+            for src_root, dst_root in self.packs:
+                rel = Path(os.path.abspath(path))
+                try:
+                    rel = rel.relative_to(os.path.abspath(src_root)).as_posix()
+                except ValueError:
+                    continue
+                entries = self.entries(dst_root)
+                dst = os.path.join(dst_root, rel)
+                try:
+                    src_stat = os.stat(path)
+                except FileNotFoundError:
+                    orphans.append((entries, rel, dst))
+                    break
+                if os.path.isdir(path):
+                    break
+                if self.is_current(entries, rel, src_stat, dst):
+                    self.stats['unchanged'] += 1
+                else:
+                    pending.append((entries, rel, path, dst, src_stat))
+                break
+        return self.apply(pending, orphans)
+
+    def summary(self):
+        return (f'synced {self.stats["copied"]} files ({self.stats["bytes"] / 1024:.1f} KiB), '
+                f'deleted {self.stats["deleted"]}, {self.stats["unchanged"]} unchanged')
+
+
+class EventQueue:
+    # Coalesces file system events into batches. Paths are deduplicated until
+    # no event has arrived for the debounce window, then handed to apply() as
+    # one batch, mapping each path to when its first event arrived. While a
+    # compiler run is in progress the queue is held, and the batch is flushed
+    # as soon as the compiler reports it is done. Times come from clock, in
+    # seconds.
+
+    def __init__(self, apply, debounce=0.25, clock=time.monotonic):
+        self.apply = apply
+        self.debounce = debounce
+        self.clock = clock
+        self.paths = {}
+        self.last_event = 0
+        self.holding = False
+        self.flush_requested = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def put(self, path):
+        with self.cond:
+            self.last_event = self.clock()
+            self.paths.setdefault(path, self.last_event)
+            self.cond.notify()
+
+    def hold(self):
+        with self.cond:
+            self.holding = True
+
+    def release(self):
+        with self.cond:
+            self.holding = False
+            self.flush_requested = bool(self.paths)
+            self.cond.notify()
+
+    def feed_tsc_line(self, line):
+        if 'Starting compilation' in line or 'Starting incremental compilation' in line:
+            self.hold()
+        elif 'Watching for file changes' in line:
+            self.release()
+
+    def pending(self):
+        # Seconds until the batch is due, 0 once it is, or None while there is
+        # nothing to wait for. Called with cond held.
+        if self.closed or self.flush_requested:
+            return 0
+        if not self.paths or self.holding:
+            return None
+        return max(0, self.last_event + self.debounce - self.clock())
+
+    def poll(self):
+        # Hands the batch to apply() if it is due, and returns whether it was.
+        with self.cond:
+            if self.pending() != 0:
+                return False
+            batch = dict(self.paths)
+            self.paths.clear()
+            self.flush_requested = False
+        if batch:
+            self.apply(batch)
+        return True
+
+    def run(self):
+        while True:
+            with self.cond:
+                remaining = self.pending()
+                while remaining != 0:
+                    self.cond.wait(remaining)
+                    remaining = self.pending()
+                closed = self.closed
+            self.poll()
+            if closed:
+                return
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+
+def sync_all(behaviour_pack, resource_pack):
+    delta = DeltaSync([('BP', behaviour_pack), ('RP', resource_pack)])
+    delta.sync_all()
+    print(delta.summary())
+    return delta.stats
+
+def sync(dest, manifest=None, server_dir=None):
+    return sync_all(*get_pack_paths(dest, manifest, server_dir))
+
+def watch(dest, init=True, manifest=None, debounce=0.25, server_dir=None):
     from watchdog.observers import Observer
     from watchdog.events import FileSystemEventHandler
-    
+
+    behaviour_pack, resource_pack = get_pack_paths(dest, manifest, server_dir)
+    delta = DeltaSync([('BP', behaviour_pack), ('RP', resource_pack)])
+
     def alert_watching():
         print('Watching for file changes...')
-    
+
+    def apply(batch):
+        delta.sync_paths(batch)
+        print(delta.summary())
+
+    queue = EventQueue(apply, debounce)
+
     class MyHandler(FileSystemEventHandler):
-        def __init__(self, packtype):
-            self.packtype = packtype
-        
-        def update(self, path):
-            if self.packtype == 'BP':
-                sync_file(path, './BP', behaviour_pack)
-            else:
-                sync_file(path, './RP', resource_pack)
-        
         def on_modified(self, ev):
             if not ev.is_directory:
-                self.update(ev.src_path)
-        
+                queue.put(ev.src_path)
+
         def on_created(self, ev):
             if not ev.is_directory:
-                self.update(ev.src_path)
-        
+                queue.put(ev.src_path)
+
         def on_deleted(self, ev):
             if not ev.is_directory:
-                self.update(ev.src_path)
-    
-    observerBP = Observer()
-    observerBP.schedule(MyHandler('BP'),  path='BP',  recursive=True)
-    observerBP.start()
-
-    observerRP = Observer()
-    observerRP.schedule(MyHandler('RP'),  path='RP',  recursive=True)
-    observerRP.start()
-
-    if args.init == 'True':
-        sync_all()
+                queue.put(ev.src_path)
+
+        def on_moved(self, ev):
+            if not ev.is_directory:
+                queue.put(ev.src_path)
+                queue.put(ev.dest_path)
+
+    observer = Observer()
+    observer.schedule(MyHandler(),  path='BP',  recursive=True)
+    observer.schedule(MyHandler(),  path='RP',  recursive=True)
+    observer.start()
+
+    if init:
+        sync_all(behaviour_pack, resource_pack)
+    queue.start()
     try:
         alert_watching()
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        observerBP.stop()
-        observerRP.stop()
+        observer.stop()
     print('\n')
-    observerBP.join()
-    observerRP.join()
-else:
-    sync_all()
\ No newline at end of file
+    observer.join()
+    queue.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Syncs the project folder\'s data with Minecraft (Windows 10/11 only).\nNote: Will only sync CHANGED files in watch mode.')
+    parser.add_argument('--watch', '-w', action='store_true', help='Whether to watch for file changes.')
+    parser.add_argument('--init', choices=['False', 'True'], default='True', help='Whether to initially sync com.mojang before watching file changes.')
+    parser.add_argument('--dest', choices=['stable', 'preview', 'server'], default='stable', help='The place to sync the addon to')
+    parser.add_argument('--server', metavar='SERVER_DIR', help='With --dest server, the folder of the Bedrock Dedicated Server to sync to.')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_TRACE, metavar='TRACE', help=f'Profile syncing and write a Chrome trace (default: {DEFAULT_TRACE}) plus a text summary.')
+    parser.add_argument('--debounce', type=float, default=250, help='Milliseconds without file events before a batch of changes is synced.')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+    try:
+        if args.watch:
+            watch(args.dest, args.init == 'True', debounce=args.debounce / 1000, server_dir=args.server)
+        else:
+            sync(args.dest, server_dir=args.server)
+    finally:
+        if args.profile:
+            profiler.write_trace(args.profile)
+            print(profiler.summary())
@@ -0,0 +1,101 @@
+import json, argparse
+import os
+import random
+import shutil
+
+import process_config
+
+# Default size of a synthetic project; every count is multiplied by --scale.
+DEFAULTS = {'files': 100, 'texture_bytes': 512 * 1024, 'scripts': 35, 'settings': 7}
+# Block ids in the generated vanilla typings, about as many as the game has.
+BLOCK_IDS = 900
+LOG_FAMILIES = ('acacia', 'birch', 'cherry', 'dark_oak', 'jungle', 'mangrove', 'oak', 'spruce')
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode) as file:
+        file.write(content)
+
+def item_definition(i):
+    return {
+        'format_version': '1.20.80',
+        'minecraft:item': {
+            'description': {'identifier': f'bench:item_{i}', 'menu_category': {'category': 'equipment'}},
+            'components': {
+                'minecraft:icon': f'bench_item_{i}',
+                'minecraft:max_stack_size': 1,
+                'minecraft:durability': {'max_durability': 100 + i},
+                'minecraft:tags': {'tags': ['minecraft:is_axe', 'minecraft:is_tool']},
+            },
+        },
+    }
+
+def script_module(i):
+    imports = ''.join(f'import {{ value{j} }} from "./module{j}";\n' for j in range(max(0, i - 3), i))
+    body = ''.join(f'export const value{i}_{k} = {k} * {i};\n' for k in range(20))
+    return f'{imports}export const value{i} = {i};\n{body}'
+
+def vanilla_blocks(count=BLOCK_IDS):
+    # MinecraftBlockTypes typings: the log, wood, stem and mushroom blocks
+    # process_config picks out, among filler blocks.
+    ids = [f'minecraft:{prefix}{family}_{kind}' for family in LOG_FAMILIES for kind in ('log', 'wood') for prefix in ('', 'stripped_')]
+    ids += ['minecraft:crimson_stem', 'minecraft:warped_stem', 'minecraft:brown_mushroom_block', 'minecraft:red_mushroom_block']
+    ids += [f'minecraft:bench_block_{i}' for i in range(max(0, count - len(ids)))]
+    getters = ''.join(f'    static get Block{i}() {{ return BlockTypes.get("{block_id}") }};\n' for i, block_id in enumerate(ids))
+    return f'import {{ BlockTypes }} from "@minecraft/server";\nexport class MinecraftBlockTypes {{\n{getters}}}\n'
+
+def generate(root, files=DEFAULTS['files'], texture_bytes=DEFAULTS['texture_bytes'],
+        scripts=DEFAULTS['scripts'], settings=DEFAULTS['settings'], seed=0):
+    # Lay out a project shaped like this repository under root: setup/, src/,
+    # BP/ (items, entities, scripts), RP/ (textures, texts) and the vanilla
+    # block typings process_config reads.
+    rng = random.Random(seed)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+
+    shutil.copytree('setup', os.path.join(root, 'setup'))
+
+    configuration = {}
+    for i in range(settings):
+        kind = i % 3
+        default = [f'bench:block_{i}'] if kind == 0 else (i % 2 == 0) if kind == 1 else i * 10
+        configuration[f'setting{i}'] = {'description': f'Synthetic setting {i}.', 'name': f'Bench.setting_{i}', 'default': default}
+    write(os.path.join(root, 'src/configuration_settings.json'), json.dumps(configuration, indent=2))
+    os.makedirs(os.path.join(root, 'src/configuration'), exist_ok=True)
+
+    for i in range(files):
+        folder = 'items' if i % 4 else 'entities'
+        write(os.path.join(root, f'BP/{folder}/bench_{i}.json'), json.dumps(item_definition(i), indent=4))
+    for i in range(scripts):
+        write(os.path.join(root, f'BP/scripts/module{i}.js'), script_module(i))
+    write(os.path.join(root, 'BP/scripts/main.js'), ''.join(f'import "./module{i}";\n' for i in range(scripts)))
+    os.makedirs(os.path.join(root, 'BP/scripts/configuration'), exist_ok=True)
+    write(os.path.join(root, process_config.VANILLA_BLOCKS_PATH), vanilla_blocks())
+
+    # Textures are random bytes, which compress about as badly as real PNGs.
+    texture_count = max(1, files // 4)
+    texture_size = max(1, texture_bytes // texture_count)
+    texture_data = {}
+    for i in range(texture_count):
+        write(os.path.join(root, f'RP/textures/items/bench_{i}.png'), rng.randbytes(texture_size))
+        texture_data[f'bench_item_{i}'] = {'textures': f'textures/items/bench_{i}'}
+    write(os.path.join(root, 'RP/textures/item_texture.json'),
+        json.dumps({'resource_pack_name': 'bench', 'texture_name': 'atlas.items', 'texture_data': texture_data}, indent=4))
+    write(os.path.join(root, 'RP/texts/en_US.lang'), ''.join(f'item.bench:item_{i}.name=Bench Item {i}\n' for i in range(files)))
+    return root
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic addon project for benchmarking the tools.')
+    parser.add_argument('root', help='Folder to generate the project in (replaced if it exists).')
+    parser.add_argument('--scale', type=float, default=1, help='Multiplier applied to every size below.')
+    parser.add_argument('--files', type=int, default=DEFAULTS['files'], help='Number of BP item/entity definitions.')
+    parser.add_argument('--texture-bytes', type=int, default=DEFAULTS['texture_bytes'], help='Total bytes of RP textures.')
+    parser.add_argument('--scripts', type=int, default=DEFAULTS['scripts'], help='Number of script modules in BP/scripts.')
+    parser.add_argument('--settings', type=int, default=DEFAULTS['settings'], help='Number of entries in configuration_settings.json.')
+    args = parser.parse_args()
+
+    generate(args.root, int(args.files * args.scale), int(args.texture_bytes * args.scale),
+        int(args.scripts * args.scale), int(args.settings * args.scale))
@@ -0,0 +1,140 @@
+import json, argparse
+import math
+import os
+import re
+import sys
+
+from json_cache import write_atomic
+
+# Debug builds log a timing record per measured stage (src/utils/logger.ts):
+# "[<tick>] [DEBUG] - timing {"stage": ..., "ticks": ..., "ms": ..., ...}",
+# behind whatever prefix the content log gives the line.
+RECORD = re.compile(r'\btiming (\{.*\})\s*$')
+SUMMARY_VERSION = 1
+
+
+def stage_key(record):
+    # String fields besides the stage tell runs of a stage apart, so
+    # getTreeLogs is summed up per mode: getTreeLogs[chop], getTreeLogs[inspect].
+    labels = [str(value) for name, value in sorted(record.items()) if name != 'stage' and isinstance(value, str)]
+    return f'{record["stage"]}[{",".join(labels)}]' if labels else record['stage']
+
+def read_records(path):
+    # Streams the records of a content log, skipping every other line and
+    # records cut off by a crash.
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        for line in file:
+            match = RECORD.search(line)
+            if not match:
+                continue
+            try:
+                record = json.loads(match.group(1))
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and 'stage' in record:
+                yield record
+
+def percentile(ordered, p):
+    # Nearest rank.
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] if ordered else None
+
+class StageStats:
+    # Latencies and block counts of every run of a stage.
+
+    def __init__(self):
+        self.ms = []
+        self.ticks = []
+        self.blocks = 0
+
+    def add(self, record):
+        self.ms.append(float(record.get('ms', 0)))
+        self.ticks.append(int(record.get('ticks', 0)))
+        self.blocks += int(record.get('blocks', 0))
+
+    def summary(self):
+        ms, ticks = sorted(self.ms), sorted(self.ticks)
+        # A job done within its first tick still took that tick.
+        busy_ticks = sum(max(tick, 1) for tick in ticks)
+        return {
+            'runs': len(ms), 'blocks': self.blocks,
+            'p50_ms': percentile(ms, 50), 'p95_ms': percentile(ms, 95), 'max_ms': ms[-1],
+            'p50_ticks': percentile(ticks, 50), 'p95_ticks': percentile(ticks, 95), 'max_ticks': ticks[-1],
+            'blocks_per_tick': round(self.blocks / busy_ticks, 2),
+            'blocks_per_s': round(self.blocks / sum(ms) * 1000, 1) if sum(ms) else None,
+        }
+
+def analyze(paths, stages=None):
+    stats = {}
+    records = 0
+    for path in paths:
+        for record in read_records(path):
+            if stages and record['stage'] not in stages:
+                continue
+            stats.setdefault(stage_key(record), StageStats()).add(record)
+            records += 1
+    return {
+        'format': SUMMARY_VERSION, 'logs': paths, 'records': records,
+        'stages': {name: stats[name].summary() for name in sorted(stats)},
+    }
+
+def load_baseline(path, stages=None):
+    # A summary written by --json, or a content log to analyze.
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            summary = json.load(file)
+        if summary.get('format') != SUMMARY_VERSION:
+            sys.exit(f'{path} is not a version {SUMMARY_VERSION} timing summary.')
+        if stages:
+            summary['stages'] = {name: stats for name, stats in summary['stages'].items() if name.split('[')[0] in stages}
+        return summary
+    return analyze([path], stages)
+
+def format_change(value, old):
+    if value is None or not old:
+        return ''
+    return f'{(value / old - 1) * 100:+.0f}%'
+
+def format_summary(summary, baseline=None):
+    old_stages = baseline['stages'] if baseline else {}
+    header = f'{"stage":<28} {"runs":>5} {"blocks":>7} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8} ' \
+        f'{"p50 t":>6} {"p95 t":>6} {"blk/tick":>9} {"blk/s":>8}'
+    lines = [f'{summary["records"]} timing records in {", ".join(summary["logs"])}', header]
+    for name, stats in summary['stages'].items():
+        lines.append(f'{name:<28} {stats["runs"]:>5} {stats["blocks"]:>7} {stats["p50_ms"]:>8.0f} {stats["p95_ms"]:>8.0f} '
+            f'{stats["max_ms"]:>8.0f} {stats["p50_ticks"]:>6} {stats["p95_ticks"]:>6} {stats["blocks_per_tick"]:>9.2f} '
+            f'{stats["blocks_per_s"] if stats["blocks_per_s"] is not None else "-":>8}')
+        old = old_stages.get(name)
+        if old:
+            lines.append(f'{"  vs baseline":<28} {stats["runs"] - old["runs"]:>+5} {"":>7} {format_change(stats["p50_ms"], old["p50_ms"]):>8} '
+                f'{format_change(stats["p95_ms"], old["p95_ms"]):>8} {format_change(stats["max_ms"], old["max_ms"]):>8} '
+                f'{"":>6} {"":>6} {format_change(stats["blocks_per_tick"], old["blocks_per_tick"]):>9} '
+                f'{format_change(stats["blocks_per_s"], old["blocks_per_s"]):>8}')
+    missing = [name for name in old_stages if name not in summary['stages']]
+    if missing:
+        lines.append(f'not in these logs but in the baseline: {", ".join(missing)}')
+    return '\n'.join(lines)
+
+def write_summary(summary, path):
+    with write_atomic(path, encoding='utf-8') as file:
+        json.dump(summary, file, indent=1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the timing records a debug build wrote to Bedrock content logs: '
+        'latency per stage and blocks handled per tick, optionally against a baseline build.')
+    parser.add_argument('logs', nargs='+', help='Content log files of the build to measure.')
+    parser.add_argument('--stage', action='append', help='Only summarize this stage (repeatable).')
+    parser.add_argument('--baseline', help='Content log, or summary written by --json, of the build to compare with.')
+    parser.add_argument('--json', help='Also write the summary to this file, to use as a later baseline.')
+    args = parser.parse_args()
+
+    for path in args.logs + ([args.baseline] if args.baseline else []):
+        if not os.path.isfile(path):
+            sys.exit(f'{path} does not exist.')
+    summary = analyze(args.logs, args.stage)
+    if not summary['records']:
+        sys.exit('No timing records found. Were the logs written by a build with debug enabled?')
+    baseline = load_baseline(args.baseline, args.stage) if args.baseline else None
+    print(format_summary(summary, baseline))
+    if args.json:
+        write_summary(summary, args.json)
@@ -0,0 +1,449 @@
+import json, argparse
+from collections import deque
+import itertools
+import math
+import os
+import random
+import time
+
+import process_config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AXES_PATH = 'BP/items'
+# system.runJob resumes a generator for as long as the tick's time budget
+# allows; the simulator assumes this many yields fit in one tick.
+YIELDS_PER_TICK = 64
+NEIGHBOR_OFFSETS = [offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset != (0, 0, 0)]
+SETTING_LABELS = {'chopLimit': 'limit', 'durabilityDamagePerBlock': 'damage', 'immersiveModeDelay': 'delay'}
+SCENARIOS = ['oak', 'jungle', 'spruce', 'dark_oak', 'brown_mushroom', 'red_mushroom', 'forest']
+
+
+class VoxelGrid:
+    # Block ids on an x/y/z grid. Shapes are filled through a numpy uint8
+    # array when numpy is installed (a bytearray otherwise) and the result is
+    # frozen into flat bytes, so lookups cost the same with either backend.
+
+    def __init__(self, size):
+        self.size = size
+        self.palette = ['minecraft:air']
+        self.codes = {'minecraft:air': 0}
+        self.cells = np.zeros(size, dtype=np.uint8) if np is not None else bytearray(size[0] * size[1] * size[2])
+        self.flat = None
+
+    def code(self, block_id):
+        if block_id not in self.codes:
+            self.codes[block_id] = len(self.palette)
+            self.palette.append(block_id)
+        return self.codes[block_id]
+
+    def clip(self, lo, hi):
+        return [(max(0, math.floor(a)), min(size, math.ceil(b))) for a, b, size in zip(lo, hi, self.size)]
+
+    def fill(self, lo, hi, block_id, only_air=False):
+        # Fills the box lo (inclusive) to hi (exclusive); only_air keeps blocks
+        # already placed, the way leaves never replace logs.
+        code = self.code(block_id)
+        (x0, x1), (y0, y1), (z0, z1) = self.clip(lo, hi)
+        if np is not None:
+            region = self.cells[x0:x1, y0:y1, z0:z1]
+            if only_air:
+                region[region == 0] = code
+            else:
+                region[...] = code
+            return
+        for x, y, z in itertools.product(range(x0, x1), range(y0, y1), range(z0, z1)):
+            index = self.index(x, y, z)
+            if not only_air or not self.cells[index]:
+                self.cells[index] = code
+
+    def fill_blob(self, center, radii, block_id):
+        # Ellipsoid of leaves (or caps) around center, never replacing blocks.
+        code = self.code(block_id)
+        lo = [c - r for c, r in zip(center, radii)]
+        (x0, x1), (y0, y1), (z0, z1) = self.clip(lo, [c + r + 1 for c, r in zip(center, radii)])
+        if np is not None:
+            x, y, z = np.ogrid[x0:x1, y0:y1, z0:z1]
+            inside = ((x - center[0]) / radii[0]) ** 2 + ((y - center[1]) / radii[1]) ** 2 + ((z - center[2]) / radii[2]) ** 2 <= 1
+            region = self.cells[x0:x1, y0:y1, z0:z1]
+            region[inside & (region == 0)] = code
+            return
+        for x, y, z in itertools.product(range(x0, x1), range(y0, y1), range(z0, z1)):
+            index = self.index(x, y, z)
+            if not self.cells[index] and sum(((p - c) / r) ** 2 for p, c, r in zip((x, y, z), center, radii)) <= 1:
+                self.cells[index] = code
+
+    def set(self, location, block_id):
+        self.fill(location, [c + 1 for c in location], block_id)
+
+    def index(self, x, y, z):
+        return (x * self.size[1] + y) * self.size[2] + z
+
+    def freeze(self):
+        self.flat = self.cells.tobytes() if np is not None else bytes(self.cells)
+        return self
+
+    def get(self, x, y, z):
+        # None stands in for an unloaded block, which fails isValid() in game.
+        if 0 <= x < self.size[0] and 0 <= y < self.size[1] and 0 <= z < self.size[2]:
+            return self.palette[self.flat[self.index(x, y, z)]]
+        return None
+
+    def counts(self):
+        if np is not None:
+            values = np.bincount(self.cells.ravel(), minlength=len(self.palette))
+        else:
+            values = [self.cells.count(code) for code in range(len(self.palette))]
+        return {block_id: int(count) for block_id, count in zip(self.palette, values) if count and block_id != 'minecraft:air'}
+
+
+def place_oak(grid, x, z, rng, log='minecraft:oak_log', leaves='minecraft:oak_leaves', branches=0):
+    height = rng.randint(4, 6)
+    grid.fill((x, 1, z), (x + 1, 1 + height, z + 1), log)
+    for _ in range(branches):
+        dx, dz = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+        grid.set((x + dx, height - 1, z + dz), log)
+    grid.fill_blob((x, height, z), (2.5, 2, 2.5), leaves)
+
+def place_mega(grid, x, z, rng, kind):
+    # 2x2 jungle or spruce trunk; jungle trees grow diagonal branches, spruce
+    # trees a cone of leaves.
+    log, leaves = f'minecraft:{kind}_log', f'minecraft:{kind}_leaves'
+    height = rng.randint(20, 30)
+    grid.fill((x, 1, z), (x + 2, 1 + height, z + 2), log)
+    if kind == 'jungle':
+        for _ in range(rng.randint(2, 4)):
+            y = rng.randint(height // 2, height - 3)
+            dx, dz = rng.choice([(1, 1), (1, -1), (-1, 1), (-1, -1)])
+            bx, bz = x + (1 if dx > 0 else 0), z + (1 if dz > 0 else 0)
+            for step in range(1, 4):
+                grid.set((bx + dx * step, y + step, bz + dz * step), log)
+            grid.fill_blob((bx + dx * 3, y + 4, bz + dz * 3), (2.5, 1.5, 2.5), leaves)
+        grid.fill_blob((x, height, z), (4.5, 2.5, 4.5), leaves)
+    else:
+        for y in range(height // 3, height + 2):
+            radius = 0.5 + (height + 2 - y) * 3 / height + y % 2 * 0.5
+            grid.fill_blob((x + 0.5, y, z + 0.5), (radius + 0.5, 0.5, radius + 0.5), leaves)
+
+def place_dark_oak(grid, x, z, rng):
+    height = rng.randint(6, 8)
+    log = 'minecraft:dark_oak_log'
+    grid.fill((x, 1, z), (x + 2, 1 + height, z + 2), log)
+    for dx, dz in [(-1, 0), (2, 0), (0, -1), (0, 2), (-1, 1), (2, 1)]:
+        if rng.random() < 0.5:
+            grid.fill((x + dx, height - 1, z + dz), (x + dx + 1, height + 1, z + dz + 1), log)
+    grid.fill_blob((x + 0.5, height + 1, z + 0.5), (4, 1.5, 4), 'minecraft:dark_oak_leaves')
+
+def place_mushroom(grid, x, z, rng, color):
+    # The stem is mushroom_stem, which is not a log; only the cap is.
+    height = rng.randint(5, 7)
+    cap = f'minecraft:{color}_mushroom_block'
+    grid.fill((x, 1, z), (x + 1, 1 + height, z + 1), 'minecraft:mushroom_stem')
+    if color == 'brown':
+        grid.fill((x - 3, height + 1, z - 2), (x + 4, height + 2, z + 3), cap)
+        grid.fill((x - 2, height + 1, z - 3), (x + 3, height + 2, z + 4), cap)
+    else:
+        for y in range(height - 2, height + 1):
+            for dx, dz in itertools.product(range(-2, 3), repeat=2):
+                if max(abs(dx), abs(dz)) == 2 and abs(dx) + abs(dz) < 4:
+                    grid.set((x + dx, y, z + dz), cap)
+        grid.fill((x - 1, height + 1, z - 1), (x + 2, height + 2, z + 2), cap)
+
+def build_scenario(name, seed=0, forest_size=4):
+    # Returns the frozen grid and the log that is chopped (bottom of the
+    # first trunk). Ground is a layer of dirt at y = 0.
+    rng = random.Random(seed)
+    if name == 'forest':
+        # Oaks two blocks apart whose side branches touch the next trunk, so
+        # the logs of the whole stand form one connected graph.
+        span = forest_size * 2 + 8
+        grid = VoxelGrid((span, 12, span))
+        grid.fill((0, 0, 0), (span, 1, span), 'minecraft:dirt')
+        for i, j in itertools.product(range(forest_size), repeat=2):
+            place_oak(grid, 4 + i * 2, 4 + j * 2, rng, branches=2)
+        return grid.freeze(), (4, 1, 4)
+
+    grid = VoxelGrid((24, 40, 24))
+    grid.fill((0, 0, 0), (24, 1, 24), 'minecraft:dirt')
+    center = 11
+    if name == 'oak':
+        place_oak(grid, center, center, rng)
+    elif name in ('jungle', 'spruce'):
+        place_mega(grid, center, center, rng, name)
+    elif name == 'dark_oak':
+        place_dark_oak(grid, center, center, rng)
+    elif name.endswith('_mushroom'):
+        place_mushroom(grid, center, center, rng, name.split('_')[0])
+        # Chopping starts on the cap, since the stem is not a log.
+        grid.freeze()
+        top = max(y for y in range(grid.size[1]) if grid.get(center, y, center) != 'minecraft:air')
+        return grid, (center, top, center)
+    else:
+        raise ValueError(f'unknown scenario {name}')
+    return grid.freeze(), (center, 1, center)
+
+
+class LogRules:
+    # Port of isLogIncluded from src/functions/tree_utils.ts.
+
+    def __init__(self, families, included=(), excluded=()):
+        self.families = families
+        self.included = set(included)
+        self.excluded = set(excluded)
+        self.cache = {}
+
+    def info(self, block_id):
+        info = self.families.get(block_id)
+        if info is not None:
+            return info, True
+        if block_id not in self.cache:
+            self.cache[block_id] = (process_config.log_family(block_id),
+                bool(process_config.LOG_BLOCK_PATTERN.search(block_id)) and 'stripped_' not in block_id)
+        return self.cache[block_id]
+
+    def included_log(self, root_id, block_id):
+        if block_id in self.excluded or ':' not in block_id:
+            return False
+        family, is_log = self.info(block_id)
+        if not is_log and (block_id not in self.included or 'stripped_' in block_id):
+            return False
+        return family == self.info(root_id)[0]
+
+
+def neighbors(grid, rules, root_id, location, stats):
+    # getBlockNear: 26 offsets, each one a Block lookup and, when the block is
+    # loaded, an isLogIncluded check.
+    x, y, z = location
+    for dx, dy, dz in NEIGHBOR_OFFSETS:
+        stats['probes'] += 1
+        block_id = grid.get(x + dx, y + dy, z + dz)
+        if block_id is None:
+            continue
+        stats['log_checks'] += 1
+        if rules.included_log(root_id, block_id):
+            yield (x + dx, y + dy, z + dz), block_id
+
+def simulate_tree_logs(grid, rules, start, root_id, max_needed, chop_limit):
+    # Mirrors the runJob generator in getTreeLogs: every neighbor becomes a
+    # graph node (and a visited_ database write) before the limit is checked,
+    # so the graph can overshoot the limit by up to 26 nodes.
+    stats = {'expanded': 0, 'probes': 0, 'log_checks': 0, 'neighbors': 0, 'edges': 0,
+        'visited_keys': 1, 'database_writes': 1, 'yields': 0}
+    graph = {start: set()}
+    visited = {start}
+    queue = deque([start])
+    y_offsets = set()
+    type_ids = {root_id: 0}
+    while queue:
+        if len(graph) >= chop_limit or len(graph) >= max_needed:
+            break
+        block = queue.popleft()
+        stats['expanded'] += 1
+        y_offsets.add(block[1])
+        for neighbor, block_id in neighbors(grid, rules, root_id, block, stats):
+            stats['neighbors'] += 1
+            stats['visited_keys'] += 1
+            stats['database_writes'] += 1
+            node = graph.setdefault(neighbor, set())
+            if neighbor in graph[block]:
+                continue
+            graph[block].add(neighbor)
+            node.add(block)
+            stats['edges'] += 1
+            if neighbor in visited:
+                continue
+            visited.add(neighbor)
+            queue.append(neighbor)
+            type_ids[block_id] = type_ids.get(block_id, 0) + 1
+            stats['yields'] += 1
+        stats['yields'] += 1
+    stats['nodes'] = len(graph)
+    stats['queued'] = len(queue)
+    return stats, graph, sorted(y_offsets), type_ids
+
+def simulate_trunk(grid, rules, start, root_id):
+    # Mirrors getTreeTrunkSize: a flood fill keyed by x/z only, limited to two
+    # blocks above or below the chopped log. Blocks are queued again for every
+    # neighbor that reaches them before they are popped.
+    stats = {'pops': 0, 'probes': 0, 'log_checks': 0, 'visited_keys': 0, 'yields': 0}
+    visited = set()
+    queue = deque([start])
+    total_x = total_z = size = 0
+    while queue:
+        x, y, z = queue.popleft()
+        stats['pops'] += 1
+        stats['visited_keys'] += 1
+        if (x, z) in visited:
+            continue
+        visited.add((x, z))
+        total_x += x
+        total_z += z
+        size += 1
+        for dy in (-1, 0, 1):
+            if not start[1] - 2 <= y + dy <= start[1] + 2:
+                continue
+            for dx in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    if dx == dy == dz == 0:
+                        continue
+                    stats['probes'] += 1
+                    stats['visited_keys'] += 1
+                    block_id = grid.get(x + dx, y + dy, z + dz)
+                    if block_id is None or (x + dx, z + dz) in visited:
+                        continue
+                    stats['log_checks'] += 1
+                    if not rules.included_log(root_id, block_id):
+                        continue
+                    queue.append((x + dx, y + dy, z + dz))
+                    stats['yields'] += 1
+                stats['yields'] += 1
+            stats['yields'] += 1
+        stats['yields'] += 1
+    if size <= 1:
+        center = (start[0] + 0.5, start[2] + 0.5)
+        size = 1
+    else:
+        center = (total_x / size + 0.5, total_z / size + 0.5)
+    stats['size'] = size
+    return stats, center
+
+def trunk_height(grid, rules, start, root_id, center):
+    # getTopmostBlock at the trunk center minus the first non-log block below
+    # the chopped one, as in the itemUseOn handler.
+    x, z = int(math.floor(center[0])), int(math.floor(center[1]))
+    top = max((y for y in range(grid.size[1]) if grid.get(x, y, z) not in (None, 'minecraft:air')), default=start[1])
+    bottom = start[1] - 1
+    while bottom > 0 and rules.included_log(root_id, grid.get(start[0], bottom, start[2]) or ''):
+        bottom -= 1
+    return top - bottom
+
+def simulate_chop(grid, rules, start, settings, axe_durability, unbreaking=0, yields_per_tick=YIELDS_PER_TICK):
+    # One chop with a fresh axe: trunk size, getTreeLogs, outline spawning and
+    # the durability / chopLimit checks of main.ts, with the yields of every
+    # runJob turned into ticks.
+    root_id = grid.get(*start)
+    chop_limit = int(settings['chopLimit'])
+    unbreaking_damage = float(settings['durabilityDamagePerBlock']) * (100 / (unbreaking + 1)) / 100
+    max_needed = axe_durability / unbreaking_damage if unbreaking_damage else math.inf
+
+    trunk, center = simulate_trunk(grid, rules, start, root_id)
+    traversal, graph, y_offsets, type_ids = simulate_tree_logs(grid, rules, start, root_id, max_needed, chop_limit)
+    initial_size = traversal['nodes'] - 1
+    # The whole connected tree, to tell a partial chop from a full one.
+    tree_logs = simulate_tree_logs(grid, rules, start, root_id, math.inf, math.inf)[0]['nodes'] - 1
+    total_damage = initial_size * unbreaking_damage
+    vertical = trunk_height(grid, rules, start, root_id, center) > 2
+
+    if initial_size >= chop_limit:
+        outcome = 'over chopLimit'
+    elif total_damage > axe_durability:
+        outcome = 'not enough durability'
+    elif total_damage + 1 == axe_durability:
+        outcome = 'chopped, axe broke'
+    elif initial_size < tree_logs:
+        outcome = 'chopped partially'
+    else:
+        outcome = 'chopped'
+
+    result = {
+        'root': root_id, 'outcome': outcome, 'logs': initial_size, 'tree_logs': tree_logs, 'durability_used': round(total_damage, 2),
+        'trunk': trunk, 'traversal': traversal, 'outlines': len(y_offsets), 'vertical': vertical,
+        'items': sum(math.ceil(count / 64) for count in type_ids.values()),
+    }
+    # Outlines are spawned, then flagged not_persistent, one yield each.
+    outline_yields = 2 * len(y_offsets)
+    result['job_yields'] = trunk['yields'] + traversal['yields'] + outline_yields
+    result['job_ticks'] = sum(math.ceil(yields / yields_per_tick) for yields in (trunk['yields'], traversal['yields'], outline_yields) if yields)
+    if outcome.startswith('chopped'):
+        # Destroy job: two yields per node plus one per item stack, and the
+        # immersive mode waits immersiveModeDelay ticks every other layer.
+        destroy_yields = 2 * traversal['nodes'] + len(y_offsets) + result['items'] + len(type_ids)
+        result['job_yields'] += destroy_yields
+        result['job_ticks'] += math.ceil(destroy_yields / yields_per_tick)
+        if settings['immersiveMode'] and vertical:
+            result['job_ticks'] += math.ceil(len(y_offsets) / 2) * int(settings['immersiveModeDelay'])
+    return result
+
+def load_axes(path=AXES_PATH):
+    axes = {}
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith('_lumber_axe.json'):
+            with open(os.path.join(path, filename), 'r') as file:
+                item = json.load(file)['minecraft:item']
+            axes[filename[:-len('_lumber_axe.json')]] = item['components']['minecraft:durability']['max_durability']
+    return axes
+
+def default_settings():
+    return {key: setting['default'] for key, setting in process_config.load_settings('release').items()}
+
+def run(scenarios, sweeps, axes, unbreaking, yields_per_tick, seed, forest_size, overrides={}):
+    # Every scenario against every combination of the swept settings.
+    base = {**default_settings(), **overrides}
+    rules = LogRules(process_config.load_log_families(), base['includedLog'], base['excludedLog'])
+    keys = list(sweeps)
+    results = []
+    for name in scenarios:
+        start_time = time.perf_counter()
+        grid, start = build_scenario(name, seed, forest_size)
+        build_ms = (time.perf_counter() - start_time) * 1000
+        for axe, durability in axes.items():
+            for values in itertools.product(*(sweeps[key] for key in keys)):
+                settings = {**base, **dict(zip(keys, values))}
+                start_time = time.perf_counter()
+                result = simulate_chop(grid, rules, start, settings, durability, unbreaking, yields_per_tick)
+                result.update({'scenario': name, 'axe': axe, 'settings': dict(zip(keys, values)),
+                    'blocks': grid.counts(), 'build_ms': round(build_ms, 2),
+                    'simulate_ms': round((time.perf_counter() - start_time) * 1000, 2)})
+                results.append(result)
+    return results
+
+def report(results):
+    print(f'{"scenario":<15} {"axe":<10} {"settings":<32} {"logs":>6} {"tree":>6} {"probes":>7} {"checks":>7} {"keys":>6} '
+        f'{"yields":>7} {"ticks":>6} {"outlines":>8}  outcome')
+    for result in results:
+        settings = ' '.join(f'{SETTING_LABELS.get(key, key)}={value}' for key, value in result['settings'].items())
+        traversal = result['traversal']
+        print(f'{result["scenario"]:<15} {result["axe"]:<10} {settings[:32]:<32} {result["logs"]:>6} {result["tree_logs"]:>6} '
+            f'{traversal["probes"] + result["trunk"]["probes"]:>7} {traversal["log_checks"] + result["trunk"]["log_checks"]:>7} '
+            f'{traversal["visited_keys"] + result["trunk"]["visited_keys"]:>6} {result["job_yields"]:>7} {result["job_ticks"]:>6} '
+            f'{result["outlines"]:>8}  {result["outcome"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate the tree traversal of the Lumber Axe over synthetic trees.')
+    parser.add_argument('scenarios', nargs='*', help=f'Trees to simulate: {", ".join(SCENARIOS)} (default: all).')
+    parser.add_argument('--chop-limit', type=int, nargs='+', help='chopLimit values to sweep (default: configuration_settings.json).')
+    parser.add_argument('--durability-damage', type=float, nargs='+', help='durabilityDamagePerBlock values to sweep.')
+    parser.add_argument('--immersive-delay', type=int, nargs='+', help='immersiveModeDelay values to sweep; implies immersive mode.')
+    parser.add_argument('--axe', nargs='+', help='Lumber axes to chop with, by tier (default: all in BP/items).')
+    parser.add_argument('--unbreaking', type=int, default=0, help='Unbreaking level of the axe.')
+    parser.add_argument('--yields-per-tick', type=int, default=YIELDS_PER_TICK, help='Generator yields assumed to run per tick in system.runJob.')
+    parser.add_argument('--forest-size', type=int, default=4, help='Trees per side of the forest scenario.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the tree shapes.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}')
+
+    sweeps = {}
+    if args.chop_limit:
+        sweeps['chopLimit'] = args.chop_limit
+    if args.durability_damage:
+        sweeps['durabilityDamagePerBlock'] = args.durability_damage
+    if args.immersive_delay:
+        sweeps['immersiveModeDelay'] = args.immersive_delay
+    axes = load_axes()
+    if args.axe:
+        axes = {axe: axes[axe] for axe in args.axe}
+
+    results = run(args.scenarios or SCENARIOS, sweeps, axes, args.unbreaking, args.yields_per_tick, args.seed, args.forest_size,
+        {'immersiveMode': True} if args.immersive_delay else {})
+    report(results)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
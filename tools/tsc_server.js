@@ -0,0 +1,63 @@
+// Keeps the TypeScript compiler loaded for the build daemon. Every line read
+// from stdin builds the project with the same solution builder `tsc -b`
+// runs, so up-to-date checks, emitted files and the .tsbuildinfo are those
+// of a cold build. The diagnostics are written out, then a line holding the
+// exit code after EXIT_MARKER.
+//
+// Between builds, the parsed source files of unchanged inputs (above all the
+// lib and @minecraft typings) are kept, and so is the JIT-compiled compiler.
+'use strict';
+const fs = require('fs');
+const readline = require('readline');
+const ts = require(process.argv[2]);
+
+const EXIT_MARKER = '@@exit ';
+// Parsed source files by path, with the mtime and target they were parsed for.
+const sourceFiles = new Map();
+
+function mtime(path) {
+    try {
+        return fs.statSync(path).mtimeMs;
+    } catch {
+        return undefined;
+    }
+}
+
+function createProgram(rootNames, options, host, oldProgram, configFileParsingDiagnostics, projectReferences) {
+    if (host) {
+        const getSourceFile = host.getSourceFile;
+        host.getSourceFile = (fileName, languageVersion, onError, shouldCreate) => {
+            const time = mtime(fileName);
+            const key = JSON.stringify(languageVersion);
+            const cached = sourceFiles.get(fileName);
+            if (cached && cached.time === time && cached.key === key) {
+                return cached.file;
+            }
+            const file = getSourceFile(fileName, languageVersion, onError, shouldCreate);
+            if (file) {
+                sourceFiles.set(fileName, { time, key, file });
+            }
+            return file;
+        };
+    }
+    return ts.createEmitAndSemanticDiagnosticsBuilderProgram(rootNames, options, host, oldProgram,
+        configFileParsingDiagnostics, projectReferences);
+}
+
+function build() {
+    const host = ts.createSolutionBuilderHost(ts.sys, createProgram, ts.createDiagnosticReporter(ts.sys),
+        ts.createBuilderStatusReporter(ts.sys));
+    return ts.createSolutionBuilder(host, ['tsconfig.json'], {}).build();
+}
+
+readline.createInterface({ input: process.stdin }).on('line', () => {
+    let code;
+    try {
+        code = build();
+    } catch (err) {
+        process.stdout.write(`${err.stack}\n`);
+        sourceFiles.clear();
+        code = 1;
+    }
+    process.stdout.write(`${EXIT_MARKER}${code}\n`);
+});
@@ -0,0 +1,382 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import json, argparse
+import os
+import re
+import sys
+
+import json_cache
+from process_config import compute_hash
+from profiler import profiler
+
+CACHE_PATH = 'builds/.validate_cache.json'
+# Bump when extraction changes, so cached facts are redone.
+VALIDATOR_VERSION = 1
+IMAGE_EXTENSIONS = ('.png', '.tga', '.jpg', '.jpeg')
+DEFAULT_LANGUAGE = 'en_US'
+# Lang keys passed to rawtext translate in the compiled scripts.
+TRANSLATE_PATTERN = re.compile(r'translate:\s*(["\'`])([^"\'`$\\]+)\1')
+LOCAL_KEY_PATTERN = re.compile(r'^(geometry|texture|material)\.(\w+)$', re.IGNORECASE)
+# Pool startup only pays off when many files have to be parsed.
+POOL_THRESHOLD = 16
+
+BP_KINDS = {'items': 'item', 'entities': 'entity', 'recipes': 'recipe'}
+RP_KINDS = {'entity': 'client_entity', 'render_controllers': 'render_controller', 'animations': 'animation',
+    'animation_controllers': 'animation_controller', 'models': 'geometry', 'particles': 'particle'}
+
+
+def file_kind(pack, rel):
+    # What a file under BP or RP is, from where it lives; None for files that
+    # are not validated.
+    parts = rel.split('/')
+    if rel == 'manifest.json':
+        return 'manifest'
+    if pack == 'BP':
+        if parts[0] == 'scripts':
+            return 'script' if rel.endswith('.js') else None
+        return BP_KINDS.get(parts[0], 'json') if rel.endswith('.json') else None
+    if rel == 'textures/item_texture.json':
+        return 'item_texture'
+    if rel == 'textures/terrain_texture.json':
+        return 'terrain_texture'
+    if rel == 'texts/languages.json':
+        return 'languages'
+    if parts[0] == 'texts' and rel.endswith('.lang'):
+        return 'lang'
+    if rel.endswith('.json'):
+        return RP_KINDS.get(parts[0], 'json')
+    if rel.endswith('.material'):
+        return 'json'
+    return None
+
+def affects_validation(path):
+    # Whether a change to path (relative to the project) can change the result.
+    pack, _, rel = path.partition('/')
+    return pack in ('BP', 'RP') and (file_kind(pack, rel) is not None or rel.lower().endswith(IMAGE_EXTENSIONS))
+
+def load_json(data):
+    try:
+        return json.loads(data)
+    except ValueError:
+        # The game accepts // and /* */ comments; strip them outside strings.
+        return json.loads(re.sub(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or '', data, flags=re.S))
+
+def as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def names(entries):
+    # Render controller and animate lists mix plain names with {name: condition}.
+    for entry in as_list(entries):
+        if isinstance(entry, dict):
+            yield from entry
+        elif isinstance(entry, str):
+            yield entry
+
+def texture_paths(value):
+    for entry in as_list(value):
+        if isinstance(entry, dict):
+            entry = entry.get('path')
+        if isinstance(entry, str):
+            yield entry
+
+def extract(path, kind):
+    # Runs in a worker process: parses one file and returns what it defines
+    # and references, plus any problem found inside the file itself.
+    facts = {'defines': {}, 'refs': [], 'errors': []}
+
+    def define(category, name):
+        facts['defines'].setdefault(category, []).append(name)
+
+    def ref(category, name, context):
+        facts['refs'].append([category, name, context])
+
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        data = file.read()
+    if kind == 'script':
+        for match in TRANSLATE_PATTERN.finditer(data):
+            ref('lang_key', match.group(2), f'line {data.count(chr(10), 0, match.start()) + 1}')
+        return facts
+    if kind == 'lang':
+        keys = {}
+        for number, line in enumerate(data.splitlines(), 1):
+            line = line.split('\t#', 1)[0].strip()
+            if not line or line.startswith('##'):
+                continue
+            if '=' not in line:
+                facts['errors'].append(f'line {number}: expected key=value')
+                continue
+            key = line.split('=', 1)[0]
+            if key in keys:
+                facts['errors'].append(f'line {number}: {key} is already defined on line {keys[key]}')
+            keys[key] = number
+        facts['lang'] = sorted(keys)
+        return facts
+
+    try:
+        content = load_json(data)
+    except ValueError as err:
+        facts['errors'].append(f'invalid JSON: {err}')
+        return facts
+    if not isinstance(content, (dict, list)):
+        facts['errors'].append('expected a JSON object')
+        return facts
+
+    if kind == 'manifest':
+        header = content.get('header', {})
+        if 'uuid' in header:
+            define('pack_uuid', header['uuid'])
+        for dependency in content.get('dependencies', []):
+            if 'uuid' in dependency:
+                ref('pack_uuid', dependency['uuid'], 'dependencies')
+    elif kind == 'item':
+        item = content.get('minecraft:item', {})
+        identifier = item.get('description', {}).get('identifier')
+        define('item', identifier)
+        components = item.get('components', {})
+        icon = components.get('minecraft:icon')
+        if isinstance(icon, dict):
+            icon = icon.get('texture') or icon.get('textures', {}).get('default')
+        if icon:
+            ref('texture_shortname', icon, 'minecraft:icon')
+        display_name = components.get('minecraft:display_name', {}).get('value')
+        ref('lang_key', display_name or f'item.{identifier}.name', 'minecraft:display_name')
+    elif kind == 'entity':
+        define('entity', content.get('minecraft:entity', {}).get('description', {}).get('identifier'))
+    elif kind == 'recipe':
+        for key, recipe in content.items():
+            if not key.startswith('minecraft:recipe') or not isinstance(recipe, dict):
+                continue
+            items = [entry.get('item') if isinstance(entry, dict) else entry
+                for entry in list(recipe.get('key', {}).values()) + as_list(recipe.get('ingredients')) + as_list(recipe.get('result'))
+                + [recipe.get('base'), recipe.get('addition'), recipe.get('template'), recipe.get('input'), recipe.get('output')]]
+            for item in items:
+                if isinstance(item, str):
+                    ref('item', item.rsplit(':', 1)[0] if item.count(':') > 1 else item, key)
+    elif kind in ('item_texture', 'terrain_texture'):
+        category = 'texture_shortname' if kind == 'item_texture' else 'terrain_shortname'
+        for shortname, entry in content.get('texture_data', {}).items():
+            define(category, shortname)
+            for texture in texture_paths(entry.get('textures') if isinstance(entry, dict) else entry):
+                ref('texture_path', texture, shortname)
+    elif kind == 'languages':
+        for language in as_list(content):
+            ref('language', language, 'languages.json')
+    elif kind == 'client_entity':
+        description = content.get('minecraft:client_entity', {}).get('description', {})
+        define('client_entity', description.get('identifier'))
+        for geometry in description.get('geometry', {}).values():
+            ref('geometry', geometry, 'geometry')
+        for texture in description.get('textures', {}).values():
+            ref('texture_path', texture, 'textures')
+        for animation in description.get('animations', {}).values():
+            ref('animation', animation, 'animations')
+        for particle in description.get('particle_effects', {}).values():
+            ref('particle', particle, 'particle_effects')
+        controllers = list(names(description.get('render_controllers')))
+        for controller in controllers:
+            ref('render_controller', controller, 'render_controllers')
+        animations = description.get('animations', {})
+        for name in names(description.get('scripts', {}).get('animate')):
+            if name not in animations:
+                facts['errors'].append(f'scripts.animate: {name} is not one of its animations')
+        facts['entity'] = {
+            'identifier': description.get('identifier'),
+            'keys': {'geometry': list(description.get('geometry', {})), 'texture': list(description.get('textures', {})),
+                'material': list(description.get('materials', {}))},
+            'render_controllers': controllers,
+            'animations': animations,
+            'particle_effects': list(description.get('particle_effects', {})),
+        }
+    elif kind == 'render_controller':
+        uses = {}
+        for name, controller in content.get('render_controllers', {}).items():
+            define('render_controller', name)
+            used = []
+            values = [controller.get('geometry')] + as_list(controller.get('textures'))
+            values += [value for entry in as_list(controller.get('materials')) if isinstance(entry, dict) for value in entry.values()]
+            for value in values:
+                match = LOCAL_KEY_PATTERN.match(value) if isinstance(value, str) else None
+                if match:
+                    used.append([match.group(1).lower(), match.group(2)])
+            uses[name] = used
+        facts['render_controllers'] = uses
+    elif kind == 'animation':
+        effects = {}
+        for name, animation in content.get('animations', {}).items():
+            define('animation', name)
+            effects[name] = sorted({entry.get('effect') for frame in animation.get('particle_effects', {}).values()
+                for entry in as_list(frame) if isinstance(entry, dict) and entry.get('effect')})
+        facts['animation_effects'] = effects
+    elif kind == 'animation_controller':
+        states = {}
+        for name, controller in content.get('animation_controllers', {}).items():
+            define('animation', name)
+            used = set()
+            for state_name, state in controller.get('states', {}).items():
+                used.update(names(state.get('animations')))
+                for transition in as_list(state.get('transitions')):
+                    for target in transition if isinstance(transition, dict) else []:
+                        if target not in controller.get('states', {}):
+                            facts['errors'].append(f'{name}: state {state_name} transitions to unknown state {target}')
+            states[name] = sorted(used)
+        facts['controller_animations'] = states
+    elif kind == 'geometry':
+        for geometry in as_list(content.get('minecraft:geometry')):
+            define('geometry', geometry.get('description', {}).get('identifier'))
+        for key in content:
+            if key.startswith('geometry.'):
+                define('geometry', key.split(':', 1)[0])
+    elif kind == 'particle':
+        description = content.get('particle_effect', {}).get('description', {})
+        define('particle', description.get('identifier'))
+        texture = description.get('basic_render_parameters', {}).get('texture')
+        if texture:
+            ref('texture_path', texture, 'basic_render_parameters.texture')
+    return facts
+
+
+class PackValidator:
+    # Parses every JSON, .lang and script file of the packs, in parallel, into
+    # what each one defines and references, then cross-checks them. Facts are
+    # cached by file content hash (and hashes by mtime and size), so only
+    # edited files are parsed again.
+
+    def __init__(self, packs=(('BP', 'BP'), ('RP', 'RP')), cache_path=CACHE_PATH, workers=None):
+        self.packs = packs
+        self.cache_path = cache_path
+        self.workers = workers
+        self.hashes = {}
+        self.facts = {}
+        try:
+            data = json_cache.load(cache_path)
+            if data.get('version') == VALIDATOR_VERSION:
+                self.hashes = data['hashes']
+                self.facts = data['facts']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    def save(self, used):
+        self.facts = {key: facts for key, facts in self.facts.items() if key in used}
+        json_cache.dump(self.cache_path, {'version': VALIDATOR_VERSION, 'hashes': self.hashes, 'facts': self.facts})
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        cached = self.hashes.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        self.hashes[path] = [st.st_mtime_ns, st.st_size, compute_hash(path)]
+        return self.hashes[path][2]
+
+    def scan(self):
+        # (pack, rel, path, kind) of every validated file, and the texture
+        # paths (without extension) of every image in the packs.
+        files, textures = [], set()
+        for pack, root in self.packs:
+            for folderName, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    path = os.path.join(folderName, filename)
+                    rel = Path(path).relative_to(root).as_posix()
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        textures.add(os.path.splitext(rel)[0])
+                    kind = file_kind(pack, rel)
+                    if kind:
+                        files.append((pack, rel, Path(path).as_posix(), kind))
+        return files, textures
+
+    def validate(self):
+        with profiler.span('validate', cat='stage', files=0) as span:
+            files, textures = self.scan()
+            keys = {path: f'{kind}:{self.file_hash(path)}' for _, _, path, kind in files}
+            misses = [(path, kind) for _, _, path, kind in files if keys[path] not in self.facts]
+            if len(misses) > POOL_THRESHOLD:
+                with ProcessPoolExecutor(min(len(misses), self.workers or os.cpu_count() or 1)) as pool:
+                    results = list(pool.map(extract, *zip(*misses), chunksize=8))
+            else:
+                results = [extract(path, kind) for path, kind in misses]
+            for (path, _), facts in zip(misses, results):
+                self.facts[keys[path]] = facts
+            span['files'] = len(misses)
+            self.hashes = {path: entry for path, entry in self.hashes.items() if path in keys}
+            self.save(set(keys.values()))
+            problems = cross_check([(pack, rel, path, kind, self.facts[keys[path]]) for pack, rel, path, kind in files], textures)
+        return problems, len(files), len(misses)
+
+
+def cross_check(files, textures):
+    # (severity, path, message) for every problem within a file and every
+    # reference that nothing in the packs defines.
+    problems = []
+    defined = {'texture_path': set(textures)}
+    languages = {}
+    for pack, rel, path, kind, facts in files:
+        problems += [('error', path, message) for message in facts['errors']]
+        for category, values in facts['defines'].items():
+            defined.setdefault(category, set()).update(value for value in values if value)
+        if kind == 'lang':
+            languages[Path(rel).stem] = (path, set(facts['lang']))
+    defined['lang_key'] = languages.get(DEFAULT_LANGUAGE, (None, set()))[1]
+    defined['language'] = set(languages)
+
+    for pack, rel, path, kind, facts in files:
+        for category, name, context in facts['refs']:
+            if not name or name.startswith('minecraft:') or name in defined.get(category, ()):
+                continue
+            if category == 'texture_path' and name.startswith('atlas.'):
+                # The engine's own atlases (atlas.terrain, atlas.items).
+                continue
+            problems.append(('error', path, f'{context}: {category.replace("_", " ")} {name} is not defined'))
+
+    # Names an entity's render controllers, animation controllers and
+    # animations use must be keys of that entity's own description.
+    controllers, controller_animations, animation_effects = {}, {}, {}
+    for _, _, _, kind, facts in files:
+        controllers.update(facts.get('render_controllers', {}))
+        controller_animations.update(facts.get('controller_animations', {}))
+        animation_effects.update(facts.get('animation_effects', {}))
+    for _, _, path, kind, facts in files:
+        entity = facts.get('entity')
+        if not entity:
+            continue
+        for controller in entity['render_controllers']:
+            for category, key in controllers.get(controller, []):
+                if key not in entity['keys'][category]:
+                    problems.append(('error', path, f'{controller} uses {category}.{key}, which {entity["identifier"]} does not define'))
+        for animation in entity['animations'].values():
+            for name in controller_animations.get(animation, []):
+                if name not in entity['animations']:
+                    problems.append(('error', path, f'{animation} plays {name}, which is not one of its animations'))
+            for effect in animation_effects.get(animation, []):
+                if effect not in entity['particle_effects']:
+                    problems.append(('error', path, f'{animation} emits {effect}, which is not one of its particle_effects'))
+
+    default_keys = defined['lang_key']
+    for language, (path, keys) in sorted(languages.items()):
+        missing = sorted(default_keys - keys)
+        if missing and language != DEFAULT_LANGUAGE:
+            problems.append(('warning', path, f'{len(missing)} keys of {DEFAULT_LANGUAGE} are missing: {", ".join(missing[:3])}'
+                + (', ...' if len(missing) > 3 else '')))
+    return problems
+
+def report(problems, files, parsed, paths=None):
+    # With paths, only the problems of those files are listed.
+    for severity, path, message in problems:
+        if paths is None or path in paths:
+            print(f'{path}: {severity}: {message}')
+    errors = sum(1 for severity, _, _ in problems if severity == 'error')
+    print(f'validated {files} files ({parsed} parsed, {files - parsed} cached): {errors} errors, {len(problems) - errors} warnings')
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the packs for invalid JSON/.lang files and broken cross-references.')
+    parser.add_argument('--bp', default='BP', help='Behavior pack folder to validate.')
+    parser.add_argument('--rp', default='RP', help='Resource pack folder to validate.')
+    parser.add_argument('--cache', default=CACHE_PATH, help='File caching the facts of every validated file.')
+    args = parser.parse_args()
+
+    validator = PackValidator((('BP', args.bp), ('RP', args.rp)), args.cache)
+    if report(*validator.validate()):
+        sys.exit(1)
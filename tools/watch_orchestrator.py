@@ -0,0 +1,192 @@
+from pathlib import Path
+import asyncio, importlib, os, time, traceback
+
+import process_config, validate_packs
+from profiler import profiler
+from watch_telemetry import WatchTelemetry
+sync2com_mojang = importlib.import_module('sync2com-mojang')
+
+CONFIG_INPUTS = {Path(path).resolve() for path in (process_config.SETTINGS_PATH, process_config.CONFIG_JS_PATH, process_config.LOG_BLOCKS_JS_PATH)}
+WATCHED_FOLDERS = ['src', 'BP', 'RP']
+SETTINGS_INPUT = Path(process_config.SETTINGS_PATH).resolve()
+# Sources tsc compiles; the config modules are regenerated, not edited.
+SCRIPT_SUFFIXES = ('.ts', '.js')
+GENERATED_SOURCES = {Path(path).resolve() for path in (process_config.CONFIG_TS_PATH, process_config.LOG_BLOCKS_TS_PATH)}
+
+
+class WatchOrchestrator:
+    # Runs watch mode in a single process: one watchdog observer covers src,
+    # BP and RP, tsc -w is supervised as a child whose output is echoed, and
+    # config generation and com.mojang sync run as in-process tasks. The
+    # latency of every hop is tracked by a WatchTelemetry, printed every
+    # telemetry_interval seconds and written to telemetry_path as JSON.
+
+    def __init__(self, tsc_path, dest, target, manifest=None, debounce=0.25, telemetry_interval=60, telemetry_path=None, server_dir=None):
+        self.tsc_path = tsc_path
+        self.target = target
+        self.debounce = debounce
+        self.delta = sync2com_mojang.DeltaSync(
+            list(zip(['BP', 'RP'], sync2com_mojang.get_pack_paths(dest, manifest, server_dir))))
+        self.sync_queue = sync2com_mojang.EventQueue(self.apply_sync, debounce)
+        self.validator = validate_packs.PackValidator()
+        self.telemetry = WatchTelemetry()
+        self.telemetry_interval = telemetry_interval
+        self.telemetry_path = telemetry_path
+        self.config_requested = asyncio.Event()
+        self.config_lock = asyncio.Lock()
+        self.loop = None
+        self.root = Path.cwd().resolve()
+
+    def apply_sync(self, batch):
+        try:
+            start = time.monotonic()
+            stats = self.delta.sync_paths(batch)
+            end = time.monotonic()
+            print(self.delta.summary())
+            scripts = self.root / 'BP' / 'scripts'
+            compiled = {path for path in batch if Path(path).resolve().is_relative_to(scripts)}
+            self.telemetry.synced(batch, [at for path, at in batch.items() if path not in compiled], bool(compiled),
+                start, end, stats['copied'] + stats['deleted'], stats['bytes'])
+        except OSError:
+            traceback.print_exc()
+        # Re-checks the packs, parsing only the files of this batch again, and
+        # lists the problems found in them.
+        paths = {Path(os.path.relpath(path, self.root)).as_posix() for path in batch}
+        if any(validate_packs.affects_validation(path) for path in paths):
+            try:
+                validate_packs.report(*self.validator.validate(), paths=paths)
+            except OSError:
+                traceback.print_exc()
+
+    def route(self, path):
+        # Called from the observer thread.
+        resolved = Path(path).resolve()
+        if resolved == SETTINGS_INPUT:
+            self.telemetry.source_event('config')
+        elif (resolved.suffix in SCRIPT_SUFFIXES and resolved not in GENERATED_SOURCES
+                and resolved.is_relative_to(self.root / 'src')):
+            self.telemetry.source_event('tsc')
+        if resolved in CONFIG_INPUTS:
+            self.loop.call_soon_threadsafe(self.config_requested.set)
+        try:
+            folder = resolved.relative_to(self.root).parts[0]
+        except (ValueError, IndexError):
+            return
+        if folder in ('BP', 'RP'):
+            self.sync_queue.put(path)
+
+    def start_observer(self):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        orchestrator = self
+
+        class MyHandler(FileSystemEventHandler):
+            def on_any_event(self, ev):
+                if ev.is_directory or ev.event_type not in ('modified', 'created', 'deleted', 'moved'):
+                    return
+                orchestrator.route(ev.src_path)
+                if ev.event_type == 'moved':
+                    orchestrator.route(ev.dest_path)
+
+        observer = Observer()
+        handler = MyHandler()
+        for folder in WATCHED_FOLDERS:
+            if os.path.isdir(folder):
+                observer.schedule(handler, path=folder, recursive=True)
+        observer.start()
+        return observer
+
+    async def supervise_tsc(self):
+        restarts = 0
+        while True:
+            tsc = await asyncio.create_subprocess_exec(
+                self.tsc_path, '-w', '--preserveWatchOutput',
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            try:
+                while line := await tsc.stdout.readline():
+                    line = line.decode(errors='replace').rstrip()
+                    print(f'[tsc] {line}')
+                    if 'Starting compilation' in line or 'Starting incremental compilation' in line:
+                        self.telemetry.compile_started()
+                    if 'Watching for file changes' in line:
+                        self.telemetry.compile_finished()
+                        # tsc may have just overwritten the generated config
+                        # module; restore it before the batch is synced.
+                        await self.check_config()
+                    self.sync_queue.feed_tsc_line(line)
+                code = await tsc.wait()
+            except asyncio.CancelledError:
+                if tsc.returncode is None:
+                    tsc.terminate()
+                    await tsc.wait()
+                raise
+            # Never leave the queue held by a compile that will not finish.
+            self.sync_queue.release()
+            restarts += 1
+            delay = min(30, 2 ** restarts)
+            print(f'[tsc] exited with code {code}, restarting in {delay}s...')
+            await asyncio.sleep(delay)
+
+    async def generate_config(self):
+        while True:
+            await self.config_requested.wait()
+            # Let the editor finish writing before reading the settings.
+            await asyncio.sleep(self.debounce)
+            self.config_requested.clear()
+            if await self.check_config():
+                print('Settings changed! Updating...')
+
+    async def check_config(self):
+        async with self.config_lock:
+            try:
+                return await asyncio.to_thread(self.check_config_sync)
+            except Exception:
+                traceback.print_exc()
+                return False
+
+    def check_config_sync(self):
+        with profiler.span('config check', cat='watch') as span:
+            span['changed'] = process_config.check_for_changes(self.target)
+        self.telemetry.config_checked(span['changed'])
+        return span['changed']
+
+    async def report_telemetry(self):
+        while True:
+            await asyncio.sleep(self.telemetry_interval)
+            if self.telemetry.changed_since_report():
+                print(f'[latency]\n{self.telemetry.summary()}')
+                if self.telemetry_path:
+                    self.telemetry.write(self.telemetry_path)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.sync_queue.start()
+        observer = self.start_observer()
+        tasks = [
+            asyncio.create_task(self.supervise_tsc()),
+            asyncio.create_task(self.generate_config()),
+        ]
+        if self.telemetry_interval:
+            tasks.append(asyncio.create_task(self.report_telemetry()))
+        print('Watch mode: press control-C to stop.')
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            observer.stop()
+            await asyncio.to_thread(observer.join)
+            await asyncio.to_thread(self.sync_queue.close)
+            print(f'[latency]\n{self.telemetry.summary()}')
+            if self.telemetry_path:
+                self.telemetry.write(self.telemetry_path)
+                print(f'latency telemetry written to {self.telemetry_path}')
+
+
+def watch(tsc_path, dest, target, manifest=None, debounce=0.25, telemetry_interval=60, telemetry_path=None, server_dir=None):
+    try:
+        asyncio.run(WatchOrchestrator(tsc_path, dest, target, manifest, debounce, telemetry_interval, telemetry_path, server_dir).run())
+    except KeyboardInterrupt:
+        pass
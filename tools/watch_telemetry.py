@@ -0,0 +1,139 @@
+from collections import deque
+import json, math, threading, time
+
+from json_cache import write_atomic
+
+# Hops a change takes in watch mode. tsc and config run from the source event
+# to the compile or regeneration being done, queue from a pack file's first
+# event to its batch being synced, sync is the copy itself and end_to_end
+# runs from the source event to the file landing in the development pack.
+STAGES = ('tsc', 'config', 'queue', 'sync', 'end_to_end')
+DEFAULT_WINDOW = 200
+# Upper bounds (ms) of the exported histogram buckets.
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# A compile or regeneration whose outputs are not synced within this many
+# seconds changed nothing in the packs, and is not waited for any longer.
+LANDING_TIMEOUT = 10
+
+
+class LatencyWindow:
+    # Latencies (ms) of the last `size` samples of a stage, with lifetime
+    # counters of runs, the events they handled and the bytes they wrote.
+
+    def __init__(self, size=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=size)
+        self.runs = 0
+        self.events = 0
+        self.bytes = 0
+
+    def add(self, ms, events=0, bytes=0):
+        self.samples.append(ms)
+        self.runs += 1
+        self.events += events
+        self.bytes += bytes
+
+    def stats(self):
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            # Nearest rank.
+            return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 1) if ordered else None
+
+        histogram = {f'<={bound}': 0 for bound in BUCKETS}
+        histogram['>'] = 0
+        for ms in ordered:
+            bound = next((bound for bound in BUCKETS if ms <= bound), None)
+            histogram[f'<={bound}' if bound else '>'] += 1
+        return {
+            'runs': self.runs, 'events': self.events, 'bytes': self.bytes, 'window': len(ordered),
+            'p50_ms': percentile(50), 'p95_ms': percentile(95), 'max_ms': round(ordered[-1], 1) if ordered else None,
+            'histogram': histogram,
+        }
+
+
+class WatchTelemetry:
+    # Follows file events through watch mode. Source events wait in pending
+    # until their hop picks them up: edits of src are taken by the next tsc
+    # compile that starts, settings edits by the next config check. A
+    # finished hop is measured from its earliest event and then lands: the
+    # next sync of a batch holding compiled scripts measures end_to_end for
+    # it. Pack files edited directly are measured from their first event.
+    # Called from the observer, tsc and sync threads.
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.lock = threading.Lock()
+        self.stages = {name: LatencyWindow(window) for name in STAGES}
+        self.pending = {'tsc': [], 'config': []}
+        self.compiling = []
+        self.landing = []
+        self.started = time.monotonic()
+        self.reported = 0
+
+    def source_event(self, hop):
+        with self.lock:
+            self.pending[hop].append(time.monotonic())
+
+    def compile_started(self):
+        with self.lock:
+            self.compiling += self.pending['tsc']
+            self.pending['tsc'] = []
+
+    def compile_finished(self):
+        with self.lock:
+            events, self.compiling = self.compiling, []
+            self.finish('tsc', events)
+
+    def config_checked(self, changed):
+        with self.lock:
+            events, self.pending['config'] = self.pending['config'], []
+            self.finish('config', events, changed)
+
+    def finish(self, hop, events, lands=True):
+        if not events:
+            return
+        now = time.monotonic()
+        self.stages[hop].add((now - min(events)) * 1000, len(events))
+        if lands:
+            self.landing.append((now, min(events)))
+
+    def synced(self, batch, direct, compiled, start, end, files, bytes):
+        # batch maps every path of the batch to its first event, direct
+        # holds the first events of pack files edited by hand and compiled
+        # whether compiled scripts were among the paths.
+        with self.lock:
+            self.stages['queue'].add((start - min(batch.values())) * 1000, len(batch))
+            self.stages['sync'].add((end - start) * 1000, files, bytes)
+            landing, self.landing = self.landing, []
+            origins = [event for done, event in landing if end - done <= LANDING_TIMEOUT] if compiled else []
+            # Hops still waiting for their outputs to arrive.
+            self.landing = [(done, event) for done, event in landing if not compiled and end - done <= LANDING_TIMEOUT]
+            if direct:
+                origins.append(min(direct))
+            for event in origins:
+                self.stages['end_to_end'].add((end - event) * 1000, 1)
+
+    def export(self):
+        with self.lock:
+            return {
+                'uptime_s': round(time.monotonic() - self.started, 1),
+                'stages': {name: window.stats() for name, window in self.stages.items()},
+            }
+
+    def changed_since_report(self):
+        with self.lock:
+            runs = sum(window.runs for window in self.stages.values())
+            changed, self.reported = runs != self.reported, runs
+        return changed
+
+    def summary(self):
+        lines = [f'{"stage":<12} {"runs":>5} {"events":>7} {"KiB":>9} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9}']
+        for name, stats in self.export()['stages'].items():
+            if not stats['runs']:
+                continue
+            lines.append(f'{name:<12} {stats["runs"]:>5} {stats["events"]:>7} {stats["bytes"] / 1024:>9.1f} '
+                f'{stats["p50_ms"]:>9.1f} {stats["p95_ms"]:>9.1f} {stats["max_ms"]:>9.1f}')
+        return '\n'.join(lines)
+
+    def write(self, path):
+        with write_atomic(path, encoding='utf-8') as file:
+            json.dump(self.export(), file, indent=1)